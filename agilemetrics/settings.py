@@ -143,3 +143,46 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Celery
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default=CELERY_BROKER_URL)
+# Import shards are long and idempotent: acknowledge them only once they finish,
+# and let each worker process reserve a single one at a time.
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+
+# Seconds between periodic syncs per endpoint, overriding the processor registrations,
+# e.g. {'issues': 120}. Apply changes with `manage.py schedule_syncs`.
+DATA_IMPORT_SYNC_INTERVALS = {}
+
+# On-disk cache of reference responses (issue types, ...) revalidated with conditional
+# requests; set the directory to None to always fetch them in full.
+DATA_IMPORT_RESPONSE_CACHE_DIR = env('DATA_IMPORT_RESPONSE_CACHE_DIR', default=os.path.join(BASE_DIR, '.cache', 'jira'))
+DATA_IMPORT_RESPONSE_CACHE_TTL = 7 * 24 * 60 * 60
+DATA_IMPORT_RESPONSE_CACHE_MAX_BYTES = 100 * 1024 * 1024
+
+# Days finished import runs (and their dead-letter pages) are kept for.
+DATA_IMPORT_RUN_RETENTION_DAYS = 30
+
+# Every importing process adds the metrics of its runs to a file in this directory,
+# which the /metrics view serves in the Prometheus text format.
+DATA_IMPORT_METRICS_DIR = env('DATA_IMPORT_METRICS_DIR', default=os.path.join(BASE_DIR, '.cache', 'metrics'))
+# Seconds after which the file of a process that stopped publishing is removed.
+DATA_IMPORT_METRICS_MAX_AGE = 7 * 24 * 60 * 60
+
+# Cache of the read API (/api/...). Point DATA_API_CACHE_URL at Redis, e.g. redis://localhost:6379/1,
+# so that the web and import processes share it and imports invalidate cached responses; the
+# in-memory fallback is per process and only sees imports run in that process.
+DATA_API_CACHE_URL = env('DATA_API_CACHE_URL', default=None)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': DATA_API_CACHE_URL,
+    } if DATA_API_CACHE_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+DATA_API_CACHE = 'default'
+DATA_API_CACHE_TIMEOUT = 300
@@ -16,6 +16,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from data_import import views as data_import_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', data_import_views.metrics, name='metrics'),
+    path('api/issuetypes', data_import_views.resource_list, {'name': 'issuetypes'}, name='api-issuetypes'),
+    path('api/metrics/weekly-flow', data_import_views.resource_list, {'name': 'weekly-flow'},
+         name='api-weekly-flow'),
+    path('api/metrics/wip', data_import_views.resource_list, {'name': 'wip'}, name='api-wip'),
+    path('api/metrics/lead-time', data_import_views.lead_time, name='api-lead-time'),
 ]
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import IssueType
+from .models import (
+    DailyStatusWip, DeadLetterPage, ImportRun, Issue, IssueTransition, IssueType, PageCheckpoint, SyncState,
+    WeeklyFlowRollup
+)
 
 
 @admin.register(IssueType)
@@ -8,3 +11,61 @@ class IssueTypeAdmin(admin.ModelAdmin):
     search_fields = ('id', 'name', 'description')
     list_filter = ('subtask', 'hierarchy_level')
     ordering = ('id',)
+
+
+@admin.register(Issue)
+class IssueAdmin(admin.ModelAdmin):
+    list_display = ('key', 'project_key', 'issue_type_id', 'status', 'created', 'updated', 'resolved')
+    search_fields = ('id', 'key', 'summary')
+    list_filter = ('project_key', 'status_category')
+    ordering = ('-updated',)
+
+
+@admin.register(SyncState)
+class SyncStateAdmin(admin.ModelAdmin):
+    list_display = ('endpoint', 'watermark', 'updated_at')
+    ordering = ('endpoint',)
+
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = ('endpoint', 'status', 'total', 'started_at', 'heartbeat_at', 'finished_at')
+    list_filter = ('endpoint', 'status')
+    ordering = ('-started_at',)
+
+
+@admin.register(PageCheckpoint)
+class PageCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('run', 'start_at', 'records', 'watermark', 'committed_at')
+    ordering = ('run', 'start_at')
+
+
+@admin.register(DeadLetterPage)
+class DeadLetterPageAdmin(admin.ModelAdmin):
+    list_display = ('endpoint', 'start_at', 'attempts', 'resolved', 'updated_at')
+    search_fields = ('endpoint', 'error')
+    list_filter = ('endpoint', 'resolved')
+    ordering = ('-updated_at',)
+
+
+@admin.register(WeeklyFlowRollup)
+class WeeklyFlowRollupAdmin(admin.ModelAdmin):
+    list_display = ('project_key', 'issue_type_id', 'week', 'throughput', 'lead_time_p50', 'lead_time_p85',
+                    'lead_time_p95', 'cycle_time_count', 'cycle_time_p50', 'cycle_time_p85')
+    list_filter = ('project_key', 'issue_type_id')
+    ordering = ('-week', 'project_key', 'issue_type_id')
+
+
+@admin.register(DailyStatusWip)
+class DailyStatusWipAdmin(admin.ModelAdmin):
+    list_display = ('project_key', 'issue_type_id', 'status', 'day', 'count')
+    list_filter = ('project_key', 'status')
+    ordering = ('-day', 'project_key', 'issue_type_id', 'status')
+
+
+@admin.register(IssueTransition)
+class IssueTransitionAdmin(admin.ModelAdmin):
+    list_display = ('issue_id', 'from_status', 'to_status', 'transitioned_at')
+    search_fields = ('issue_id',)
+    list_filter = ('to_status',)
+    ordering = ('-transitioned_at',)
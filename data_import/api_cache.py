@@ -0,0 +1,80 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+
+API_CACHE = 'default'
+RESPONSE_TIMEOUT = 300  # seconds a cached response is kept, bounding staleness if a version bump is missed
+VERSION_PREFIX = 'data_api:version:'
+RESPONSE_PREFIX = 'data_api:response:'
+
+logger = logging.getLogger(__name__)
+
+
+def _cache():
+    return caches[getattr(settings, 'DATA_API_CACHE', API_CACHE)]
+
+
+def _version_key(model) -> str:
+    return f"{VERSION_PREFIX}{model._meta.label_lower}"
+
+
+def bump_data_version(model):
+    """Invalidate the cached API responses built from ``model``, e.g. after an import batch changed it.
+
+    Failures are logged and ignored, so an unavailable cache never fails an import;
+    responses then expire after ``RESPONSE_TIMEOUT`` at the latest.
+    """
+    cache = _cache()
+    key = _version_key(model)
+    try:
+        # Versions start from the clock, so one that was evicted never repeats an old ETag.
+        if not cache.add(key, time.time_ns(), timeout=None):
+            cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Could not bump the API data version of {model._meta.label}: {e}")
+
+
+def data_versions(models: Iterable) -> str:
+    """Current data versions of ``models``, as part of a cache key."""
+    cache = _cache()
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return ','.join(f"{key}={versions[key]}" for key in keys)
+
+
+def cached_json_response(request: HttpRequest, models: Iterable, build: Callable[[], object]) -> HttpResponse:
+    """JSON response for ``request``, cached until the data version of one of ``models`` changes.
+
+    The ETag is derived from the request and those versions alone, so a client
+    revalidating with ``If-None-Match`` gets a 304 without the response, let alone
+    the database, being touched. Other requests are served from the cache when
+    possible and ``build()`` is only called on a miss.
+    """
+    versions = data_versions(models)
+    digest = hashlib.blake2b(f"{request.get_full_path()}|{versions}".encode('utf-8'), digest_size=16).hexdigest()
+    etag = f'"{digest}"'
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        cache = _cache()
+        body = cache.get(f"{RESPONSE_PREFIX}{digest}")
+        if body is None:
+            body = json.dumps(build(), cls=DjangoJSONEncoder)
+            cache.set(f"{RESPONSE_PREFIX}{digest}", body,
+                      timeout=getattr(settings, 'DATA_API_CACHE_TIMEOUT', RESPONSE_TIMEOUT))
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Clients may keep responses but have to revalidate them, which is cheap.
+    response['Cache-Control'] = 'no-cache'
+    return response
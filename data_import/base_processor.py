@@ -1,13 +1,18 @@
-from typing import List, Dict, Any, Tuple, Optional, Set
-from django.db import transaction
+from typing import List, Dict, Any, Tuple, Optional, Set, Callable
+import contextlib
+from django.db import connections, router, transaction
 from asgiref.sync import sync_to_async
 from uuid import UUID
 from datetime import datetime
 from dateutil.parser import parse as parse_date
+import hashlib
+import json
 import logging
 from enum import Enum
-from dataclasses import dataclass
-from functools import lru_cache
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+
+from data_import.api_cache import bump_data_version
 
 
 class FieldType(Enum):
@@ -27,11 +32,38 @@ class ProcessingResult:
     successful: int = 0
     failed: int = 0
     errors: List[str] = None
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
 
     def __post_init__(self):
         if self.errors is None:
             self.errors = []
 
+    def add(self, other: 'ProcessingResult'):
+        """Accumulate the counts of another batch into this result."""
+        self.total_processed += other.total_processed
+        self.successful += other.successful
+        self.failed += other.failed
+        self.inserted += other.inserted
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.errors.extend(other.errors)
+
+
+@dataclass
+class PreparedBatch:
+    """Records extracted from one page, ready to be written."""
+    total: int = 0
+    failed: int = 0
+    pk_field: Optional[str] = None
+    records: List[Tuple[Any, Dict[str, Any]]] = field(default_factory=list)
+    hashes: Dict[Any, str] = field(default_factory=dict)
+    # Entries dropped because the run already wrote them with the same content.
+    duplicates: int = 0
+    # Latest value of the processor's watermark_field among the entries, if it has one.
+    watermark: Optional[datetime] = None
+
 
 @dataclass
 class FieldMapping:
@@ -49,7 +81,157 @@ class FieldMapping:
             raise ValueError(f"Field {self.model_field} cannot be both required and have a default value")
 
 
+def _convert_uuid(value: Any) -> Optional[UUID]:
+    if isinstance(value, UUID):
+        return value
+    try:
+        return UUID(value)
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def _convert_datetime(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        pass
+    # Jira writes offsets as +0000, which fromisoformat only accepts from Python 3.11 on.
+    if isinstance(value, str) and len(value) > 5 and value[-5] in '+-' and value[-4:].isdigit():
+        try:
+            return datetime.fromisoformat(f"{value[:-2]}:{value[-2:]}")
+        except ValueError:
+            pass
+    return parse_date(value)
+
+
+def _convert_boolean(value: Any) -> bool:
+    return bool(value)
+
+
+def _convert_integer(value: Any) -> Optional[int]:
+    return int(value) if value else None
+
+
+def _convert_float(value: Any) -> Optional[float]:
+    return float(value) if value else None
+
+
+def _convert_string(value: Any) -> str:
+    return str(value) if value else ''
+
+
+def _convert_json(value: Any) -> Optional[dict]:
+    return value if isinstance(value, dict) else None
+
+
+def _convert_passthrough(value: Any) -> Any:
+    return value
+
+
+FIELD_CONVERTERS = {
+    FieldType.UUID: _convert_uuid,
+    FieldType.DATETIME: _convert_datetime,
+    FieldType.BOOLEAN: _convert_boolean,
+    FieldType.INTEGER: _convert_integer,
+    FieldType.FLOAT: _convert_float,
+    FieldType.STRING: _convert_string,
+    FieldType.JSON: _convert_json,
+}
+
+# (key, json_field, path, model_field, converter, field_type, required, default)
+CompiledMapping = Tuple[str, str, Optional[Tuple[str, ...]], str, Callable[[Any], Any], FieldType, bool, Any]
+
+
+def _get_path(entry: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    value = entry
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def get_json_value(entry: Dict[str, Any], json_field: str) -> Any:
+    """Value of ``json_field`` in ``entry``; dotted names such as ``fields.status.name`` walk nested objects."""
+    if '.' not in json_field:
+        return entry.get(json_field)
+    return _get_path(entry, tuple(json_field.split('.')))
+
+
+def compile_field_mappings(field_mappings: Dict[str, FieldMapping]) -> Tuple[CompiledMapping, ...]:
+    """Resolve every mapping to its converter once, so extraction needs no type dispatch."""
+    return tuple(
+        (
+            key,
+            mapping.json_field,
+            tuple(mapping.json_field.split('.')) if '.' in mapping.json_field else None,
+            mapping.model_field,
+            FIELD_CONVERTERS.get(mapping.field_type, _convert_passthrough),
+            mapping.field_type,
+            mapping.required,
+            mapping.default,
+        )
+        for key, mapping in field_mappings.items()
+    )
+
+
+def extract_record(entry: Dict[str, Any], compiled: Tuple[CompiledMapping, ...],
+                   logger: logging.Logger) -> Dict[str, Any]:
+    """Model data of ``entry``, keyed in the order of ``compiled``; empty if a required field is missing."""
+    data = {}
+    has_required_fields = True
+
+    for key, json_field, path, model_field, convert, field_type, required, default in compiled:
+        value = entry.get(json_field) if path is None else _get_path(entry, path)
+        if value is not None:
+            try:
+                value = convert(value)
+            except Exception as e:
+                logger.warning(f"Failed to parse {key} ({field_type.value}): {str(e)}")
+                value = None
+
+        if value is None:
+            if required:
+                logger.error(f"Missing required field: {key}")
+                has_required_fields = False
+                continue
+            value = default
+
+        data[model_field] = value
+
+    return data if has_required_fields else {}
+
+
 class BaseProcessor:
+    # Write batches with one INSERT ... ON CONFLICT DO UPDATE per batch when the
+    # database supports it, instead of an existence query plus bulk_update.
+    use_upsert = True
+    # Model field holding a hash of the mapped values; rows whose hash did not
+    # change are not written again. Ignored for models without that field.
+    hash_field = 'content_hash'
+    field_mappings: Dict[str, FieldMapping] = {}
+    # Key of the entry list in paginated responses; endpoints answering with a
+    # bare JSON array are not paginated.
+    entries_key = 'issues'
+    # Dotted JSON path of the "last updated" timestamp of an entry. Endpoints whose
+    # processor sets it are synced incrementally through JQL (see data_import.sync).
+    watermark_field: Optional[str] = None
+    # JQL restricting incremental searches, combined with the watermark condition.
+    base_jql = ''
+    # Extra query parameters sent with every page request.
+    request_params: Dict[str, Any] = {}
+    # Fetch the endpoint with conditional requests through the client's response
+    # cache. Meant for unpaginated reference data: when the response did not change
+    # since the last successful import, the endpoint is not processed at all.
+    cache_responses = False
+    # data_import.rollups.FlowRollups (or compatible) refreshed with the rows each batch
+    # changes, in the batch's transaction.
+    rollups = None
+
     def __init__(self, logger: logging.Logger, data_processor):
         self.logger = logger
         self.data_processor = data_processor
@@ -70,97 +252,200 @@ class BaseProcessor:
             return None
 
         try:
-            if field_type == FieldType.UUID:
-                return UUID(value) if self.is_valid_uuid(value) else None
-            elif field_type == FieldType.DATETIME:
-                return parse_date(value) if value else None
-            elif field_type == FieldType.BOOLEAN:
-                return bool(value)
-            elif field_type == FieldType.INTEGER:
-                return int(value) if value else None
-            elif field_type == FieldType.FLOAT:
-                return float(value) if value else None
-            elif field_type == FieldType.STRING:
-                return str(value) if value else ''
-            elif field_type == FieldType.JSON:  # Add JSON parsing
-                return value if isinstance(value, dict) else None
-            return value
+            return FIELD_CONVERTERS.get(field_type, _convert_passthrough)(value)
         except Exception as e:
             self.logger.warning(f"Failed to parse {field_name} ({field_type.value}): {str(e)}")
             return None
 
+    def parse_objects(self, json_data) -> List[Dict[str, Any]]:
+        """Turn a page payload (raw bytes or decoded entries) into the entries handled by this processor."""
+        entries = self.data_processor.parse_json(json_data)
+        if isinstance(entries, dict):
+            entries = entries.get(self.entries_key) or []
+        return entries
 
-    async def process_entries(
+    def prepare_entries(
         self,
         entries: List[Dict[str, Any]],
-        model,
-        field_mappings: Dict[str, FieldMapping],
-        batch_size: int
-    ) -> int:
-        """Process entries with support for models with or without primary keys."""
+        field_mappings: Dict[str, FieldMapping]
+    ) -> PreparedBatch:
+        """Extract model data from entries, dropping the ones without a usable primary key."""
+        prepared = self.new_batch(field_mappings)
+        for entry in entries:
+            self.add_entry(prepared, entry, field_mappings)
+        return prepared
+
+    @staticmethod
+    def new_batch(field_mappings: Dict[str, FieldMapping]) -> PreparedBatch:
+        """Empty batch for entries mapped with ``field_mappings``."""
+        pk_mapping = next(
+            (mapping for mapping in field_mappings.values() if mapping.is_primary_key),
+            None
+        )
+        return PreparedBatch(pk_field=pk_mapping.model_field if pk_mapping else None)
+
+    def add_entry(self, prepared: PreparedBatch, entry: Dict[str, Any], field_mappings: Dict[str, FieldMapping]):
+        """Extract one entry into ``prepared``; lets streamed pages be prepared entry by entry."""
+        prepared.total += 1
+        if self.watermark_field:
+            updated = _convert_datetime(get_json_value(entry, self.watermark_field))
+            if updated and (prepared.watermark is None or updated > prepared.watermark):
+                prepared.watermark = updated
+        data = self.extract_data(entry, field_mappings)
+        if not data:
+            prepared.failed += 1
+        elif not prepared.pk_field:
+            prepared.records.append((None, data))
+        else:
+            pk_value = data.get(prepared.pk_field)
+            if pk_value:
+                prepared.records.append((pk_value, data))
+                prepared.hashes[pk_value] = self.compute_content_hash(data)
+            else:
+                prepared.failed += 1
+
+    async def write_prepared(self, prepared: PreparedBatch, model, batch_size: int) -> ProcessingResult:
+        """Write an already extracted batch with a single hop to the database thread."""
+        return await sync_to_async(self.write_prepared_sync)(prepared, model, batch_size)
+
+    def write_prepared_sync(self, prepared: PreparedBatch, model, batch_size: int) -> ProcessingResult:
+        """Write an already extracted batch as an upsert, or as separate inserts and updates.
+
+        For models with a ``hash_field`` the stored hashes are loaded first and rows
+        whose content did not change are skipped instead of being rewritten. With
+        ``rollups`` the rollup cells of the changed rows are refreshed along with them.
+        Runs in the calling thread, e.g. the ``DBWriter`` thread.
+        """
         result = ProcessingResult(
-            total_processed=len(entries),
+            total_processed=prepared.total,
             successful=0,
-            failed=0,
+            failed=prepared.failed,
+            unchanged=prepared.duplicates,
             errors=[]
         )
 
-        try:
-            pk_mapping = next(
-                (mapping for mapping in field_mappings.values() if mapping.is_primary_key),
-                None
-            )
+        if not prepared.records:
+            return result
 
-            valid_records = []
-            record_ids = []
-
-            for entry in entries:
-                data = self.extract_data(entry, field_mappings)
-                if data:
-                    if pk_mapping:
-                        pk_value = data.get(pk_mapping.model_field)
-                        if pk_value:
-                            valid_records.append((pk_value, data))
-                            record_ids.append(pk_value)
-                        else:
-                            result.failed += 1
-                    else:
-                        valid_records.append((None, data))
+        try:
+            if not prepared.pk_field:
+                records_to_insert = [model(**data) for _, data in prepared.records]
+                self.bulk_operations(model, records_to_insert, [], batch_size)
+                transaction.on_commit(partial(bump_data_version, model), using=router.db_for_write(model))
+                result.inserted = len(records_to_insert)
+                result.successful = len(prepared.records)
+                return result
+
+            records = {pk_value: data for pk_value, data in prepared.records}
+            track_hashes = self.has_hash_field(model)
+            upsert = self.supports_upsert(model)
+
+            existing_hashes = None
+            if track_hashes or not upsert:
+                existing_hashes = self.load_existing_hashes(model, list(records), track_hashes)
+
+            records_to_insert = []
+            records_to_update = []
+            for pk_value, data in records.items():
+                if track_hashes:
+                    content_hash = prepared.hashes.get(pk_value)
+                    if existing_hashes.get(pk_value, False) == content_hash:
+                        result.unchanged += 1
+                        continue
+                    data[self.hash_field] = content_hash
+                if existing_hashes is not None and pk_value in existing_hashes:
+                    records_to_update.append(model(**data))
                 else:
-                    result.failed += 1
-
-            if not valid_records:
-                return result.successful
-
-            if pk_mapping:
-                existing_records = await sync_to_async(lambda: set(
-                    model.objects.filter(id__in=record_ids).values_list('id', flat=True)
-                ))()
-
-                records_to_insert = []
-                records_to_update = []
-
-                for pk_value, data in valid_records:
-                    if pk_value in existing_records:
-                        records_to_update.append(model(**data))
-                    else:
-                        records_to_insert.append(model(**data))
-            else:
-                records_to_insert = [model(**data) for _, data in valid_records]
-                records_to_update = []
-
-            await self.bulk_operations(model, records_to_insert, records_to_update, batch_size)
-            result.successful = len(valid_records)
+                    records_to_insert.append(model(**data))
+
+            if existing_hashes is not None:
+                result.inserted = len(records_to_insert)
+                result.updated = len(records_to_update)
+
+            changed = records_to_insert + records_to_update
+            touched = None
+            with transaction.atomic() if self.rollups and changed else contextlib.nullcontext():
+                if self.rollups and changed:
+                    touched = self.rollups.touched_before(model, [record.pk for record in changed])
+                    touched.update(self.rollups.touched_by(records[record.pk] for record in changed))
+                # Only the mapped fields are written, so columns maintained elsewhere
+                # (e.g. Issue.started) keep their values.
+                update_fields = []
+                if changed:
+                    update_fields = [name for name in records[changed[0].pk] if name != prepared.pk_field]
+                if upsert:
+                    if changed:
+                        self.bulk_upsert(model, changed, prepared.pk_field, update_fields, batch_size)
+                else:
+                    self.bulk_operations(model, records_to_insert, records_to_update, batch_size, update_fields)
+                if touched:
+                    self.rollups.refresh(touched)
+                if changed:
+                    # Cached read API responses built from the model are stale once this commits.
+                    transaction.on_commit(partial(bump_data_version, model), using=router.db_for_write(model))
+            result.successful = len(prepared.records)
 
         except Exception as e:
             self.logger.error(f"Error processing entries: {str(e)}", exc_info=True)
             result.errors.append(str(e))
             raise
 
+        return result
+
+    def has_hash_field(self, model) -> bool:
+        """Whether ``model`` stores the content hash of its rows."""
+        return bool(self.hash_field) and any(f.name == self.hash_field for f in model._meta.concrete_fields)
+
+    @staticmethod
+    def compute_content_hash(data: Dict[str, Any]) -> str:
+        """Stable hash of the mapped values of a row."""
+        payload = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    def load_existing_hashes(self, model, record_ids: List[Any], track_hashes: bool) -> Dict[Any, Optional[str]]:
+        """Map the primary keys that already exist to their stored hash (``None`` if untracked)."""
+        queryset = model.objects.filter(pk__in=record_ids)
+        if track_hashes:
+            return dict(queryset.values_list('pk', self.hash_field))
+        return dict.fromkeys(queryset.values_list('pk', flat=True))
+
+    async def process_entries(
+        self,
+        entries: List[Dict[str, Any]],
+        model,
+        field_mappings: Dict[str, FieldMapping],
+        batch_size: int
+    ) -> int:
+        """Process entries with support for models with or without primary keys."""
+        prepared = self.prepare_entries(entries, field_mappings)
+        result = await self.write_prepared(prepared, model, batch_size)
         return result.successful
 
-    @sync_to_async
-    def bulk_operations(self, model, records_to_insert, records_to_update, batch_size):
+    def supports_upsert(self, model) -> bool:
+        """Whether batches for ``model`` can be written with a single INSERT ... ON CONFLICT."""
+        if not self.use_upsert:
+            return False
+        return connections[router.db_for_write(model)].features.supports_update_conflicts_with_target
+
+    @staticmethod
+    def get_model_fields(model) -> List[str]:
+        """Names of the concrete, non primary key fields of ``model``."""
+        return [f.name for f in model._meta.concrete_fields if not f.primary_key]
+
+    def bulk_upsert(self, model, records, pk_field, update_fields, batch_size):
+        self.logger.info(f"Upserting {len(records)} records")
+        with transaction.atomic():
+            model.objects.bulk_create(
+                records,
+                batch_size=batch_size,
+                update_conflicts=bool(update_fields),
+                ignore_conflicts=not update_fields,
+                unique_fields=[pk_field] if update_fields else None,
+                update_fields=update_fields or None,
+            )
+
+    def bulk_operations(self, model, records_to_insert, records_to_update, batch_size, update_fields=None):
+        """Insert and update records separately; updates write ``update_fields``, or every model field."""
         with transaction.atomic():
             if records_to_insert:
                 self.logger.info(f"Inserting {len(records_to_insert)} new records")
@@ -168,22 +453,19 @@ class BaseProcessor:
 
             if records_to_update:
                 self.logger.info(f"Updating {len(records_to_update)} existing records")
-                fields_to_update = list(self.get_model_fields(model))
+                fields_to_update = list(update_fields or self.get_model_fields(model))
                 model.objects.bulk_update(records_to_update, fields=fields_to_update, batch_size=batch_size)
 
-    def extract_data(self, entry: Dict[str, Any], field_mappings: Dict[str, FieldMapping]) -> Dict[str, Any]:
-        data = {}
-        has_required_fields = True
-
-        for key, mapping in field_mappings.items():
-            value = entry.get(mapping.json_field)
-            parsed_value = self.parse_value(value, mapping.field_type, key)
+    @classmethod
+    def get_compiled_mappings(cls, field_mappings: Dict[str, FieldMapping]) -> Tuple[CompiledMapping, ...]:
+        """Compiled form of ``field_mappings``, cached per class for its own mappings."""
+        if field_mappings is not cls.field_mappings:
+            return compile_field_mappings(field_mappings)
+        compiled = cls.__dict__.get('_compiled_mappings')
+        if compiled is None:
+            compiled = compile_field_mappings(field_mappings)
+            cls._compiled_mappings = compiled
+        return compiled
 
-            if mapping.required and parsed_value is None:
-                self.logger.error(f"Missing required field: {key}")
-                has_required_fields = False
-                continue
-
-            data[mapping.model_field] = parsed_value if parsed_value is not None else mapping.default
-
-        return data if has_required_fields else {}
\ No newline at end of file
+    def extract_data(self, entry: Dict[str, Any], field_mappings: Dict[str, FieldMapping]) -> Dict[str, Any]:
+        return extract_record(entry, self.get_compiled_mappings(field_mappings), self.logger)
@@ -0,0 +1,159 @@
+import io
+import json
+import logging
+import uuid
+from datetime import date, datetime
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+
+from data_import.api_cache import bump_data_version
+from data_import.base_processor import PreparedBatch, ProcessingResult
+
+# Column of the staging table numbering rows in the order they were copied.
+STAGING_SEQUENCE = 'staging_seq'
+
+
+def _escape_copy_text(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _encode_json(value: Any) -> str:
+    return _escape_copy_text(json.dumps(value))
+
+
+def _encode_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return _escape_copy_text(str(value))
+
+
+class CopyLoader:
+    """Loads rows through PostgreSQL COPY into a staging table and merges them once.
+
+    Meant for initial full imports: every batch is streamed into an unlogged
+    staging table with ``copy_expert`` and a single ``INSERT ... SELECT ...
+    ON CONFLICT`` moves the rows into the model table at the end of the run.
+    Every load stages into a table of its own, so concurrent loads of the same
+    model do not empty each other's staging tables, and of the rows staged for
+    one key the one copied last is merged.
+    """
+
+    def __init__(self, model, logger: logging.Logger, hash_field: Optional[str] = None):
+        self.model = model
+        self.hash_field = hash_field
+        self.track_hashes = bool(hash_field) and any(f.name == hash_field for f in model._meta.concrete_fields)
+        self._logger = logger
+        self.using = router.db_for_write(model)
+        self.table = model._meta.db_table
+        self.staging_table = f"{self.table}_staging_{uuid.uuid4().hex[:12]}"
+        self.pk_column = model._meta.pk.column
+        self.field_names: List[str] = []
+        self.columns: Optional[List[str]] = None
+        self.encoders: List[Callable[[Any], str]] = []
+        self.rows_staged = 0
+
+    @staticmethod
+    def is_supported(model) -> bool:
+        return connections[router.db_for_write(model)].vendor == 'postgresql'
+
+    def _quote(self, name: str) -> str:
+        return connections[self.using].ops.quote_name(name)
+
+    def _resolve_columns(self, data: Dict[str, Any]):
+        fields = [self.model._meta.get_field(name) for name in data]
+        self.field_names = [f.name for f in fields]
+        self.columns = [f.column for f in fields]
+        self.encoders = [
+            _encode_json if f.get_internal_type() == 'JSONField' else _encode_value
+            for f in fields
+        ]
+
+    @sync_to_async
+    def start(self):
+        """Create (or empty) the staging table for this load."""
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE IF NOT EXISTS {self._quote(self.staging_table)} "
+                f"(LIKE {self._quote(self.table)} INCLUDING DEFAULTS, "
+                f"{self._quote(STAGING_SEQUENCE)} bigserial)"
+            )
+            cursor.execute(f"TRUNCATE {self._quote(self.staging_table)}")
+        self.rows_staged = 0
+
+    @sync_to_async
+    def copy_batch(self, prepared: PreparedBatch) -> ProcessingResult:
+        """Stream one extracted batch into the staging table."""
+        result = ProcessingResult(total_processed=prepared.total, failed=prepared.failed,
+                                  unchanged=prepared.duplicates)
+        if not prepared.records:
+            return result
+        if self.track_hashes:
+            for pk_value, data in prepared.records:
+                data[self.hash_field] = prepared.hashes.get(pk_value)
+        if self.columns is None:
+            self._resolve_columns(prepared.records[0][1])
+
+        buffer = io.StringIO()
+        for _, data in prepared.records:
+            buffer.write('\t'.join(
+                '\\N' if value is None else encode(value)
+                for encode, value in zip(self.encoders, (data.get(name) for name in self.field_names))
+            ))
+            buffer.write('\n')
+        buffer.seek(0)
+
+        columns = ', '.join(self._quote(column) for column in self.columns)
+        with connections[self.using].cursor() as cursor:
+            cursor.copy_expert(f"COPY {self._quote(self.staging_table)} ({columns}) FROM STDIN", buffer)
+
+        self.rows_staged += len(prepared.records)
+        result.successful = len(prepared.records)
+        return result
+
+    @sync_to_async
+    def drop(self):
+        """Drop the staging table without merging it, e.g. after a failed load."""
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self._quote(self.staging_table)}")
+        self._logger.info(f"Dropped staging table {self.staging_table}")
+
+    @sync_to_async
+    def merge(self) -> int:
+        """Upsert the staged rows into the model table and drop the staging table."""
+        staging = self._quote(self.staging_table)
+        if self.columns is None:
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+            return 0
+
+        pk = self._quote(self.pk_column)
+        columns = ', '.join(self._quote(column) for column in self.columns)
+        updates = ', '.join(
+            f"{self._quote(column)} = EXCLUDED.{self._quote(column)}"
+            for column in self.columns if column != self.pk_column
+        )
+        conflict_action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+
+        with transaction.atomic(using=self.using):
+            with connections[self.using].cursor() as cursor:
+                # DISTINCT ON keeps the row of each key copied last; pages fetched twice
+                # would otherwise make ON CONFLICT touch the same row more than once.
+                cursor.execute(
+                    f"INSERT INTO {self._quote(self.table)} ({columns}) "
+                    f"SELECT DISTINCT ON ({pk}) {columns} FROM {staging} "
+                    f"ORDER BY {pk}, {self._quote(STAGING_SEQUENCE)} DESC "
+                    f"ON CONFLICT ({pk}) {conflict_action}"
+                )
+                merged = cursor.rowcount
+                cursor.execute(f"DROP TABLE {staging}")
+            if merged:
+                transaction.on_commit(partial(bump_data_version, self.model), using=self.using)
+
+        self._logger.info(f"Merged {merged} staged rows into {self.table}")
+        return merged
@@ -0,0 +1,171 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from data_import.base_processor import PreparedBatch
+from data_import.models import DeadLetterPage, ImportRun, PageCheckpoint
+
+HEARTBEAT_INTERVAL = 30  # seconds between heartbeats of a running import
+STALE_AFTER = timedelta(minutes=15)  # a RUNNING run without a heartbeat for this long is abandoned
+RUN_RETENTION_DAYS = 30  # finished runs older than this are deleted
+
+
+class IncompleteImportError(Exception):
+    """Raised when an import run finished with pages left in the dead-letter table."""
+
+
+class RunCheckpoint:
+    """Durably records which pages of an ``ImportRun`` have been committed.
+
+    Each committed page gets a ``PageCheckpoint`` row, and each page that fails
+    to fetch, extract or store gets a ``DeadLetterPage`` row instead of being
+    dropped. A resumed run reuses the query parameters of the interrupted one and
+    only fetches the pages it is missing (including dead-lettered ones). Offsets
+    only address the same pages while the result set does not change, so this is
+    meant for endpoints without a watermark; incremental endpoints are never
+    resumed by offset but restart from their committed sync watermark.
+
+    A run holds a heartbeat while it is being imported. Only failed runs, and
+    running ones whose heartbeat went stale because their process died, can be
+    resumed, and a resuming process claims the run under a row lock. The page
+    checkpoints of a completed run are deleted, and finished runs are kept for
+    ``DATA_IMPORT_RUN_RETENTION_DAYS`` only.
+    """
+
+    def __init__(self, run: ImportRun, completed: Dict[int, Optional[datetime]], logger: logging.Logger):
+        self.run = run
+        # start_at -> watermark of every page committed by this run so far.
+        self.completed = completed
+        self.failed_pages = 0
+        self._logger = logger
+        self._heartbeat_at = time.monotonic()
+
+    @classmethod
+    async def open(cls, endpoint: str, params: Dict[str, Any], logger: logging.Logger,
+                   resume: bool = False) -> 'RunCheckpoint':
+        """Start a new run for ``endpoint`` or, with ``resume``, claim its last failed or abandoned one."""
+        run = await cls._claim_unfinished(endpoint) if resume else None
+        if run is None:
+            if resume:
+                logger.info(f"No unfinished run of {endpoint} to resume; starting a new one")
+            run = await sync_to_async(ImportRun.objects.create)(endpoint=endpoint, params=params)
+            return cls(run, {}, logger)
+
+        completed = await cls._load_completed(run)
+        logger.info(f"Resuming run {run.pk} of {endpoint}: {len(completed)} pages already committed")
+        return cls(run, completed, logger)
+
+    @classmethod
+    async def load(cls, run_id: int, logger: logging.Logger) -> 'RunCheckpoint':
+        """Reopen an existing run, e.g. in a worker importing one of its shards."""
+        run = await sync_to_async(ImportRun.objects.get)(pk=run_id)
+        checkpoint = cls(run, await cls._load_completed(run), logger)
+        checkpoint.failed_pages = await sync_to_async(run.dead_letters.filter(resolved=False).count)()
+        return checkpoint
+
+    @staticmethod
+    @sync_to_async
+    def _claim_unfinished(endpoint: str) -> Optional[ImportRun]:
+        """Mark the latest failed or abandoned run of ``endpoint`` as running again and return it.
+
+        The row lock, which skips runs another process is claiming at the same time,
+        and the fresh heartbeat keep two processes from resuming the same run.
+        """
+        resumable = Q(status=ImportRun.FAILED) | Q(status=ImportRun.RUNNING,
+                                                    heartbeat_at__lt=timezone.now() - STALE_AFTER)
+        with transaction.atomic():
+            run = (ImportRun.objects.select_for_update(skip_locked=True)
+                   .filter(resumable, endpoint=endpoint).order_by('-started_at').first())
+            if run is not None:
+                run.status = ImportRun.RUNNING
+                run.finished_at = None
+                run.heartbeat_at = timezone.now()
+                run.save(update_fields=['status', 'finished_at', 'heartbeat_at'])
+        return run
+
+    @staticmethod
+    @sync_to_async
+    def _load_completed(run: ImportRun) -> Dict[int, Optional[datetime]]:
+        return dict(run.pages.values_list('start_at', 'watermark'))
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        return self.run.params
+
+    @sync_to_async
+    def set_total(self, total: Optional[int]):
+        if total is not None and total != self.run.total:
+            self.run.total = total
+            self.run.save(update_fields=['total'])
+
+    async def page_committed(self, start_at: int, prepared: PreparedBatch):
+        await sync_to_async(self.record_page)(start_at, prepared)
+
+    def record_page(self, start_at: int, prepared: PreparedBatch):
+        """Checkpoint a page; called in the transaction that wrote it when one is shared."""
+        self.record(start_at, len(prepared.records), prepared.watermark)
+
+    def record(self, start_at: int, records: int, watermark: Optional[datetime]):
+        """Checkpoint the unit of work at ``start_at``: a page, or the time window of a shard."""
+        PageCheckpoint.objects.get_or_create(
+            run=self.run,
+            start_at=start_at,
+            defaults={'records': records, 'watermark': watermark},
+        )
+        self.run.dead_letters.filter(start_at=start_at, resolved=False).update(resolved=True)
+        # Inside a transaction that may still roll back (e.g. a coalesced commit of
+        # the DB writer) the unit only counts as completed once it commits.
+        transaction.on_commit(partial(self._recorded, start_at, watermark))
+
+    def _recorded(self, start_at: int, watermark: Optional[datetime]):
+        self.completed[start_at] = watermark
+        self.heartbeat()
+
+    def heartbeat(self):
+        """Show that the run is still being imported; written at most every ``HEARTBEAT_INTERVAL`` seconds."""
+        if time.monotonic() - self._heartbeat_at < HEARTBEAT_INTERVAL:
+            return
+        self._heartbeat_at = time.monotonic()
+        ImportRun.objects.filter(pk=self.run.pk).update(heartbeat_at=timezone.now())
+
+    @sync_to_async
+    def page_failed(self, start_at: int, error: BaseException):
+        self.failed_pages += 1
+        self._logger.error(f"Page startAt={start_at} of {self.run.endpoint} failed: {error}")
+        updated = self.run.dead_letters.filter(start_at=start_at).update(
+            error=str(error), attempts=F('attempts') + 1, resolved=False, updated_at=timezone.now()
+        )
+        if not updated:
+            DeadLetterPage.objects.create(
+                run=self.run,
+                endpoint=self.run.endpoint,
+                start_at=start_at,
+                params=self.run.params,
+                error=str(error),
+            )
+        self.heartbeat()
+
+    @sync_to_async
+    def finish(self, succeeded: bool):
+        """Close the run; it stays resumable unless every page was committed.
+
+        A completed run no longer needs its page checkpoints, and runs of the
+        endpoint that finished before the retention period are deleted.
+        """
+        self.run.status = ImportRun.COMPLETED if succeeded and not self.failed_pages else ImportRun.FAILED
+        self.run.finished_at = timezone.now()
+        self.run.save(update_fields=['status', 'finished_at'])
+        if self.run.status == ImportRun.COMPLETED:
+            self.run.pages.all().delete()
+        retention = timedelta(days=getattr(settings, 'DATA_IMPORT_RUN_RETENTION_DAYS', RUN_RETENTION_DAYS))
+        expired = ImportRun.objects.filter(endpoint=self.run.endpoint,
+                                           finished_at__lt=self.run.finished_at - retention)
+        expired.exclude(status=ImportRun.RUNNING).delete()
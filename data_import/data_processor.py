@@ -1,15 +1,36 @@
 import logging
 import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library decoder is used without it
+    orjson = None
+
+JSONDecodeError = orjson.JSONDecodeError if orjson else json.JSONDecodeError
+
+
+def loads(raw: Any) -> Any:
+    """Decode a JSON document from bytes or str with the fastest available backend."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
 
 
 class DataProcessor:
     def __init__(self, logger):
         self.logger = logger
 
-    def parse_json(self, json_data: str):
-        """Parse JSON data."""
+    def parse_json(self, json_data: Any):
+        """Parse JSON data.
+
+        Raw ``bytes``/``str`` payloads are decoded once; anything else is assumed to be
+        already decoded and is returned as is, without copying.
+        """
+        if not isinstance(json_data, (bytes, bytearray, str)):
+            return json_data
         try:
-            return json.loads(json_data)
-        except json.JSONDecodeError as e:
+            return loads(json_data)
+        except JSONDecodeError as e:
             self.logger.error(f"JSON parsing error: {str(e)}", exc_info=True)
             raise
@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from django.db import connections, transaction
+
+from data_import.base_processor import BaseProcessor, PreparedBatch, ProcessingResult
+
+COMMIT_ROWS = 500  # rows after which coalesced pages are committed
+COMMIT_INTERVAL = 0.5  # seconds the first queued page may wait for more pages
+MAX_PENDING_PAGES = 16  # pages queued for the writer before submitters wait
+
+_STOP = object()
+
+
+@dataclass
+class _WriteRequest:
+    processor: BaseProcessor
+    model: object
+    batch_size: int
+    prepared: PreparedBatch
+    after_write: Optional[Callable[[], None]] = None
+    future: Future = field(default_factory=Future)
+
+
+@dataclass
+class CommitStats:
+    """Commit latency and size of everything a ``DBWriter`` wrote."""
+    commits: int = 0
+    pages: int = 0
+    rows: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def summary(self) -> str:
+        return (
+            f"{self.commits} commits of {self.pages} pages / {self.rows} rows; commit latency "
+            f"p50 {self.percentile(0.5) * 1000:.1f}ms, p99 {self.percentile(0.99) * 1000:.1f}ms, "
+            f"max {max(self.latencies, default=0) * 1000:.1f}ms"
+        )
+
+
+class DBWriter:
+    """Writes prepared batches from a single thread that owns its own DB connection.
+
+    Import pipelines ``submit`` batches from the event loop; the writer thread takes
+    them off a queue and coalesces consecutive pages into one transaction until
+    ``commit_rows`` rows are collected or the first page has waited
+    ``commit_interval`` seconds. Each page still goes through its processor's
+    ``write_prepared_sync``. When a coalesced transaction fails, its pages are
+    written again one transaction each, so only the broken page fails.
+    """
+
+    def __init__(self, logger: logging.Logger, commit_rows: int = COMMIT_ROWS,
+                 commit_interval: float = COMMIT_INTERVAL, using: str = 'default'):
+        self.commit_rows = max(1, commit_rows)
+        self.commit_interval = max(0.0, commit_interval)
+        self.using = using
+        self.stats = CommitStats()
+        self._logger = logger
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='data-import-db-writer', daemon=True)
+            self._thread.start()
+
+    async def stop(self):
+        """Write what is still queued, then stop the thread and close its connection."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        self._thread = None
+        self._logger.info(f"DB writer: {self.stats.summary()}")
+
+    async def submit(self, processor: BaseProcessor, model, prepared: PreparedBatch, batch_size: int,
+                     after_write: Optional[Callable[[], None]] = None) -> ProcessingResult:
+        """Queue a batch and wait until the transaction containing it has committed.
+
+        ``after_write`` runs in the writer thread right after the batch, inside the
+        same transaction, so bookkeeping such as checkpoints commits atomically with it.
+        That transaction may roll back and its pages be written again one by one, so
+        in-memory state must only change in ``transaction.on_commit`` callbacks.
+        """
+        self.start()
+        request = _WriteRequest(processor, model, batch_size, prepared, after_write)
+        self._queue.put(request)
+        return await asyncio.wrap_future(request.future)
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                batch = [first]
+                rows = len(first.prepared.records)
+                deadline = time.monotonic() + self.commit_interval
+                while rows < self.commit_rows:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        request = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if request is _STOP:
+                        stopping = True
+                        break
+                    batch.append(request)
+                    rows += len(request.prepared.records)
+                self._commit(batch)
+        finally:
+            connections[self.using].close()
+
+    def _commit(self, batch: List[_WriteRequest]):
+        started = time.perf_counter()
+        try:
+            with transaction.atomic(using=self.using):
+                results = [self._write(request) for request in batch]
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+                return
+            self._logger.warning(f"Coalesced commit of {len(batch)} pages failed ({e}); writing them one by one")
+            for request in batch:
+                self._commit([request])
+            return
+
+        latency = time.perf_counter() - started
+        self.stats.commits += 1
+        self.stats.pages += len(batch)
+        self.stats.rows += sum(len(request.prepared.records) for request in batch)
+        self.stats.latencies.append(latency)
+        self._logger.debug(f"Committed {len(batch)} pages in {latency * 1000:.1f}ms")
+        for request, result in zip(batch, results):
+            if not request.future.cancelled():
+                request.future.set_result(result)
+
+    @staticmethod
+    def _write(request: _WriteRequest) -> ProcessingResult:
+        result = request.processor.write_prepared_sync(request.prepared, request.model, request.batch_size)
+        if request.after_write:
+            request.after_write()
+        return result
+
+    @staticmethod
+    def _fail(request: _WriteRequest, error: Exception):
+        if not request.future.cancelled():
+            request.future.set_exception(error)
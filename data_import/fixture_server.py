@@ -0,0 +1,312 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import datetime as DateTime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from aiohttp import ClientSession, web
+
+FIXTURE_TOTAL = 1000
+FIXTURE_PAGE_SIZE = 100  # largest maxResults honoured, like Jira's own cap
+FIXTURE_ISSUE_TYPES = 10
+SEARCH_PATH = '/rest/api/3/search'
+ISSUETYPE_PATH = '/rest/api/3/issuetype'
+# "updated" bounds of incremental searches; dates are read as UTC.
+JQL_UPDATED = re.compile(r'updated\s*(>=|<)\s*"(\d{4}-\d{2}-\d{2} \d{2}:\d{2})"')
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FixtureConfig:
+    total: int = FIXTURE_TOTAL
+    max_page_size: int = FIXTURE_PAGE_SIZE
+    issue_types: int = FIXTURE_ISSUE_TYPES
+    latency: float = 0.0  # seconds added to every response
+    jitter: float = 0.0  # up to this many seconds more, chosen at random
+    error_rate: float = 0.0  # share of requests answered with 429 or 503
+    retry_after: float = 1.0
+    report_total: bool = True
+    seed: int = 0
+    recordings: Optional[str] = None  # directory of recorded responses to replay
+    upstream: Optional[str] = None  # Jira site to proxy to, recording into ``recordings``
+
+
+def recording_key(path: str, query) -> str:
+    """Key of a recorded response: its path and its parameters, independent of their order.
+
+    The JQL is part of the key, as incremental searches are paged by it; a
+    recording replays an import started from the same sync watermark.
+    """
+    params = sorted(query.items())
+    canonical = json.dumps([path, params])
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class JiraFixtureServer:
+    """Local stand-in for the parts of the Jira REST API the importer uses.
+
+    Serves synthetic search results (``total`` issues in pages of at most
+    ``max_page_size``, oldest update first and restricted to the JQL's "updated"
+    bounds) and issue types, shaped like Jira Cloud's responses. Every
+    response can be delayed by ``latency`` plus up to ``jitter`` seconds, and a share
+    ``error_rate`` of the requests is answered with a 429 or 503 and a
+    ``Retry-After`` header, to exercise the client's retry policy.
+
+    With ``recordings`` the responses saved in that directory are replayed instead;
+    with an ``upstream`` site as well, requests are proxied there and every
+    successful response is saved, so real payloads can be replayed later without
+    credentials. Bump ``generation`` to change the content of every synthetic issue,
+    e.g. so that repeated benchmark runs are not skipped as unchanged rows.
+    """
+
+    def __init__(self, config: Optional[FixtureConfig] = None, logger: Optional[logging.Logger] = None):
+        self.config = config or FixtureConfig()
+        self._logger = logger or logging.getLogger(__name__)
+        self._rng = random.Random(self.config.seed)
+        self.generation = 0
+        self._by_update: List[tuple] = []
+        self._by_update_generation = None
+        self.requests = 0
+        self.throttled = 0
+        self.url = None
+        self._runner = None
+        self._upstream = None
+        self._thread = None
+        self._loop = None
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        if self.config.recordings:
+            app.router.add_route('*', '/{path:.*}', self.replay)
+        else:
+            app.router.add_get(SEARCH_PATH, self.search)
+            app.router.add_post(SEARCH_PATH, self.search)
+            app.router.add_get(ISSUETYPE_PATH + '{rest:.*}', self.issue_types)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start serving and return the base URL; port 0 picks a free one."""
+        if self.config.upstream:
+            self._upstream = ClientSession()
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{bound_port}"
+        self._logger.info(f"Jira fixture server listening on {self.url}")
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._upstream:
+            await self._upstream.close()
+            self._upstream = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def start_in_thread(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Serve from an event loop of its own, so the importer's work does not delay responses."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='jira-fixture-server', daemon=True)
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(self.start(host, port), self._loop).result()
+
+    def stop_thread(self):
+        if not self._thread:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._thread = None
+        self._loop = None
+
+    async def _delay(self) -> Optional[web.Response]:
+        """Apply the configured latency, and answer with an injected error when it is due."""
+        self.requests += 1
+        delay = self.config.latency + (self._rng.uniform(0, self.config.jitter) if self.config.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.config.error_rate and self._rng.random() < self.config.error_rate:
+            self.throttled += 1
+            return web.Response(
+                status=self._rng.choice((429, 503)),
+                headers={'Retry-After': str(self.config.retry_after)},
+                text='Injected error',
+            )
+        return None
+
+    def _issue_times(self, index: int):
+        rng = random.Random(self.config.seed * 1_000_003 + index)
+        created = DateTime(2020, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(2_000_000))
+        updated = created + timedelta(minutes=rng.randrange(50_000) + self.generation)
+        return rng, created, updated
+
+    def by_update(self) -> List[tuple]:
+        """``(updated, index)`` of every synthetic issue, in search order."""
+        if self._by_update_generation != self.generation:
+            self._by_update = sorted((self._issue_times(index)[2], index) for index in range(self.config.total))
+            self._by_update_generation = self.generation
+        return self._by_update
+
+    def matching(self, jql: str) -> List[tuple]:
+        """The issues within the "updated" bounds of ``jql``, in search order."""
+        issues = self.by_update()
+        lower, upper = 0, len(issues)
+        for operator, value in JQL_UPDATED.findall(jql or ''):
+            bound = (DateTime.strptime(value, '%Y-%m-%d %H:%M').replace(tzinfo=timezone.utc), -1)
+            if operator == '>=':
+                lower = max(lower, bisect_left(issues, bound))
+            else:
+                upper = min(upper, bisect_left(issues, bound))
+        return issues[lower:max(lower, upper)]
+
+    def build_issue(self, index: int) -> Dict[str, Any]:
+        rng, created, updated = self._issue_times(index)
+        done = index % 3 == 0
+        return {
+            'id': str(10000 + index),
+            'key': f"PRJ-{index + 1}",
+            'fields': {
+                'summary': f"Synthetic issue {index} (generation {self.generation})",
+                'project': {'key': 'PRJ'},
+                'issuetype': {'id': str(1 + rng.randrange(self.config.issue_types))},
+                'status': {
+                    'name': 'Done' if done else rng.choice(('To Do', 'In Progress', 'In Review')),
+                    'statusCategory': {'key': 'done' if done else rng.choice(('new', 'indeterminate'))},
+                },
+                'created': created.strftime('%Y-%m-%dT%H:%M:%S.000%z'),
+                'updated': updated.strftime('%Y-%m-%dT%H:%M:%S.000%z'),
+                'resolutiondate': updated.strftime('%Y-%m-%dT%H:%M:%S.000%z') if done else None,
+            },
+        }
+
+    def build_issue_types(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                'id': str(1 + i),
+                'name': f"Type {i + 1}",
+                'description': f"Synthetic issue type {i + 1}",
+                'iconUrl': f"{self.url}/images/icons/issuetypes/{i + 1}.svg",
+                'hierarchyLevel': -1 if i == 0 else 0,
+                'avatarId': 10300 + i,
+                'subtask': i == 0,
+            }
+            for i in range(self.config.issue_types)
+        ]
+
+    async def search(self, request: web.Request) -> web.Response:
+        error = await self._delay()
+        if error:
+            return error
+        params = dict(request.query)
+        if request.method == 'POST' and request.can_read_body:
+            params.update(await request.json())
+        start_at = max(0, int(params.get('startAt', 0)))
+        page_size = min(max(1, int(params.get('maxResults', 50))), self.config.max_page_size)
+        issues = self.matching(params.get('jql', ''))
+        page = {
+            'startAt': start_at,
+            'maxResults': page_size,
+            'issues': [self.build_issue(index) for _, index in issues[start_at:start_at + page_size]],
+        }
+        if self.config.report_total:
+            page['total'] = len(issues)
+        return web.json_response(page)
+
+    async def issue_types(self, request: web.Request) -> web.Response:
+        return await self._delay() or web.json_response(self.build_issue_types())
+
+    def _recording_path(self, request: web.Request) -> Path:
+        return Path(self.config.recordings) / f"{recording_key(request.path, request.query)}.json"
+
+    async def replay(self, request: web.Request) -> web.Response:
+        error = await self._delay()
+        if error:
+            return error
+        path = self._recording_path(request)
+        if self._upstream:
+            return await self.record(request, path)
+        try:
+            body = await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            return web.json_response({'errorMessages': [f"No recording for {request.path_qs}"]}, status=404)
+        return web.Response(body=body, content_type='application/json')
+
+    async def record(self, request: web.Request, path: Path) -> web.Response:
+        """Proxy ``request`` to the upstream site and save its response if it succeeded."""
+        headers = {name: value for name, value in request.headers.items()
+                   if name.lower() in ('authorization', 'accept', 'content-type')}
+        async with self._upstream.request(request.method, f"{self.config.upstream.rstrip('/')}{request.path}",
+                                          params=request.query, headers=headers,
+                                          data=await request.read() or None) as upstream:
+            body = await upstream.read()
+            if upstream.status == 200:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                await asyncio.to_thread(path.write_bytes, body)
+            retry_after = upstream.headers.get('Retry-After')
+            return web.Response(
+                status=upstream.status,
+                body=body,
+                content_type=upstream.content_type,
+                headers={'Retry-After': retry_after} if retry_after else None,
+            )
+
+
+def main(argv=None):
+    """Run the fixture server on its own, e.g. to record a Jira site or point an import at it."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--total', type=int, default=FIXTURE_TOTAL)
+    parser.add_argument('--max-page-size', type=int, default=FIXTURE_PAGE_SIZE)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--recordings', help='Directory of recorded responses to replay (or record into)')
+    parser.add_argument('--upstream', help='Jira site to proxy to, recording its responses into --recordings')
+    args = parser.parse_args(argv)
+    if args.upstream and not args.recordings:
+        parser.error('--upstream needs --recordings')
+
+    config = FixtureConfig(
+        total=args.total,
+        max_page_size=args.max_page_size,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        recordings=args.recordings,
+        upstream=args.upstream,
+    )
+    logging.basicConfig(level=logging.INFO)
+
+    async def serve():
+        server = JiraFixtureServer(config)
+        await server.start(args.host, args.port)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+import numpy as np
+
+LOAD_CHUNK = 100_000  # transitions read from the database per query
+DAY = 24 * 60 * 60
+PERCENTILES = (50, 85, 95)
+# Edges, in days, of the cycle time histogram; the last bin is open.
+HISTOGRAM_DAYS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 365)
+START_CATEGORY = 'indeterminate'
+DONE_CATEGORY = 'done'
+
+
+class Interner:
+    """Maps strings such as status or issue type ids to dense integer codes."""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode(self, values: Sequence[Any]) -> np.ndarray:
+        """Codes of ``values``; every distinct value is looked up once."""
+        if not len(values):
+            return np.zeros(0, dtype=np.int32)
+        unique, inverse = np.unique(np.array([value or '' for value in values], dtype=object), return_inverse=True)
+        return np.array([self.code(value) for value in unique], dtype=np.int32)[inverse]
+
+    def lookup(self, values: Iterable[str]) -> np.ndarray:
+        """Codes of the ``values`` that have been interned; unknown values are left out."""
+        return np.array([self.codes[value] for value in values if value in self.codes], dtype=np.int32)
+
+
+@dataclass
+class TransitionColumns:
+    """Status transitions as parallel arrays, sorted by issue and then time.
+
+    Issues, issue types (``IssueType.id``) and statuses (Jira status ids) are
+    interned, so every column is a small integer array and the metrics below are
+    computed with vectorized operations instead of a loop over rows.
+    """
+    issue: np.ndarray  # int32 code of the issue
+    issue_type: np.ndarray  # int32 code of the issue's type
+    status: np.ndarray  # int32 code of the status entered
+    at: np.ndarray  # int64 seconds since the epoch
+    issues: Interner = field(default_factory=Interner)
+    issue_types: Interner = field(default_factory=Interner)
+    statuses: Interner = field(default_factory=Interner)
+    # Status code -> status name, for reports.
+    status_names: Dict[int, str] = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.at)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, str, str, str, float]],
+                  chunk_size: int = LOAD_CHUNK) -> 'TransitionColumns':
+        """Build the columns from ``(issue_id, issue_type_id, status_id, status_name, timestamp)`` rows, chunk by chunk."""
+        columns = cls(*(np.zeros(0, dtype=dtype) for dtype in (np.int32, np.int32, np.int32, np.int64)))
+        chunks = []
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                chunks.append(columns._encode(chunk))
+                chunk = []
+        if chunk:
+            chunks.append(columns._encode(chunk))
+        if chunks:
+            columns.issue, columns.issue_type, columns.status, columns.at = (
+                np.concatenate(parts) for parts in zip(*chunks)
+            )
+        columns._sort()
+        return columns
+
+    @classmethod
+    def load(cls, queryset=None, chunk_size: int = LOAD_CHUNK) -> 'TransitionColumns':
+        """Load ``IssueTransition`` rows (all of them by default) with keyset pagination over their primary key."""
+        from data_import.models import Issue, IssueTransition
+
+        queryset = queryset if queryset is not None else IssueTransition.objects.all()
+        issue_types = dict(Issue.objects.values_list('id', 'issue_type_id').iterator())
+
+        def rows():
+            last_pk = None
+            while True:
+                page = queryset.order_by('pk')
+                if last_pk is not None:
+                    page = page.filter(pk__gt=last_pk)
+                batch = list(page.values_list('pk', 'issue_id', 'to_status_id', 'to_status', 'transitioned_at')
+                             [:chunk_size])
+                if not batch:
+                    return
+                last_pk = batch[-1][0]
+                for _, issue_id, status_id, status_name, transitioned_at in batch:
+                    yield issue_id, issue_types.get(issue_id), status_id, status_name, transitioned_at.timestamp()
+
+        return cls.from_rows(rows(), chunk_size)
+
+    def _encode(self, chunk: List[Tuple]) -> Tuple[np.ndarray, ...]:
+        issue_ids, type_ids, status_ids, status_names, timestamps = zip(*chunk)
+        status = self.statuses.encode(status_ids)
+        for code, name in zip(status.tolist(), status_names):
+            self.status_names.setdefault(code, name)
+        return (
+            self.issues.encode(issue_ids),
+            self.issue_types.encode(type_ids),
+            status,
+            np.asarray(timestamps, dtype=np.float64).astype(np.int64),
+        )
+
+    def _sort(self):
+        order = np.lexsort((self.at, self.issue))
+        self.issue, self.issue_type, self.status, self.at = (
+            self.issue[order], self.issue_type[order], self.status[order], self.at[order]
+        )
+
+    def select(self, mask: np.ndarray) -> 'TransitionColumns':
+        """The transitions where ``mask`` holds, e.g. those of some issue types; sorting is kept."""
+        return TransitionColumns(self.issue[mask], self.issue_type[mask], self.status[mask], self.at[mask],
+                                 self.issues, self.issue_types, self.statuses, self.status_names)
+
+    def of_issue_types(self, issue_type_ids: Iterable[str]) -> 'TransitionColumns':
+        return self.select(np.isin(self.issue_type, self.issue_types.lookup(issue_type_ids)))
+
+    def status_codes(self, names: Iterable[str]) -> np.ndarray:
+        """Codes of the statuses with one of ``names``."""
+        names = set(names)
+        return np.array([code for code, name in self.status_names.items() if name in names], dtype=np.int32)
+
+    def last_of_issue(self) -> np.ndarray:
+        """Index of the last transition of every issue."""
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.r_[self.issue[1:] != self.issue[:-1], True])
+
+
+def status_categories() -> Dict[str, Set[str]]:
+    """Status names per Jira status category, as seen on the imported issues."""
+    from data_import.models import Issue
+
+    categories: Dict[str, Set[str]] = {}
+    for status, category in Issue.objects.values_list('status', 'status_category').distinct():
+        if status:
+            categories.setdefault(category or '', set()).add(status)
+    return categories
+
+
+def cycle_times(columns: TransitionColumns, start_statuses: np.ndarray,
+                done_statuses: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """``(issue codes, seconds)`` from the first entry into a start status to the final entry into a done status.
+
+    Only issues whose last transition went into a done status and that passed
+    through a start status before are included.
+    """
+    if not len(columns):
+        return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+    started = np.flatnonzero(np.isin(columns.status, start_statuses))
+    # Transitions are sorted by issue and time, so the first start of an issue comes first.
+    first_start = started[np.r_[True, columns.issue[started][1:] != columns.issue[started][:-1]]]
+    start_at = np.full(len(columns.issues), -1, dtype=np.int64)
+    start_at[columns.issue[first_start]] = columns.at[first_start]
+
+    last = columns.last_of_issue()
+    issue = columns.issue[last]
+    finished = np.isin(columns.status[last], done_statuses) & (start_at[issue] >= 0)
+    issue = issue[finished]
+    durations = columns.at[last][finished] - start_at[issue]
+    valid = durations >= 0
+    return issue[valid], durations[valid]
+
+
+def time_in_status(columns: TransitionColumns, done_statuses: np.ndarray, now: float) -> np.ndarray:
+    """Seconds every transition's status lasted: until the next transition, or ``now`` for open issues."""
+    if not len(columns):
+        return np.zeros(0, dtype=np.int64)
+    same_issue = np.r_[columns.issue[1:] == columns.issue[:-1], False]
+    following = np.r_[columns.at[1:], 0]
+    still_open = np.where(np.isin(columns.status, done_statuses), 0, int(now) - columns.at)
+    return np.where(same_issue, following - columns.at, still_open)
+
+
+def flow_efficiency(columns: TransitionColumns, active_statuses: np.ndarray, wait_statuses: np.ndarray,
+                    done_statuses: np.ndarray, now: float) -> Tuple[np.ndarray, np.ndarray]:
+    """``(issue codes, efficiency)``: the share of each issue's in-progress time spent in active statuses."""
+    durations = time_in_status(columns, done_statuses, now)
+    size = len(columns.issues)
+    active = np.bincount(columns.issue, weights=durations * np.isin(columns.status, active_statuses), minlength=size)
+    waiting = np.bincount(columns.issue, weights=durations * np.isin(columns.status, wait_statuses), minlength=size)
+    total = active + waiting
+    issue = np.flatnonzero(total > 0)
+    return issue.astype(np.int32), active[issue] / total[issue]
+
+
+def cumulative_flow(columns: TransitionColumns, start: float, end: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Cumulative flow diagram: ``(day starts, counts)`` with ``counts[status, day]`` issues in each status at the end of each day.
+
+    Every transition adds one issue to its status on the day it happened and, if
+    the issue moved on, removes it again on the day of the next transition; a
+    running sum over the days then gives the daily counts.
+    """
+    origin = int(start) - int(start) % DAY
+    days = max(1, -(-(int(end) - origin) // DAY))
+    counts = np.zeros((len(columns.statuses), days + 1), dtype=np.int64)
+    if len(columns):
+        entered = np.clip((columns.at - origin) // DAY, 0, days)
+        np.add.at(counts, (columns.status, entered), 1)
+        moved_on = np.r_[columns.issue[1:] == columns.issue[:-1], False]
+        left = np.clip((columns.at[1:][moved_on[:-1]] - origin) // DAY, 0, days)
+        np.add.at(counts, (columns.status[moved_on], left), -1)
+    day_starts = origin + DAY * np.arange(days, dtype=np.int64)
+    # The extra last column collects changes after ``end``.
+    return day_starts, np.cumsum(counts, axis=1)[:, :days]
+
+
+def distribution(seconds: np.ndarray, percentiles: Sequence[int] = PERCENTILES,
+                 histogram_days: Sequence[float] = HISTOGRAM_DAYS) -> Dict[str, Any]:
+    """Count, mean, percentiles (in days) and a histogram over ``histogram_days`` of durations in seconds."""
+    days = np.asarray(seconds, dtype=np.float64) / DAY
+    edges = np.r_[np.asarray(histogram_days, dtype=np.float64), np.inf]
+    histogram, _ = np.histogram(days, bins=edges)
+    summary = {
+        'count': int(days.size),
+        'mean_days': float(days.mean()) if days.size else None,
+        'histogram_days': list(histogram_days),
+        'histogram': histogram.tolist(),
+    }
+    values = np.percentile(days, percentiles) if days.size else [None] * len(percentiles)
+    for percentile, value in zip(percentiles, values):
+        summary[f'p{percentile}_days'] = float(value) if value is not None else None
+    return summary
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; the index is then only guarded within one process
+    fcntl = None
+
+CACHE_TTL = 7 * 24 * 60 * 60  # seconds before a cached response is dropped and fetched in full again
+CACHE_MAX_BYTES = 100 * 1024 * 1024
+INDEX_FILE = 'index.json'
+LOCK_FILE = 'index.lock'
+
+
+class _NotModified:
+    """Returned instead of a body when a cached response is still current."""
+
+    def __repr__(self):
+        return 'NOT_MODIFIED'
+
+    def __bool__(self):
+        return False
+
+
+NOT_MODIFIED = _NotModified()
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    digest: str
+    size: int
+    stored_at: float
+    last_used: float
+
+
+def cache_key(url: str, params: Optional[Dict[str, Any]]) -> str:
+    """Key of a request: its URL and its parameters, independent of their order."""
+    canonical = json.dumps([url, sorted((str(k), str(v)) for k, v in (params or {}).items())])
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """On-disk cache of response bodies with their validators, for conditional requests.
+
+    Every entry keeps the body, its ``ETag``/``Last-Modified`` headers and a digest
+    of the body. ``JiraAPI`` sends the validators with the next request for the same
+    URL and parameters; a ``304``, or a ``200`` whose body has the same digest (Jira
+    does not send validators everywhere), means the response has not changed.
+    Entries older than ``ttl`` are dropped, so everything is fetched and processed
+    in full once in a while, and the least recently used entries are evicted once
+    the bodies take more than ``max_bytes``.
+
+    New responses are only ``stage``d: they become the cached version once the
+    caller has processed them and calls ``commit``, so a response whose import
+    failed is not mistaken for one that is already stored.
+
+    Several processes (e.g. Celery workers) may share a directory: bodies and the
+    index are written to a temporary file and renamed into place, and each process
+    merges its changes into the index on disk under an exclusive lock of
+    ``LOCK_FILE`` rather than overwriting the entries of the others.
+    """
+
+    def __init__(self, directory, ttl: float = CACHE_TTL, max_bytes: int = CACHE_MAX_BYTES,
+                 logger: Optional[logging.Logger] = None):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._entries: Dict[str, CacheEntry] = self._load_index()
+        # Entries this process stored, used or dropped since it last saved the index.
+        self._changed: Dict[str, CacheEntry] = {}
+        self._touched: Dict[str, float] = {}
+        self._dropped: Set[str] = set()
+        # key -> (url, params, body, headers) of responses that are not processed yet.
+        self._pending: Dict[str, tuple] = {}
+
+    def _load_index(self) -> Dict[str, CacheEntry]:
+        try:
+            with open(self.directory / INDEX_FILE, encoding='utf-8') as f:
+                entries = {key: CacheEntry(**data) for key, data in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, TypeError) as e:
+            self._logger.warning(f"Ignoring unreadable response cache index: {e}")
+            return {}
+        return {key: entry for key, entry in entries.items() if self._body_path(key).exists()}
+
+    @contextmanager
+    def _index_locked(self) -> Iterator[None]:
+        """Hold the lock every process sharing the directory takes to update the index."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.directory / LOCK_FILE, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_atomic(self, path: Path, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _save_index(self, evict: bool = False):
+        """Merge this process's changes into the index on disk, evicting entries if asked to."""
+        with self._index_locked():
+            entries = self._load_index()
+            for key in self._dropped:
+                entries.pop(key, None)
+            entries.update(self._changed)
+            for key, last_used in self._touched.items():
+                if key in entries:
+                    entries[key].last_used = max(entries[key].last_used, last_used)
+            self._entries = entries
+            self._changed.clear()
+            self._touched.clear()
+            self._dropped.clear()
+            if evict:
+                self._evict()
+                self._dropped.clear()
+            index = {key: asdict(entry) for key, entry in self._entries.items()}
+            self._write_atomic(self.directory / INDEX_FILE, json.dumps(index).encode('utf-8'))
+
+    def _body_path(self, key: str) -> Path:
+        return self.directory / f"{key}.body"
+
+    def _drop(self, key: str):
+        self._entries.pop(key, None)
+        self._changed.pop(key, None)
+        self._touched.pop(key, None)
+        self._dropped.add(key)
+        try:
+            self._body_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def lookup(self, url: str, params: Optional[Dict[str, Any]] = None) -> Optional[CacheEntry]:
+        """The current entry for a request, or ``None`` if there is none or it expired."""
+        key = cache_key(url, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry.stored_at > self.ttl:
+                self._drop(key)
+                self._save_index()
+                return None
+            return entry
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        headers = {}
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def read_body(self, entry: CacheEntry) -> Optional[bytes]:
+        try:
+            return self._body_path(entry.key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def touch(self, entry: CacheEntry):
+        """Mark an entry as used after the server confirmed it is current."""
+        with self._lock:
+            entry.last_used = time.time()
+            self._touched[entry.key] = entry.last_used
+            self._save_index()
+
+    def is_current(self, url: str, params: Optional[Dict[str, Any]], body: bytes) -> bool:
+        """Whether a ``200`` body is the one already cached for the request."""
+        entry = self.lookup(url, params)
+        if entry is None or entry.digest != hashlib.blake2b(body, digest_size=16).hexdigest():
+            return False
+        self.touch(entry)
+        return True
+
+    def stage(self, url: str, params: Optional[Dict[str, Any]], body: bytes, headers):
+        """Remember a new response until its page has been processed."""
+        with self._lock:
+            self._pending[cache_key(url, params)] = (
+                url, headers.get('ETag'), headers.get('Last-Modified'), body
+            )
+
+    def commit(self, url: str):
+        """Cache the staged responses of ``url`` now that they have been processed."""
+        now = time.time()
+        with self._lock:
+            for key, (pending_url, etag, last_modified, body) in list(self._pending.items()):
+                if pending_url != url:
+                    continue
+                del self._pending[key]
+                self._write_atomic(self._body_path(key), body)
+                self._entries[key] = self._changed[key] = CacheEntry(
+                    key=key,
+                    url=url,
+                    etag=etag,
+                    last_modified=last_modified,
+                    digest=hashlib.blake2b(body, digest_size=16).hexdigest(),
+                    size=len(body),
+                    stored_at=now,
+                    last_used=now,
+                )
+            self._save_index(evict=True)
+
+    def discard(self, url: str):
+        """Forget the staged responses of ``url``, e.g. after its import failed."""
+        with self._lock:
+            for key in [key for key, pending in self._pending.items() if pending[0] == url]:
+                del self._pending[key]
+
+    def _evict(self):
+        total = sum(entry.size for entry in self._entries.values())
+        for entry in sorted(self._entries.values(), key=lambda e: e.last_used):
+            if total <= self.max_bytes:
+                break
+            total -= entry.size
+            self._drop(entry.key)
+            self._logger.debug(f"Evicted cached response for {entry.url}")
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+            self._save_index()
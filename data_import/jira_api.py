@@ -1,87 +1,539 @@
 import aiohttp
 import asyncio
 import base64
+import contextlib
+import itertools
 import logging
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from data_import.data_processor import loads
+from data_import.http_cache import NOT_MODIFIED
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; only needed to stream large pages
+    ijson = None
 
 MAX_RETRIES = 3
-RETRY_DELAY = 5  # seconds to wait before retrying after a 503 error
+RETRY_DELAY = 5  # base back-off in seconds, doubled on every further attempt
+MAX_RETRY_DELAY = 60
+MAX_RETRY_AFTER = 300  # longest Retry-After, in seconds, waited for before giving up on a request
+RETRY_STATUSES = (429, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+RATE_LIMIT = 10  # requests per second allowed by the client-side token bucket
+NEAR_LIMIT_REMAINING = 5  # pause once Jira reports this few requests left in the window
+NEAR_LIMIT_PAUSE = 1  # seconds to hold off when no reset time is given
+RELATED_CONCURRENCY = 8  # issues fetched at once when related data has to be fetched per issue
+RELATED_PAGE_SIZE = 100
+BULK_CHANGELOG_ENDPOINT = "/rest/api/3/changelog/bulkfetch"
+BULK_CHANGELOG_ISSUES = 1000  # issues per bulk changelog request
+BULK_CHANGELOG_PAGE_SIZE = 1000
+
+# How each relation is embedded in search results and where its items live.
+RELATIONS = {
+    "changelog": {"embed": "expand", "embedded_items": "histories", "items": "values"},
+    "comment": {"embed": "fields", "embedded_items": "comments", "items": "comments"},
+    "worklog": {"embed": "fields", "embedded_items": "worklogs", "items": "worklogs"},
+}
 RECORDS_PER_PAGE = 50  # Default Jira pagination limit
+MAX_REQUESTS = 10  # in-flight requests across all endpoints of a run
+MAX_REQUESTS_PER_HOST = 6
+DNS_CACHE_TTL = 300  # seconds
+KEEPALIVE_TIMEOUT = 60  # seconds an idle connection is kept open
+REQUEST_TIMEOUT = 120  # seconds for a whole request, body included
+CONNECT_TIMEOUT = 15
+READ_TIMEOUT = 60
 
 logger = logging.getLogger(__name__)
 
 
+class RequestLimiter:
+    """Caps the requests in flight, both in total and per host, for every JiraAPI sharing it."""
+
+    def __init__(self, max_requests=MAX_REQUESTS, max_requests_per_host=MAX_REQUESTS_PER_HOST):
+        self.max_requests = max_requests
+        self.max_requests_per_host = max_requests_per_host
+        self._requests = asyncio.Semaphore(max_requests)
+        self._per_host = defaultdict(lambda: asyncio.Semaphore(self.max_requests_per_host))
+
+    @contextlib.asynccontextmanager
+    async def slot(self, url):
+        async with self._requests, self._per_host[urlsplit(url).netloc]:
+            yield
+
+
+class TokenBucket:
+    """Client-side rate limiter allowing ``rate`` requests per second with bursts up to ``capacity``."""
+
+    def __init__(self, rate=RATE_LIMIT, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Hand out no tokens for ``seconds``, e.g. while Jira asks clients to back off."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _parse_retry_after(value):
+    """Seconds to wait according to a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_reset(value):
+    """Seconds until the instant given by an ``X-RateLimit-Reset`` header (ISO 8601)."""
+    if not value:
+        return None
+    try:
+        reset = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return _parse_retry_after(value)
+    if reset.tzinfo is None:
+        reset = reset.replace(tzinfo=timezone.utc)
+    return max(0.0, (reset - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """The single retry and rate-limit policy used by every request of a JiraAPI.
+
+    Retries ``retry_statuses``, connection errors and truncated responses up to
+    ``max_retries`` attempts with jittered exponential back-off of at most
+    ``max_delay``. Jira's ``Retry-After`` is waited for in full instead, unless it
+    is longer than ``max_retry_after``, in which case the request fails. When a
+    ``TokenBucket`` is given, requests are paced through it and it is paused when
+    Jira throttles or reports through ``X-RateLimit-*`` headers that the quota is
+    nearly used up, so concurrent requests back off together.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, base_delay=RETRY_DELAY, max_delay=MAX_RETRY_DELAY,
+                 retry_statuses=RETRY_STATUSES, rate_limiter=None, max_retry_after=MAX_RETRY_AFTER):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = tuple(retry_statuses)
+        self.rate_limiter = rate_limiter
+
+    @staticmethod
+    def retry_after(headers):
+        return _parse_retry_after(headers.get("Retry-After")) if headers else None
+
+    def should_retry(self, status, attempt, headers=None):
+        if status not in self.retry_statuses or attempt >= self.max_retries:
+            return False
+        retry_after = self.retry_after(headers)
+        return retry_after is None or retry_after <= self.max_retry_after
+
+    def backoff(self, attempt, headers=None):
+        retry_after = self.retry_after(headers)
+        if retry_after is not None:
+            return retry_after
+        delay = self.base_delay * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+        return min(delay, self.max_delay)
+
+    async def wait_for_capacity(self):
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+
+    def throttled(self, delay):
+        """Make every request sharing the rate limiter wait out a throttling response."""
+        if self.rate_limiter:
+            self.rate_limiter.pause(delay)
+
+    def observe(self, headers):
+        """Pause ahead of time when Jira reports the rate-limit window is almost exhausted."""
+        if not self.rate_limiter:
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        near_limit = headers.get("X-RateLimit-NearLimit", "").lower() == "true"
+        try:
+            near_limit = near_limit or (remaining is not None and int(remaining) <= NEAR_LIMIT_REMAINING)
+        except ValueError:
+            pass
+        if near_limit:
+            reset = _parse_reset(headers.get("X-RateLimit-Reset"))
+            self.rate_limiter.pause(min(reset if reset is not None else NEAR_LIMIT_PAUSE, self.max_delay))
+
+
 class JiraAPI:
-    def __init__(self, base_url, email, api_token, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY, records_per_page=RECORDS_PER_PAGE, logger=None):
+    """Jira REST client owning one pooled ``aiohttp`` session for its whole lifetime.
+
+    Use it as an async context manager (or call ``open``/``close``) and share it
+    across every endpoint of a run so connections, TLS sessions and DNS lookups
+    are reused instead of being set up again for each endpoint.
+    """
+
+    def __init__(self, base_url, email, api_token, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY, records_per_page=RECORDS_PER_PAGE, logger=None,
+                 limiter=None, connection_limit=MAX_REQUESTS, connection_limit_per_host=MAX_REQUESTS_PER_HOST,
+                 dns_cache_ttl=DNS_CACHE_TTL, keepalive_timeout=KEEPALIVE_TIMEOUT, timeout=None,
+                 retry_policy=None, response_cache=None, metrics=None):
         self.base_url = base_url.rstrip("/")
         self.email = email
         self.api_token = api_token
         self.MAX_RETRIES = max_retries
         self.RETRY_DELAY = retry_delay
         self.RECORDS_PER_PAGE = records_per_page
+        self.limiter = limiter
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=max_retries, base_delay=retry_delay)
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = timeout or aiohttp.ClientTimeout(
+            total=REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+        )
+        self.response_cache = response_cache
+        self.metrics = metrics
+        self.session = None
+        self.bulk_changelog_supported = None
+        self._headers = self._build_headers()
         self._logger = logger or logging.getLogger(__name__)
         if not logger:
             logging.basicConfig(level=logging.DEBUG)
 
-    def _get_headers(self):
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """Create the pooled session; calling it again while open is a no-op."""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                limit_per_host=self.connection_limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=self._headers,
+                auto_decompress=True,
+            )
+        return self.session
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def _url(self, endpoint):
+        if endpoint.startswith(("http://", "https://")):
+            return endpoint
+        return f"{self.base_url}{endpoint}"
+
+    def _request_slot(self, url):
+        return self.limiter.slot(url) if self.limiter else contextlib.nullcontext()
+
+    def _build_headers(self):
         auth = f"{self.email}:{self.api_token}"
         auth_encoded = base64.b64encode(auth.encode("utf-8")).decode("utf-8")
         return {
             "Authorization": f"Basic {auth_encoded}",
             "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate, br",
         }
 
-    async def get_data(self, session, endpoint, params=None):
-        url = f"{self.base_url}{endpoint}"
-        headers = self._get_headers()
-        params = params or {}
-        params["maxResults"] = self.RECORDS_PER_PAGE
-        attempts = 0
+    def _get_headers(self):
+        return self._headers
 
-        while attempts < self.MAX_RETRIES:
+    async def request(self, session, url, params=None, listener=None, method="GET", json=None, decode=True,
+                      consume=None, conditional=False):
+        """Send a request (GET by default) under the client's retry policy and return the decoded body.
+
+        With ``decode=False`` the raw body is returned, e.g. to decode it in another process.
+        ``consume(response)`` replaces reading the body for successful responses and its
+        result is returned instead; it runs again from scratch if the request is retried.
+        With ``conditional`` and a ``response_cache``, the cached validators are sent and
+        ``NOT_MODIFIED`` is returned when the response did not change since it was cached.
+
+        Every attempt first takes a token from the policy's rate limiter and a slot
+        from the request limiter. Retryable statuses and connection errors are retried
+        with the policy's back-off (honouring ``Retry-After``); ``listener`` is told
+        about throttling (``throttled(status)``) and success (``succeeded()``).
+        Anything else that is not a 2xx raises ``aiohttp.ClientResponseError``.
+        With ``metrics``, the duration and body size of every attempt and every retry
+        are recorded under the URL's path.
+        """
+        session = session or self.session or await self.open()
+        policy = self.retry_policy
+        attempt = 0
+        cache = self.response_cache if conditional and method == "GET" and not consume else None
+        headers = self._headers
+        cached = None
+        if cache:
+            cached = cache.lookup(url, params)
+            headers = {**self._headers, **cache.conditional_headers(cached)}
+
+        while True:
+            attempt += 1
+            retry_status = None
+            retry_headers = None
+            await policy.wait_for_capacity()
+            started = time.perf_counter()
+            response = None
             try:
-                self._logger.info(f"Attempt {attempts + 1} of {self.MAX_RETRIES} to fetch data from {url}")
-                async with session.get(url, headers=headers, params=params) as response:
+                self._logger.debug(f"Attempt {attempt} of {policy.max_retries} to fetch data from {url}")
+                async with self._request_slot(url), session.request(
+                        method, url, headers=headers, params=params, json=json) as response:
+                    policy.observe(response.headers)
+                    if response.status == 304 and cached:
+                        cache.touch(cached)
+                        if listener:
+                            listener.succeeded()
+                        self._logger.debug(f"{url} not modified since it was cached")
+                        return NOT_MODIFIED
                     if response.status == 200:
-                        return await response.json()
-                    elif response.status == 503:
-                        self._logger.warning(f"503 Service Unavailable. Retrying after {self.RETRY_DELAY} seconds...")
-                        await asyncio.sleep(self.RETRY_DELAY)
-                    elif response.status in (400, 404):
-                        self._logger.warning(f"{response.status}: The server encountered an error. Response: {await response.text()}")
-                        break
-                    else:
-                        self._logger.error(f"Error {response.status}: {await response.text()}")
-                        raise Exception(f"Server error {response.status}: {await response.text()}")
-            except aiohttp.ClientError as e:
-                self._logger.error(f"Network error: {e}")
-                raise Exception(f"Network error while fetching Jira data: {e}")
-            attempts += 1
-
-        raise Exception(f"Failed to fetch data from Jira after {self.MAX_RETRIES} attempts.")
-
-    async def get_related_data(self, session, issue_id, relation):
+                        if consume:
+                            result = await consume(response)
+                        else:
+                            body = await response.read()
+                            if cache:
+                                if await asyncio.to_thread(cache.is_current, url, params, body):
+                                    if listener:
+                                        listener.succeeded()
+                                    self._logger.debug(f"{url} returned the cached response again")
+                                    return NOT_MODIFIED
+                                cache.stage(url, params, body, response.headers)
+                            result = loads(body) if decode else body
+                        if listener:
+                            listener.succeeded()
+                        return result
+                    if 200 < response.status < 300:
+                        return None
+                    if not policy.should_retry(response.status, attempt, response.headers):
+                        retry_after = policy.retry_after(response.headers)
+                        if retry_after is not None and retry_after > policy.max_retry_after:
+                            self._logger.error(f"{url} asks to retry after {retry_after:.0f} seconds; giving up")
+                        self._logger.error(f"Error {response.status} from {url}: {await response.text()}")
+                        response.raise_for_status()
+                    retry_status = response.status
+                    retry_headers = response.headers
+            except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if attempt >= policy.max_retries:
+                    self._logger.error(f"Network error: {e}")
+                    raise Exception(f"Network error while fetching Jira data: {e}")
+                self._logger.warning(f"Network error on attempt {attempt}: {e}")
+            finally:
+                if self.metrics:
+                    self._record_attempt(url, started, response)
+
+            if self.metrics:
+                self.metrics.inc("jira_import_http_retries_total", path=urlsplit(url).path,
+                                 status=retry_status or "error")
+            delay = policy.backoff(attempt, retry_headers)
+            if retry_status in THROTTLE_STATUSES:
+                policy.throttled(delay)
+                if listener:
+                    listener.throttled(retry_status)
+            self._logger.warning(
+                f"{retry_status or 'Network error'} from {url}. Retrying after {delay:.1f} seconds... "
+                f"(attempt {attempt}/{policy.max_retries})"
+            )
+            # Sleep outside the request slot so other requests can use it meanwhile.
+            await asyncio.sleep(delay)
+
+    def _record_attempt(self, url, started, response):
+        path = urlsplit(url).path
+        self.metrics.observe("jira_import_http_request_seconds", time.perf_counter() - started, path=path)
+        if response is not None:
+            self.metrics.inc("jira_import_http_response_bytes_total", response.content.total_bytes, path=path)
+
+    async def get_data(self, session, endpoint, params=None, listener=None, decode=True, conditional=False):
+        """Fetch one page; ``session`` may be ``None`` to use the client's own pooled session.
+
+        ``conditional`` pages may come back as ``NOT_MODIFIED`` (see ``request``).
+        """
+        params = params or {}
+        params["maxResults"] = self.RECORDS_PER_PAGE
+        return await self.request(session, self._url(endpoint), params=params, listener=listener, decode=decode,
+                                  conditional=conditional)
+
+    async def commit_cached(self, endpoint, succeeded=True):
+        """Cache (or, if processing failed, drop) the staged responses of ``endpoint``."""
+        if self.response_cache is None:
+            return
+        if succeeded:
+            await asyncio.to_thread(self.response_cache.commit, self._url(endpoint))
+        else:
+            self.response_cache.discard(self._url(endpoint))
+
+    async def stream_data(self, session, endpoint, build, params=None, listener=None, entries_key="issues"):
+        """Fetch one page and hand its entries to ``build`` while they are being decoded.
+
+        ``build`` receives an async iterator over the ``entries_key`` array, which is
+        parsed incrementally from the response stream with ijson, so no more than one
+        entry is decoded at a time; whatever ``build`` returns is returned. Other keys
+        of the response (such as ``total``) are not available in this mode.
+        """
+        if ijson is None:
+            raise RuntimeError("Streaming responses requires the optional ijson package")
+        params = params or {}
+        params["maxResults"] = self.RECORDS_PER_PAGE
+
+        async def consume(response):
+            return await build(ijson.items_async(response.content, f"{entries_key}.item", use_float=True))
+
+        return await self.request(session, self._url(endpoint), params=params, listener=listener, consume=consume)
+
+    async def get_related_data(self, session, issue_id, relation, params=None):
         url = f"{self.base_url}/rest/api/3/issue/{issue_id}/{relation}"
-        headers = self._get_headers()
-        attempts = 0
+        self._logger.debug(f"Fetching related data ({relation}) for issue {issue_id} from {url}")
+        return await self.request(session, url, params=params)
+
+    @staticmethod
+    def related_search_params(relations):
+        """Search parameters that make Jira embed ``relations`` in every returned issue."""
+        expand = [relation for relation in relations if RELATIONS[relation]["embed"] == "expand"]
+        fields = [relation for relation in relations if RELATIONS[relation]["embed"] == "fields"]
+        params = {}
+        if expand:
+            params["expand"] = ",".join(expand)
+        if fields:
+            params["fields"] = ",".join(["*navigable"] + fields)
+        return params
+
+    @staticmethod
+    def embedded_related(issue, relation):
+        """Return ``(items, complete)`` for ``relation`` embedded in a search result issue.
+
+        ``items`` is ``None`` when the issue does not embed the relation at all;
+        ``complete`` is false when Jira truncated the embedded list.
+        """
+        container = issue.get(relation) if relation == "changelog" else (issue.get("fields") or {}).get(relation)
+        if not isinstance(container, dict):
+            return None, False
+        items = container.get(RELATIONS[relation]["embedded_items"]) or []
+        total = container.get("total", len(items))
+        return items, len(items) >= total
 
-        while attempts < self.MAX_RETRIES:
+    async def fetch_all_related(self, session, issue_id, relation):
+        """Fetch every page of ``relation`` for one issue."""
+        items_key = RELATIONS[relation]["items"]
+        items = []
+        start_at = 0
+        while True:
+            page = await self.get_related_data(
+                session, issue_id, relation, params={"startAt": start_at, "maxResults": RELATED_PAGE_SIZE}
+            )
+            if not page:
+                return items
+            batch = page.get(items_key) or []
+            items.extend(batch)
+            start_at += len(batch)
+            if not batch or page.get("isLast") or start_at >= page.get("total", 0):
+                return items
+
+    async def bulk_fetch_changelogs(self, session, issue_ids):
+        """Yield ``(issue_id, histories)`` using Jira Cloud's bulk changelog endpoint."""
+        url = f"{self.base_url}{BULK_CHANGELOG_ENDPOINT}"
+        for offset in range(0, len(issue_ids), BULK_CHANGELOG_ISSUES):
+            chunk = issue_ids[offset:offset + BULK_CHANGELOG_ISSUES]
+            histories = {issue_id: [] for issue_id in chunk}
+            next_page_token = None
+            while True:
+                body = {"issueIdsOrKeys": chunk, "maxResults": BULK_CHANGELOG_PAGE_SIZE}
+                if next_page_token:
+                    body["nextPageToken"] = next_page_token
+                page = await self.request(session, url, method="POST", json=body) or {}
+                for changelog in page.get("issueChangeLogs") or []:
+                    histories.setdefault(str(changelog.get("issueId")), []).extend(changelog.get("changeHistories") or [])
+                next_page_token = page.get("nextPageToken")
+                if not next_page_token:
+                    break
+            for issue_id, items in histories.items():
+                yield issue_id, items
+
+    async def iter_related_data(self, session, issues, relation, concurrency=RELATED_CONCURRENCY):
+        """Yield ``(issue_id, items)`` for ``relation`` of every issue, batching requests.
+
+        ``issues`` may hold issue ids or search result issues. Relations embedded
+        completely in search results (see ``related_search_params``) cost no request;
+        changelogs of the remaining issues go through the bulk changelog endpoint when
+        the site has it, and everything else falls back to a fan-out of per-issue
+        requests with at most ``concurrency`` issues in flight. Results are yielded as
+        soon as they are available, not in input order.
+        """
+        if relation not in RELATIONS:
+            raise ValueError(f"Unknown relation: {relation}")
+
+        pending = []
+        for issue in issues:
+            if isinstance(issue, dict):
+                items, complete = self.embedded_related(issue, relation)
+                if complete:
+                    yield str(issue["id"]), items
+                    continue
+                issue = issue["id"]
+            pending.append(str(issue))
+
+        if not pending:
+            return
+
+        if relation == "changelog" and self.bulk_changelog_supported is not False:
             try:
-                self._logger.info(f"Fetching related data ({relation}) for issue {issue_id} from {url}")
-                async with session.get(url, headers=headers) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    elif response.status in (400, 404):
-                        self._logger.warning(f"Error {response.status}: {await response.text()}")
-                        break
-                    else:
-                        self._logger.error(f"Error {response.status}: {await response.text()}")
-                        raise Exception(f"Server error {response.status}: {await response.text()}")
-            except aiohttp.ClientError as e:
-                self._logger.error(f"Network error: {e}")
-                raise Exception(f"Network error while fetching Jira related data: {e}")
-            attempts += 1
+                async for issue_id, items in self.bulk_fetch_changelogs(session, pending):
+                    self.bulk_changelog_supported = True
+                    yield issue_id, items
+                return
+            except aiohttp.ClientResponseError as e:
+                if e.status not in (404, 405) or self.bulk_changelog_supported:
+                    raise
+                self._logger.info("Bulk changelog endpoint not available; fetching changelogs per issue")
+                self.bulk_changelog_supported = False
+
+        async def fetch(issue_id):
+            return issue_id, await self.fetch_all_related(session, issue_id, relation)
 
-        raise Exception(f"Failed to fetch related data from Jira after {self.MAX_RETRIES} attempts.")
+        remaining = iter(pending)
+        in_flight = set()
+        try:
+            while True:
+                for issue_id in itertools.islice(remaining, max(concurrency, 1) - len(in_flight)):
+                    in_flight.add(asyncio.create_task(fetch(issue_id)))
+                if not in_flight:
+                    return
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
 
 
 # Example usage
@@ -91,8 +543,8 @@ async def main():
         email="your-email@example.com",
         api_token="your-api-token"
     )
-    async with aiohttp.ClientSession() as session:
-        issues = await jira_api.get_data(session, "/rest/api/3/search", params={"jql": "project=TEST"})
+    async with jira_api:
+        issues = await jira_api.get_data(None, "/rest/api/3/search", params={"jql": "project=TEST"})
         print(issues)
 
 
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import uuid
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+import redis
+from django.conf import settings
+
+LOCK_TIMEOUT = 2 * 60 * 60  # seconds before a lock held by a crashed worker expires
+LOCK_RENEW_INTERVAL = 5 * 60  # seconds between renewals of the lock of a running import
+LOCK_PREFIX = 'data_import:lock:'
+
+T = TypeVar('T')
+
+_client: Optional[redis.Redis] = None
+
+
+class LockLostError(Exception):
+    """Raised when a running import can no longer renew its endpoint's lock."""
+
+
+def get_redis() -> redis.Redis:
+    """Redis connection for import locks; ``DATA_IMPORT_LOCK_URL`` defaults to the Celery broker."""
+    global _client
+    if _client is None:
+        url = getattr(settings, 'DATA_IMPORT_LOCK_URL', None) or settings.CELERY_BROKER_URL
+        _client = redis.Redis.from_url(url)
+    return _client
+
+
+def _lock(endpoint: str, timeout: int = LOCK_TIMEOUT) -> redis.lock.Lock:
+    # Not thread local, so that the lock can be released by another task than the one that took it.
+    return get_redis().lock(f"{LOCK_PREFIX}{endpoint}", timeout=timeout, thread_local=False)
+
+
+def acquire_endpoint_lock(endpoint: str, timeout: int = LOCK_TIMEOUT) -> Optional[str]:
+    """Take the distributed import lock of ``endpoint`` without waiting for it.
+
+    Returns the token to release it with, or ``None`` when another import holds
+    it. The token can be handed to whichever process finishes the import, e.g.
+    the callback of a chord of shard tasks.
+    """
+    token = uuid.uuid4().hex
+    return token if _lock(endpoint, timeout).acquire(blocking=False, token=token) else None
+
+
+def release_endpoint_lock(endpoint: str, token: str, logger: Optional[logging.Logger] = None):
+    """Release the import lock of ``endpoint`` taken with ``token``; a lock held by someone else is left alone."""
+    lock = _lock(endpoint)
+    lock.local.token = token.encode('utf-8')
+    try:
+        lock.release()
+    except redis.exceptions.LockError:
+        (logger or logging.getLogger(__name__)).warning(
+            f"Import lock of {endpoint} expired before the import finished"
+        )
+
+
+def extend_endpoint_lock(endpoint: str, token: str, timeout: int = LOCK_TIMEOUT) -> bool:
+    """Let the import lock of ``endpoint`` taken with ``token`` expire ``timeout`` seconds from now.
+
+    Returns ``False`` when the lock is no longer held with ``token``, i.e. it
+    expired and may have been taken by another import.
+    """
+    lock = _lock(endpoint, timeout)
+    lock.local.token = token.encode('utf-8')
+    try:
+        lock.reacquire()
+    except redis.exceptions.LockError:
+        return False
+    return True
+
+
+async def hold_endpoint_lock(endpoint: str, token: str, work: Awaitable[T],
+                             interval: float = LOCK_RENEW_INTERVAL) -> T:
+    """Await ``work`` while renewing the import lock of ``endpoint`` every ``interval`` seconds.
+
+    An import can thus run longer than ``LOCK_TIMEOUT``, while the lock of one that
+    died still expires. When the lock cannot be renewed another import may already
+    be running, so ``work`` is cancelled and ``LockLostError`` raised.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=interval)
+            if done:
+                return task.result()
+            if not await asyncio.to_thread(extend_endpoint_lock, endpoint, token):
+                raise LockLostError(f"Import lock of {endpoint} expired or was taken over; stopping the import")
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+@contextmanager
+def endpoint_lock(endpoint: str, timeout: int = LOCK_TIMEOUT,
+                  logger: Optional[logging.Logger] = None) -> Iterator[Optional[str]]:
+    """Hold the distributed import lock of ``endpoint`` if nobody else does.
+
+    Yields the lock's token, or ``None`` when it was not acquired; it is never
+    waited for, so an import that finds its endpoint already being imported can
+    simply be skipped. The lock expires after ``timeout`` seconds in case its
+    holder dies without releasing it, unless it is renewed (``hold_endpoint_lock``).
+    """
+    token = acquire_endpoint_lock(endpoint, timeout)
+    try:
+        yield token
+    finally:
+        if token is not None:
+            release_endpoint_lock(endpoint, token, logger)
@@ -0,0 +1,147 @@
+import logging
+import random
+import time
+import uuid
+from datetime import datetime as DateTime, timedelta, timezone
+from typing import Any, Dict, List
+
+from dateutil.parser import parse as parse_date
+from django.core.management.base import BaseCommand
+
+from data_import.base_processor import BaseProcessor, FieldMapping, FieldType
+from data_import.data_processor import DataProcessor
+
+DEFAULT_RECORDS = 100_000
+DEFAULT_REPEAT = 3
+
+
+class SyntheticIssueProcessor(BaseProcessor):
+    """Processor with one mapping of every field type, shaped like a Jira issue."""
+    field_mappings = {
+        'id': FieldMapping('id', 'id', 'string', required=True, is_primary_key=True),
+        'key': FieldMapping('key', 'key', 'string'),
+        'external_id': FieldMapping('externalId', 'external_id', 'uuid'),
+        'created': FieldMapping('created', 'created', 'datetime'),
+        'updated': FieldMapping('updated', 'updated', 'datetime'),
+        'resolved': FieldMapping('resolutiondate', 'resolved', 'datetime'),
+        'story_points': FieldMapping('storyPoints', 'story_points', 'float'),
+        'priority': FieldMapping('priorityId', 'priority', 'int'),
+        'subtask': FieldMapping('subtask', 'subtask', 'boolean'),
+        'summary': FieldMapping('summary', 'summary', 'string'),
+        'status': FieldMapping('status', 'status', 'json'),
+    }
+
+
+def build_payload(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic issue entries using Jira's timestamp format."""
+    rng = random.Random(seed)
+    start = DateTime(2020, 1, 1, tzinfo=timezone.utc)
+    entries = []
+    for i in range(count):
+        created = start + timedelta(minutes=rng.randrange(2_000_000))
+        updated = created + timedelta(minutes=rng.randrange(50_000))
+        entries.append({
+            'id': str(10000 + i),
+            'key': f"PRJ-{i}",
+            'externalId': str(uuid.UUID(int=rng.getrandbits(128))),
+            'created': created.strftime('%Y-%m-%dT%H:%M:%S.000%z'),
+            'updated': updated.strftime('%Y-%m-%dT%H:%M:%S.000%z'),
+            'resolutiondate': updated.strftime('%Y-%m-%dT%H:%M:%S.000%z') if i % 3 else None,
+            'storyPoints': rng.choice([None, 1.0, 2.0, 3.0, 5.0, 8.0]),
+            'priorityId': str(rng.randrange(1, 6)),
+            'subtask': i % 7 == 0,
+            'summary': f"Synthetic issue {i}",
+            'status': {'id': str(rng.randrange(1, 10)), 'name': 'In Progress'},
+        })
+    return entries
+
+
+def legacy_parse_value(processor: BaseProcessor, value: Any, field_type: FieldType, field_name: str) -> Any:
+    """The if/elif parser that ``extract_data`` used before mappings were compiled."""
+    if value is None:
+        return None
+
+    try:
+        if field_type == FieldType.UUID:
+            return uuid.UUID(value) if processor.is_valid_uuid(value) else None
+        elif field_type == FieldType.DATETIME:
+            return parse_date(value) if value else None
+        elif field_type == FieldType.BOOLEAN:
+            return bool(value)
+        elif field_type == FieldType.INTEGER:
+            return int(value) if value else None
+        elif field_type == FieldType.FLOAT:
+            return float(value) if value else None
+        elif field_type == FieldType.STRING:
+            return str(value) if value else ''
+        elif field_type == FieldType.JSON:
+            return value if isinstance(value, dict) else None
+        return value
+    except Exception as e:
+        processor.logger.warning(f"Failed to parse {field_name} ({field_type.value}): {str(e)}")
+        return None
+
+
+def legacy_extract_data(processor: BaseProcessor, entry: Dict[str, Any],
+                        field_mappings: Dict[str, FieldMapping]) -> Dict[str, Any]:
+    data = {}
+    has_required_fields = True
+
+    for key, mapping in field_mappings.items():
+        value = entry.get(mapping.json_field)
+        parsed_value = legacy_parse_value(processor, value, mapping.field_type, key)
+
+        if mapping.required and parsed_value is None:
+            processor.logger.error(f"Missing required field: {key}")
+            has_required_fields = False
+            continue
+
+        data[mapping.model_field] = parsed_value if parsed_value is not None else mapping.default
+
+    return data if has_required_fields else {}
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks field extraction (records/sec) with the legacy parser and the compiled mappings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--records',
+            type=int,
+            default=DEFAULT_RECORDS,
+            help=f'Number of synthetic issues to extract (default: {DEFAULT_RECORDS})'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=DEFAULT_REPEAT,
+            help=f'Runs per variant; the best run is reported (default: {DEFAULT_REPEAT})'
+        )
+
+    def _time(self, extract, entries, repeat: int) -> float:
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for entry in entries:
+                extract(entry)
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    def handle(self, *args: Any, **options: Dict[str, Any]):
+        logger = logging.getLogger(__name__)
+        processor = SyntheticIssueProcessor(logger, DataProcessor(logger))
+        mappings = processor.field_mappings
+        entries = build_payload(options['records'])
+        repeat = max(1, options['repeat'])
+
+        if legacy_extract_data(processor, entries[0], mappings) != processor.extract_data(entries[0], mappings):
+            self.stderr.write("Legacy and compiled extraction disagree on the first record")
+
+        legacy = self._time(lambda entry: legacy_extract_data(processor, entry, mappings), entries, repeat)
+        compiled = self._time(lambda entry: processor.extract_data(entry, mappings), entries, repeat)
+
+        count = len(entries)
+        self.stdout.write(f"records:  {count}")
+        self.stdout.write(f"before:   {count / legacy:,.0f} records/sec ({legacy:.2f}s)")
+        self.stdout.write(f"after:    {count / compiled:,.0f} records/sec ({compiled:.2f}s)")
+        self.stdout.write(f"speedup:  {legacy / compiled:.1f}x")
@@ -0,0 +1,155 @@
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+
+from data_import import flow_metrics
+from data_import.flow_metrics import DAY, TransitionColumns, cumulative_flow, cycle_times
+
+DEFAULT_ISSUES = 200_000
+DEFAULT_REPEAT = 3
+# Synthetic workflow: (status id, status name, category).
+WORKFLOW = (
+    ('1', 'To Do', 'new'),
+    ('3', 'In Progress', 'indeterminate'),
+    ('4', 'In Review', 'indeterminate'),
+    ('5', 'Done', 'done'),
+)
+
+
+def build_transitions(issues: int, seed: int = 0) -> List[Tuple[str, str, str, str, float]]:
+    """Synthetic ``(issue_id, issue_type_id, status_id, status_name, timestamp)`` rows, some issues still open."""
+    rng = random.Random(seed)
+    start = 1_577_836_800  # 2020-01-01
+    rows = []
+    for i in range(issues):
+        issue_id = str(10000 + i)
+        issue_type = str(1 + rng.randrange(5))
+        at = start + rng.randrange(4 * 365 * DAY)
+        steps = WORKFLOW[:1 + rng.randrange(len(WORKFLOW))]
+        if len(steps) >= 3 and rng.random() < 0.3:
+            steps = steps[:3] + (WORKFLOW[1], WORKFLOW[2]) + steps[3:]  # sent back once
+        for status_id, name, _ in steps:
+            rows.append((issue_id, issue_type, status_id, name, float(at)))
+            at += rng.randrange(DAY // 4, 10 * DAY)
+    rng.shuffle(rows)
+    return rows
+
+
+def loop_cycle_times(rows: Iterable[Tuple], start_statuses: set, done_statuses: set) -> List[int]:
+    """Row-by-row cycle times, the way an ORM loop over transitions computes them."""
+    by_issue: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+    for issue_id, _, status_id, _, at in rows:
+        by_issue[issue_id].append((at, status_id))
+    durations = []
+    for transitions in by_issue.values():
+        transitions.sort()
+        started = next((at for at, status in transitions if status in start_statuses), None)
+        last_at, last_status = transitions[-1]
+        if started is not None and last_status in done_statuses and last_at >= started:
+            durations.append(int(last_at - started))
+    return durations
+
+
+def loop_cumulative_flow(rows: Iterable[Tuple], start: float, end: float) -> Dict[str, List[int]]:
+    """Row-by-row cumulative flow: walk every day of every status interval."""
+    by_issue: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+    for issue_id, _, status_id, _, at in rows:
+        by_issue[issue_id].append((at, status_id))
+    origin = int(start) - int(start) % DAY
+    days = max(1, -(-(int(end) - origin) // DAY))
+    counts: Dict[str, List[int]] = defaultdict(lambda: [0] * days)
+    for transitions in by_issue.values():
+        transitions.sort()
+        for index, (at, status) in enumerate(transitions):
+            first = max(0, (int(at) - origin) // DAY)
+            last = (int(transitions[index + 1][0]) - origin) // DAY if index + 1 < len(transitions) else days
+            for day in range(first, min(last, days)):
+                counts[status][day] += 1
+    return counts
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks cycle time and cumulative flow computation: vectorized NumPy columns '
+            'against a row-by-row loop, on synthetic or imported transitions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--issues',
+            type=int,
+            default=DEFAULT_ISSUES,
+            help=f'Synthetic issues to generate transitions for (default: {DEFAULT_ISSUES})'
+        )
+        parser.add_argument(
+            '--from-db',
+            action='store_true',
+            help='Use the imported IssueTransition rows instead of synthetic ones.'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=DEFAULT_REPEAT,
+            help=f'Runs per variant; the best run is reported (default: {DEFAULT_REPEAT})'
+        )
+
+    @staticmethod
+    def _time(run, repeat: int) -> Tuple[float, Any]:
+        best = float('inf')
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            best = min(best, time.perf_counter() - started)
+        return best, result
+
+    def handle(self, *args: Any, **options: Dict[str, Any]):
+        repeat = max(1, options['repeat'])
+        if options['from_db']:
+            from data_import.models import IssueTransition
+            rows = [
+                (issue_id, '', status_id, name, at.timestamp())
+                for issue_id, status_id, name, at in IssueTransition.objects.values_list(
+                    'issue_id', 'to_status_id', 'to_status', 'transitioned_at').iterator()
+            ]
+            categories = flow_metrics.status_categories()
+        else:
+            rows = build_transitions(options['issues'])
+            categories = defaultdict(set)
+            for _, name, category in WORKFLOW:
+                categories[category].add(name)
+        if not rows:
+            raise CommandError("No transitions to benchmark")
+
+        start_names = categories.get(flow_metrics.START_CATEGORY, set())
+        done_names = categories.get(flow_metrics.DONE_CATEGORY, set())
+        status_ids = {name: status_id for _, _, status_id, name, _ in rows}
+        start_ids = {status_ids[name] for name in start_names if name in status_ids}
+        done_ids = {status_ids[name] for name in done_names if name in status_ids}
+        first = min(row[4] for row in rows)
+        last = max(row[4] for row in rows)
+
+        load_time, columns = self._time(lambda: TransitionColumns.from_rows(rows), repeat)
+        start_codes = columns.status_codes(start_names)
+        done_codes = columns.status_codes(done_names)
+
+        loop_cycle, loop_durations = self._time(lambda: loop_cycle_times(rows, start_ids, done_ids), repeat)
+        vector_cycle, (_, durations) = self._time(lambda: cycle_times(columns, start_codes, done_codes), repeat)
+        if sorted(loop_durations) != sorted(durations.tolist()):
+            self.stderr.write("Loop and vectorized cycle times disagree")
+
+        loop_cfd, _ = self._time(lambda: loop_cumulative_flow(rows, first, last), repeat)
+        vector_cfd, _ = self._time(lambda: cumulative_flow(columns, first, last), repeat)
+
+        summary = flow_metrics.distribution(durations)
+        self.stdout.write(f"transitions:  {len(rows)} of {len(columns.issues)} issues "
+                          f"(columns built in {load_time:.2f}s)")
+        self.stdout.write(f"cycle time:   loop {loop_cycle:.3f}s, vectorized {vector_cycle:.3f}s "
+                          f"({loop_cycle / vector_cycle:.1f}x)")
+        self.stdout.write(f"cumulative flow: loop {loop_cfd:.3f}s, vectorized {vector_cfd:.3f}s "
+                          f"({loop_cfd / vector_cfd:.1f}x)")
+        self.stdout.write(
+            f"cycle time p50/p85/p95: {summary['p50_days']:.1f} / {summary['p85_days']:.1f} / "
+            f"{summary['p95_days']:.1f} days over {summary['count']} finished issues"
+        )
@@ -0,0 +1,236 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from data_import.fixture_server import FIXTURE_PAGE_SIZE, FIXTURE_TOTAL, FixtureConfig, JiraFixtureServer
+from data_import.management.commands.import_jira_data import (
+    BATCH_SIZE, INITIAL_CONCURRENT_FETCHES, Command as ImportCommand, ImportOptions
+)
+from data_import.models import SyncState
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is not reported there
+    resource = None
+
+
+@dataclass
+class RunStats:
+    concurrency: int
+    page_size: int
+    elapsed: float = 0.0
+    rows: int = 0
+    page_latencies: List[float] = field(default_factory=list)
+    # Peak RSS of the whole benchmark process so far, not of this configuration alone.
+    process_peak_rss_mb: Optional[float] = None
+
+    def percentile(self, share: float) -> float:
+        if not self.page_latencies:
+            return 0.0
+        ordered = sorted(self.page_latencies)
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def process_peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MB (``ru_maxrss`` is in KB on Linux).
+
+    Configurations run one after another in the same process, so a configuration
+    only shows up in it when it needs more memory than the ones before.
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class BenchmarkImport(ImportCommand):
+    """``import_jira_data`` pointed at a fixture server, timing every page it fetches."""
+
+    def __init__(self, server_url: str, page_size: int, stats: RunStats, logger: logging.Logger):
+        super().__init__(logger)
+        self.server_url = server_url
+        self.page_size = page_size
+        self.stats = stats
+
+    def endpoint_url(self, endpoint: str) -> str:
+        return f"{self.server_url}{urlsplit(super().endpoint_url(endpoint)).path}"
+
+    async def fetch_page(self, *args, **kwargs):
+        started = time.perf_counter()
+        page = await super().fetch_page(*args, **kwargs)
+        self.stats.page_latencies.append(time.perf_counter() - started)
+        return page
+
+    async def fetch_and_process_paginated_data(self, *args, **kwargs):
+        rows = await super().fetch_and_process_paginated_data(*args, **kwargs)
+        self.stats.rows += rows
+        return rows
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks import_jira_data end to end against a local Jira fixture server, reporting '
+            'pages/sec, rows/sec and page latency per configuration, and the peak RSS of the process. '
+            'Imports into a throwaway test database unless --use-configured-database is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoint',
+            type=str,
+            default='issues',
+            help='Endpoint to import (default: issues)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            nargs='+',
+            default=[INITIAL_CONCURRENT_FETCHES],
+            help=f'Values of --max-concurrent to benchmark (default: {INITIAL_CONCURRENT_FETCHES})'
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            nargs='+',
+            default=[BATCH_SIZE],
+            help=f'Page sizes (maxResults) to benchmark (default: {BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help='Runs per configuration (default: 1)'
+        )
+        parser.add_argument(
+            '--total',
+            type=int,
+            default=FIXTURE_TOTAL,
+            help=f'Issues served by the fixture server (default: {FIXTURE_TOTAL})'
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.05,
+            help='Seconds the fixture server waits before every response (default: 0.05)'
+        )
+        parser.add_argument(
+            '--jitter',
+            type=float,
+            default=0.0,
+            help='Up to this many extra seconds of random latency per response (default: 0)'
+        )
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0.0,
+            help='Share of requests answered with an injected 429 or 503 (default: 0)'
+        )
+        parser.add_argument(
+            '--retry-after',
+            type=float,
+            default=1.0,
+            help='Retry-After seconds sent with injected errors (default: 1)'
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            default=0,
+            help='Requests per second allowed by the client-side rate limiter, as for import_jira_data '
+                 '(default: 0, disabled, so it does not cap the concurrency being measured)'
+        )
+        parser.add_argument(
+            '--replay',
+            type=str,
+            help='Directory of responses recorded with data_import.fixture_server to serve instead of synthetic data'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Transform worker processes, as for import_jira_data (default: 0)'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Stream pages while they download, as for import_jira_data'
+        )
+        parser.add_argument(
+            '--use-configured-database',
+            action='store_true',
+            help='Import into the configured database, e.g. to benchmark PostgreSQL as deployed. This writes '
+                 'synthetic issues and rollups and resets the sync watermark of the endpoint.'
+        )
+
+    def handle(self, *args: Any, **options: Dict[str, Any]):
+        logger = logging.getLogger(__name__)
+        if options['stream'] and options['workers']:
+            raise CommandError("--stream and --workers cannot be combined")
+        page_sizes = options['page_size']
+        server = JiraFixtureServer(FixtureConfig(
+            total=options['total'],
+            max_page_size=max(FIXTURE_PAGE_SIZE, *page_sizes),
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            retry_after=options['retry_after'],
+            recordings=options['replay'],
+        ), logger)
+        old_database = None
+        if not options['use_configured_database']:
+            # Same database engine and schema as configured, without touching its data.
+            old_database = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        server_url = server.start_in_thread()
+        # The fixture server accepts any credentials. Processors build their URLs from
+        # JIRA_SERVER, so it does not have to be configured for a benchmark either.
+        os.environ.update(JIRA_SERVER=f"{server_url}/", JIRA_BASE_URL=server_url,
+                          JIRA_USER='benchmark', JIRA_API_TOKEN='benchmark')
+
+        try:
+            configurations = itertools.product(options['concurrency'], page_sizes, range(max(1, options['repeat'])))
+            for concurrency, page_size, _ in configurations:
+                # New content every run, so no row is skipped as unchanged, and a full
+                # import rather than an incremental one from the previous run's watermark.
+                server.generation += 1
+                SyncState.objects.filter(endpoint=options['endpoint']).delete()
+                stats = RunStats(concurrency=concurrency, page_size=page_size)
+                importer = BenchmarkImport(server_url, page_size, stats, logger)
+                import_options = ImportOptions(
+                    max_concurrent=concurrency,
+                    workers=options['workers'],
+                    stream=options['stream'],
+                    rate_limit=options['rate_limit'],
+                    response_cache=False,
+                    # Nothing else imports the fixture server's data.
+                    lock=False,
+                )
+                started = time.perf_counter()
+                asyncio.run(importer.async_handle(options['endpoint'], import_options))
+                stats.elapsed = time.perf_counter() - started
+                stats.process_peak_rss_mb = process_peak_rss_mb()
+                if importer.failed_endpoints:
+                    raise CommandError(f"Import failed with concurrency={concurrency}, page size={page_size}")
+                self.report(stats)
+        finally:
+            server.stop_thread()
+            if old_database is not None:
+                connection.creation.destroy_test_db(old_database, verbosity=0)
+
+        self.stdout.write(
+            f"{server.requests} requests served, {server.throttled} answered with an injected error"
+        )
+
+    def report(self, stats: RunStats):
+        pages = len(stats.page_latencies)
+        elapsed = stats.elapsed or float('inf')
+        rss = f"{stats.process_peak_rss_mb:,.0f} MB" if stats.process_peak_rss_mb is not None else 'n/a'
+        self.stdout.write(
+            f"concurrency={stats.concurrency:<3} page_size={stats.page_size:<4} "
+            f"pages/sec={pages / elapsed:8.1f} rows/sec={stats.rows / elapsed:9.1f} "
+            f"p50={stats.percentile(0.5) * 1000:7.1f}ms p99={stats.percentile(0.99) * 1000:7.1f}ms "
+            f"process_peak_rss={rss} ({stats.rows} rows, {pages} pages in {stats.elapsed:.2f}s)"
+        )
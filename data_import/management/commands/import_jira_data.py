@@ -1,27 +1,65 @@
+import json
 import logging
 import os
-import aiohttp
 import asyncio
-from asgiref.sync import sync_to_async
-from django.core.management.base import BaseCommand
-from data_import.jira_api import JiraAPI  # Adjusted import
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from data_import.jira_api import (
+    ijson, JiraAPI, RequestLimiter, RetryPolicy, TokenBucket, MAX_REQUESTS, MAX_REQUESTS_PER_HOST, RATE_LIMIT
+)
 from data_import.data_processor import DataProcessor
+from data_import.base_processor import PreparedBatch
 from data_import.registry import ProcessorRegistry
-from datetime import datetime as DateTime
-from typing import Optional, Dict, Any, List
-import random
+from data_import.pipeline import ImportPipeline, PIPELINE_QUEUE_SIZE
+from data_import.bulk_loader import CopyLoader
+from data_import.scheduler import EndpointScheduler, FetchWindow, DEFAULT_PARALLEL_ENDPOINTS
+from data_import.sync import (
+    KeysetCursor, WatermarkTracker, build_page_params, load_sync_state, plan_windows, query_start, window_start_at
+)
+from data_import.checkpoint import IncompleteImportError, RunCheckpoint
+from data_import.locks import LockLostError, endpoint_lock, hold_endpoint_lock
+from data_import.transform import create_pool
+from data_import.db_writer import DBWriter, COMMIT_INTERVAL, COMMIT_ROWS
+from data_import.http_cache import NOT_MODIFIED, ResponseCache, CACHE_MAX_BYTES, CACHE_TTL
+from data_import.metrics import ImportMetrics, PUBLISHED_MAX_AGE
+from data_import.profiling import ImportProfiler, CPROFILE, PROFILE_MODES
+from dataclasses import dataclass
+from datetime import datetime as DateTime, timezone as dt_timezone
+from typing import Optional, Dict, Any, Callable, Iterable, Tuple, AsyncIterator
+import itertools
+import math
 
 logger = logging.getLogger(__name__)
 BATCH_SIZE = 50  # Default maxResults for Jira API
 INITIAL_CONCURRENT_FETCHES = 3
-MIN_CONCURRENT_FETCHES = 1
 MAX_RETRY_DELAY = 30
 INITIAL_RETRY_DELAY = 10
 MAX_RETRIES = 5
 
 
+@dataclass
+class ImportOptions:
+    max_concurrent: int = INITIAL_CONCURRENT_FETCHES
+    queue_size: int = PIPELINE_QUEUE_SIZE
+    initial_load: bool = False
+    max_parallel_endpoints: int = DEFAULT_PARALLEL_ENDPOINTS
+    max_requests: int = MAX_REQUESTS
+    max_requests_per_host: int = MAX_REQUESTS_PER_HOST
+    rate_limit: float = RATE_LIMIT
+    resume: bool = False
+    workers: int = 0
+    commit_rows: int = COMMIT_ROWS
+    commit_interval: float = COMMIT_INTERVAL
+    stream: bool = False
+    response_cache: bool = True
+    # Take each endpoint's distributed import lock; off when the caller already holds it.
+    lock: bool = True
+
+
 class Command(BaseCommand):
-    help = 'Imports data from Jira API and processes it sequentially for each endpoint.'
+    help = 'Imports data from Jira API, running independent endpoints in parallel.'
+    # maxResults of every page request; checkpoints of a run assume it does not change.
+    page_size = BATCH_SIZE
 
     def __init__(self, logger: Optional[logging.Logger] = None):
         super().__init__()
@@ -29,7 +67,12 @@ class Command(BaseCommand):
         if not logger:
             logging.basicConfig(level=logging.DEBUG)
         self.registry = ProcessorRegistry.get_instance()
-        self.current_concurrent_fetches = INITIAL_CONCURRENT_FETCHES
+        self.request_limiter = None
+        self.failed_endpoints = set()
+        self.skipped_endpoints = set()
+        self.transform_pool = None
+        self.db_writer = None
+        self.metrics = None
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -44,33 +87,173 @@ class Command(BaseCommand):
             default=INITIAL_CONCURRENT_FETCHES,
             help=f'Maximum number of concurrent page fetches (default: {INITIAL_CONCURRENT_FETCHES})'
         )
-
-    async def get_latest_update(self, endpoint: str) -> DateTime:
-        """Fetch the latest update timestamp for incremental sync."""
-        model_class = self.registry.models[endpoint]
-        latest_update = await sync_to_async(
-            model_class.objects.order_by('-last_update').values_list('last_update', flat=True).first
-        )()
-        return latest_update if latest_update else DateTime(1970, 1, 1)
+        parser.add_argument(
+            '--queue-size',
+            type=int,
+            default=PIPELINE_QUEUE_SIZE,
+            help=f'Pages buffered between the fetch, extract and write stages (default: {PIPELINE_QUEUE_SIZE})'
+        )
+        parser.add_argument(
+            '--initial-load',
+            action='store_true',
+            help='Stream rows into a staging table with COPY and merge them once at the end (PostgreSQL only).'
+        )
+        parser.add_argument(
+            '--max-parallel-endpoints',
+            type=int,
+            default=DEFAULT_PARALLEL_ENDPOINTS,
+            help=f'Endpoints imported at the same time when no --endpoint is given (default: {DEFAULT_PARALLEL_ENDPOINTS})'
+        )
+        parser.add_argument(
+            '--max-requests',
+            type=int,
+            default=MAX_REQUESTS,
+            help=f'Requests in flight across all endpoints (default: {MAX_REQUESTS})'
+        )
+        parser.add_argument(
+            '--max-requests-per-host',
+            type=int,
+            default=MAX_REQUESTS_PER_HOST,
+            help=f'Requests in flight per Jira host (default: {MAX_REQUESTS_PER_HOST})'
+        )
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            default=RATE_LIMIT,
+            help=f'Requests per second allowed by the client-side rate limiter, 0 to disable (default: {RATE_LIMIT})'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue the last failed or abandoned run of each endpoint, fetching only the pages it has not '
+                 'committed. Incremental endpoints always continue from their sync watermark.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=0,
+            help='Worker processes that decode and transform pages; 0 transforms them on the event loop (default: 0)'
+        )
+        parser.add_argument(
+            '--commit-rows',
+            type=int,
+            default=COMMIT_ROWS,
+            help=f'Rows the DB writer coalesces into one transaction (default: {COMMIT_ROWS})'
+        )
+        parser.add_argument(
+            '--commit-interval',
+            type=float,
+            default=COMMIT_INTERVAL,
+            help=f'Seconds the DB writer waits for more pages before committing (default: {COMMIT_INTERVAL})'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Parse the entries of each page while it downloads, keeping memory bounded per page (needs ijson).'
+        )
+        parser.add_argument(
+            '--no-response-cache',
+            action='store_false',
+            dest='response_cache',
+            help='Fetch and process reference endpoints in full instead of revalidating their cached responses.'
+        )
+        parser.add_argument(
+            '--no-lock',
+            action='store_false',
+            dest='lock',
+            help='Do not take the distributed import lock of each endpoint (it needs the Redis of DATA_IMPORT_LOCK_URL).'
+        )
+        parser.add_argument(
+            '--profile',
+            type=str,
+            metavar='DIRECTORY',
+            help='Profile the run and write the profile, SQL query statistics and stage timings to DIRECTORY.'
+        )
+        parser.add_argument(
+            '--profile-mode',
+            choices=PROFILE_MODES,
+            default=CPROFILE,
+            help=f'cprofile traces the event loop thread, sampling samples every thread (default: {CPROFILE})'
+        )
 
     def handle(self, *args: Any, **options: Dict[str, Any]):
         logging.basicConfig(level=logging.INFO)
         endpoint = options.get('endpoint')
-        max_concurrent = options.get('max_concurrent', INITIAL_CONCURRENT_FETCHES)
-        asyncio.run(self.async_handle(endpoint, max_concurrent))
-
-    async def async_handle(self, endpoint: Optional[str] = None, max_concurrent: int = INITIAL_CONCURRENT_FETCHES):
-        if endpoint:
-            await self.process_endpoint(endpoint, max_concurrent)
+        import_options = ImportOptions(
+            max_concurrent=options.get('max_concurrent', INITIAL_CONCURRENT_FETCHES),
+            queue_size=options.get('queue_size', PIPELINE_QUEUE_SIZE),
+            initial_load=options.get('initial_load', False),
+            max_parallel_endpoints=options.get('max_parallel_endpoints', DEFAULT_PARALLEL_ENDPOINTS),
+            max_requests=options.get('max_requests', MAX_REQUESTS),
+            max_requests_per_host=options.get('max_requests_per_host', MAX_REQUESTS_PER_HOST),
+            rate_limit=options.get('rate_limit', RATE_LIMIT),
+            resume=options.get('resume', False),
+            workers=options.get('workers', 0),
+            commit_rows=options.get('commit_rows', COMMIT_ROWS),
+            commit_interval=options.get('commit_interval', COMMIT_INTERVAL),
+            stream=options.get('stream', False),
+            response_cache=options.get('response_cache', True),
+            lock=options.get('lock', True),
+        )
+        if import_options.stream and import_options.workers:
+            raise CommandError("--stream and --workers cannot be combined")
+        if import_options.stream and ijson is None:
+            self._logger.warning("--stream requires the ijson package; pages are read whole")
+            import_options.stream = False
+        if options.get('profile'):
+            profiler = ImportProfiler(options['profile'], options.get('profile_mode', CPROFILE), self._logger)
+            try:
+                with profiler:
+                    asyncio.run(self.async_handle(endpoint, import_options))
+            finally:
+                profiler.write_reports(self.metrics.summary() if self.metrics else None)
         else:
-            for ep in self.registry.endpoints.keys():
-                self._logger.info(f"Starting processing for endpoint: {ep}")
-                await self.process_endpoint(ep, max_concurrent)
-                self._logger.info(f"Completed processing for endpoint: {ep}")
+            asyncio.run(self.async_handle(endpoint, import_options))
+        if self.metrics:
+            self.stdout.write(json.dumps(self.metrics.summary(), indent=2, sort_keys=True))
+        if self.skipped_endpoints:
+            self.stdout.write(f"Skipped {', '.join(sorted(self.skipped_endpoints))}: another import is running")
+        if self.failed_endpoints:
+            raise CommandError(
+                f"Import failed for: {', '.join(sorted(self.failed_endpoints))}. "
+                f"Run again with --resume to retry the missing pages."
+            )
 
-    async def process_endpoint(self, endpoint: str, max_concurrent: int):
-        start_time = DateTime.now()
+    async def async_handle(self, endpoint: Optional[str] = None, options: Optional[ImportOptions] = None):
+        """Import ``endpoint`` (or all endpoints), recording the run's metrics in ``self.metrics``."""
+        options = options or ImportOptions()
+        self.metrics = ImportMetrics()
+        jira_api = self.build_jira_api(options)
+        if jira_api is None:
+            return
+        endpoints = [endpoint] if endpoint else list(self.registry.endpoints.keys())
+        scheduler = EndpointScheduler(self.registry, options.max_parallel_endpoints, self._logger)
+
+        self.transform_pool = create_pool(options.workers)
+        self.db_writer = DBWriter(self._logger, options.commit_rows, options.commit_interval)
+        try:
+            async with jira_api:
+                # Includes the endpoints not imported because one they depend on failed.
+                self.failed_endpoints |= await scheduler.run(
+                    endpoints, lambda ep: self.process_endpoint(ep, options, jira_api))
+        finally:
+            await self.db_writer.stop()
+            self.db_writer = None
+            if self.transform_pool:
+                self.transform_pool.shutdown(cancel_futures=True)
+                self.transform_pool = None
+            self.publish_metrics()
+
+    def publish_metrics(self):
+        """Log the run's metrics and add them to the ones served by the ``/metrics`` view."""
+        summary = self.metrics.summary()
+        self._logger.info(f"Import metrics: {json.dumps(summary, sort_keys=True)}")
+        directory = getattr(settings, 'DATA_IMPORT_METRICS_DIR', None)
+        if directory:
+            self.metrics.publish(directory, getattr(settings, 'DATA_IMPORT_METRICS_MAX_AGE', PUBLISHED_MAX_AGE))
 
+    def build_jira_api(self, options: ImportOptions) -> Optional[JiraAPI]:
+        """Jira client configured from the environment, or ``None`` without credentials."""
         credentials = {
             'base_url': os.getenv('JIRA_BASE_URL'),
             'email': os.getenv('JIRA_USER'),
@@ -79,101 +262,463 @@ class Command(BaseCommand):
 
         if not all(credentials.values()):
             self._logger.error("Missing required Jira API credentials")
-            return
-
-        url = self.registry.endpoints[endpoint]
-        latest_update = await self.get_latest_update(endpoint)
-
-        self._logger.info(f"Started fetching {endpoint} from Jira API (after {latest_update})")
+            return None
 
+        # Shared by every endpoint of the run, so the request budget is global.
+        self.request_limiter = RequestLimiter(options.max_requests, options.max_requests_per_host)
+        retry_policy = RetryPolicy(
+            max_retries=MAX_RETRIES,
+            base_delay=INITIAL_RETRY_DELAY,
+            max_delay=MAX_RETRY_DELAY,
+            rate_limiter=TokenBucket(options.rate_limit) if options.rate_limit > 0 else None
+        )
         jira_api = JiraAPI(
             base_url=credentials['base_url'],
             email=credentials['email'],
             api_token=credentials['api_token'],
-            max_retries=MAX_RETRIES,
-            retry_delay=MAX_RETRY_DELAY,
-            records_per_page=BATCH_SIZE,
+            records_per_page=self.page_size,
+            logger=self._logger,
+            limiter=self.request_limiter,
+            connection_limit=options.max_requests,
+            connection_limit_per_host=options.max_requests_per_host,
+            retry_policy=retry_policy,
+            response_cache=self.build_response_cache() if options.response_cache else None,
+            metrics=self.metrics
+        )
+        return jira_api
+
+    def build_response_cache(self) -> Optional[ResponseCache]:
+        """Response cache for reference endpoints, or ``None`` when no cache directory is configured."""
+        directory = getattr(settings, 'DATA_IMPORT_RESPONSE_CACHE_DIR', None)
+        if not directory:
+            return None
+        return ResponseCache(
+            directory,
+            ttl=getattr(settings, 'DATA_IMPORT_RESPONSE_CACHE_TTL', CACHE_TTL),
+            max_bytes=getattr(settings, 'DATA_IMPORT_RESPONSE_CACHE_MAX_BYTES', CACHE_MAX_BYTES),
             logger=self._logger
         )
-        data_processor = DataProcessor(self._logger)
-        processor_class = self.registry.processors[endpoint]
-        processor = processor_class(self._logger, data_processor)
 
-        async with aiohttp.ClientSession() as session:
+    async def process_endpoint(self, endpoint: str, options: ImportOptions, jira_api: JiraAPI,
+                               checkpoint: Optional[RunCheckpoint] = None) -> bool:
+        """Import ``endpoint`` under its import lock, skipping it when another import holds the lock.
+
+        The lock is renewed while the import runs, and the import fails when it is lost.
+        Returns ``False`` when the import failed; a skipped endpoint is not a failure.
+        """
+        if not options.lock:
+            return await self.import_endpoint(endpoint, options, jira_api, checkpoint)
+        with endpoint_lock(endpoint, logger=self._logger) as token:
+            if token is None:
+                self.skipped_endpoints.add(endpoint)
+                self._logger.warning(f"Skipping {endpoint}: another import of it is running")
+                return True
             try:
-                total_processed = await self.fetch_and_process_paginated_data(
-                    session=session,
-                    jira_api=jira_api,
-                    processor=processor,
-                    endpoint=endpoint,
-                    url=url,
-                    latest_update=latest_update,
-                    max_concurrent=max_concurrent
-                )
-                duration = DateTime.now() - start_time
-                self._logger.info(
-                    f"Finished processing {endpoint}. "
-                    f"Total records: {total_processed}. Duration: {duration}."
+                return await hold_endpoint_lock(endpoint, token,
+                                                self.import_endpoint(endpoint, options, jira_api, checkpoint))
+            except LockLostError as e:
+                self._logger.error(str(e))
+                return False
+
+    async def import_endpoint(self, endpoint: str, options: ImportOptions, jira_api: JiraAPI,
+                              checkpoint: Optional[RunCheckpoint] = None) -> bool:
+        """Import ``endpoint`` as a new run, a resumed one, or the already opened ``checkpoint``."""
+        start_time = DateTime.now()
+        url = self.endpoint_url(endpoint)
+        processor = self.build_processor(endpoint)
+
+        try:
+            tracker = None
+            if processor.watermark_field:
+                state = await load_sync_state(endpoint)
+                # Entries updated from now on are left to the next run (see WatermarkTracker).
+                tracker = WatermarkTracker(state, self.page_size, self._logger,
+                                           ceiling=DateTime.now(dt_timezone.utc))
+                self._logger.info(f"Started fetching {endpoint} from Jira API (updated since {state.watermark})")
+            else:
+                state = None
+                self._logger.info(f"Started fetching {endpoint} from Jira API")
+            if checkpoint is None:
+                # Incremental endpoints resume from their committed watermark, not by offset.
+                checkpoint = await RunCheckpoint.open(
+                    endpoint, build_page_params(processor, state), self._logger,
+                    resume=options.resume and not processor.watermark_field
                 )
-            except Exception as e:
-                self._logger.error(f"Error processing {endpoint}: {str(e)}", exc_info=True)
 
-    async def fetch_with_retry(self, session, jira_api, url, params, max_retries=5):
-        """Fetch a single page with exponential backoff retry."""
-        retry_delay = INITIAL_RETRY_DELAY
-        attempt = 1
+            total_processed = await self.fetch_and_process_paginated_data(
+                session=jira_api.session,
+                jira_api=jira_api,
+                processor=processor,
+                endpoint=endpoint,
+                url=url,
+                params=checkpoint.params,
+                options=options,
+                tracker=tracker,
+                checkpoint=checkpoint
+            )
+            duration = DateTime.now() - start_time
+            if self.metrics:
+                self.metrics.observe('jira_import_endpoint_seconds', duration.total_seconds(), endpoint=endpoint)
+            self._logger.info(
+                f"Finished processing {endpoint}. "
+                f"Total records: {total_processed}. Duration: {duration}."
+            )
+            return True
+        except Exception as e:
+            self.failed_endpoints.add(endpoint)
+            self._logger.error(f"Error processing {endpoint}: {str(e)}", exc_info=True)
+            return False
 
-        while attempt <= max_retries:
-            try:
-                self._logger.debug(f"Fetching page: {url}, params {params}, attempt {attempt}")
-                data = await jira_api.get_data(session, url, params=params)
-                return data
-            except aiohttp.ClientResponseError as e:
-                if e.status == 503:
-                    if attempt < max_retries:
-                        jitter = random.uniform(0.5, 1.5)
-                        delay = min(retry_delay * jitter, MAX_RETRY_DELAY)
-                        self._logger.warning(
-                            f"503 Service Unavailable. Retrying after {delay:.1f} seconds... "
-                            f"(attempt {attempt}/{max_retries})"
-                        )
-                        await asyncio.sleep(delay)
-                        retry_delay *= 2
-                        attempt += 1
+    def endpoint_url(self, endpoint: str) -> str:
+        return self.registry.endpoints[endpoint]
+
+    def build_processor(self, endpoint: str):
+        return self.registry.processors[endpoint](self._logger, DataProcessor(self._logger))
+
+    async def fetch_with_retry(self, session, jira_api, url, params, window: Optional[FetchWindow] = None,
+                               decode: bool = True, conditional: bool = False):
+        """Fetch a single page under the client's retry policy, reporting throttling to ``window``."""
+        try:
+            self._logger.debug(f"Fetching page: {url}, params {params}")
+            return await jira_api.get_data(session, url, params=params, listener=window, decode=decode,
+                                           conditional=conditional)
+        except Exception as e:
+            self._logger.error(f"Error fetching page: {str(e)}")
+            raise
+
+    async def fetch_page(self, session, jira_api, url, start_at: int, params: Dict[str, Any],
+                         window: Optional[FetchWindow] = None, decode: bool = True,
+                         build_page: Optional[Callable] = None, entries_key: str = 'issues',
+                         conditional: bool = False) -> Tuple[int, Any]:
+        """Fetch the page starting at ``start_at`` and return it with its offset.
+
+        With ``build_page`` the page is streamed and ``build_page``'s result returned.
+        A ``conditional`` page is ``NOT_MODIFIED`` if its cached response is still current.
+        """
+        params = {**params, "startAt": start_at, "maxResults": self.page_size}
+        if build_page:
+            self._logger.debug(f"Streaming page: {url}, params {params}")
+            return start_at, await jira_api.stream_data(session, url, build_page, params=params, listener=window,
+                                                        entries_key=entries_key)
+        return start_at, await self.fetch_with_retry(session, jira_api, url, params, window=window, decode=decode,
+                                                     conditional=conditional)
+
+    @staticmethod
+    def page_builder(processor) -> Callable:
+        """Builds a page's ``PreparedBatch`` entry by entry while it is streamed."""
+        field_mappings = processor.field_mappings
+
+        async def build(entries) -> PreparedBatch:
+            prepared = processor.new_batch(field_mappings)
+            async for entry in entries:
+                processor.add_entry(prepared, entry, field_mappings)
+            return prepared
+        return build
+
+    async def iter_pages(self, session, jira_api, url, params: Dict[str, Any], max_concurrent,
+                         entries_key: str = 'issues',
+                         checkpoint: Optional[RunCheckpoint] = None,
+                         offsets: Optional[Iterable[int]] = None,
+                         raw: bool = False,
+                         build_page: Optional[Callable] = None,
+                         conditional: bool = False) -> AsyncIterator[Tuple[int, Any]]:
+        """Yield ``(start_at, entries)`` for every page, fetching them concurrently.
+
+        The first page is fetched on its own so its ``total`` can be used to plan the
+        remaining offsets. Those are then kept in flight through a sliding window of at most
+        ``FetchWindow.current`` requests and yielded as they complete.
+        Without a ``total`` offsets are scheduled until a short page is seen. No new
+        request is started while the consumer is still busy with the previous page.
+        Endpoints that answer with a bare JSON array are not paginated, so their
+        single response is yielded as the only page.
+
+        With a ``checkpoint`` the pages it has already committed are skipped, and a
+        page that still fails after the client's retries is recorded as a dead letter
+        while the remaining pages carry on.
+
+        Passing ``offsets`` fetches exactly those pages (e.g. one shard of a planned
+        run) without looking at the first page. With ``raw`` those planned pages are
+        yielded as undecoded response bodies, for the transform workers to decode,
+        and with ``build_page`` they are streamed and yielded as the ``PreparedBatch``
+        it builds, so a page is never held in memory as a whole.
+
+        ``conditional`` pages are revalidated against the client's response cache and
+        those that did not change are not yielded; an unchanged first page ends the
+        iteration, as it means the endpoint did not change either.
+        """
+        window = FetchWindow(max_concurrent, self._logger)
+        committed = checkpoint.completed if checkpoint else {}
+        total = checkpoint.run.total if checkpoint else None
+        until_short_page = False
+
+        completed = []
+        if offsets is not None:
+            offsets = (start_at for start_at in offsets if start_at not in committed)
+        elif total is None or 0 not in committed:
+            _, result = await self.fetch_page(session, jira_api, url, 0, params, window, conditional=conditional)
+            if result is NOT_MODIFIED:
+                self._logger.info(f"{url} has not changed since it was last imported")
+                return
+            if isinstance(result, list):
+                if result:
+                    yield 0, result
+                return
+            if not result or not result.get(entries_key):
+                return
+            total = result.get('total')
+            if checkpoint:
+                await checkpoint.set_total(total)
+            if 0 not in committed:
+                completed.append((0, result))
+
+        if offsets is None:
+            until_short_page = total is None
+            page_size = self.page_size
+            planned = range(page_size, total, page_size) if total is not None else itertools.count(page_size, page_size)
+            offsets = (start_at for start_at in planned if start_at not in committed)
+
+        exhausted = False
+
+        in_flight = {}
+        try:
+            while True:
+                for start_at, result in completed:
+                    if result is NOT_MODIFIED:
+                        continue
+                    if isinstance(result, (bytes, PreparedBatch)):
+                        yield start_at, result
                         continue
-                raise
-            except Exception as e:
-                self._logger.error(f"Error fetching page: {str(e)}")
-                raise
-
-    async def fetch_and_process_paginated_data(self, session, jira_api, processor, 
-                                             endpoint, url, latest_update, max_concurrent):
-        """Fetch and process paginated data with dynamic concurrency adjustment."""
-        start_at = 0
-        total_records_processed = 0
-        self.current_concurrent_fetches = max_concurrent
+                    entries = result.get(entries_key) if result else None
+                    if until_short_page and (not entries or len(entries) < self.page_size):
+                        exhausted = True
+                    if entries:
+                        yield start_at, entries
+
+                while not exhausted and len(in_flight) < window.current:
+                    start_at = next(offsets, None)
+                    if start_at is None:
+                        exhausted = True
+                        break
+                    planned_page = not until_short_page
+                    task = asyncio.create_task(self.fetch_page(
+                        session, jira_api, url, start_at, params, window, decode=not (raw and planned_page),
+                        build_page=build_page if planned_page else None, entries_key=entries_key,
+                        conditional=conditional
+                    ))
+                    in_flight[task] = start_at
+
+                if not in_flight:
+                    return
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                completed = []
+                for task in done:
+                    start_at = in_flight.pop(task)
+                    if task.exception() is None:
+                        completed.append(task.result())
+                    elif checkpoint:
+                        await checkpoint.page_failed(start_at, task.exception())
+                    else:
+                        raise task.exception()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def iter_keyset_pages(self, session, jira_api, url, cursor: KeysetCursor,
+                                entries_key: str = 'issues') -> AsyncIterator[Tuple[int, Any]]:
+        """Yield ``(start_at, entries)`` for every page of an incremental search, read by key.
 
+        Each page is requested with the query ``cursor`` derives from the pages
+        before it, so pages are fetched one after another; the pipeline's queues
+        still let the next page download while the previous one is being written.
+        ``start_at`` numbers the pages in the order they were read, which is what
+        ``WatermarkTracker`` expects.
+        """
+        sequence = 0
         while True:
-            params = {
-                "startAt": start_at,
-                "maxResults": BATCH_SIZE,
-                "updated": latest_update.isoformat() if latest_update else None,
-            }
-            try:
-                result = await self.fetch_with_retry(session, jira_api, url, params)
-                if not result or not result.get('issues'):
-                    return total_records_processed
-                
-                num_records = await processor.process_objects(result['issues'], BATCH_SIZE)
-                total_records_processed += num_records
-                self._logger.info(
-                    f"Processed {num_records} records from {endpoint}. Total processed: {total_records_processed}."
+            _, result = await self.fetch_page(session, jira_api, url, cursor.start_at, cursor.params)
+            entries = (result.get(entries_key) if isinstance(result, dict) else result) or []
+            if entries:
+                yield sequence * self.page_size, entries
+                sequence += 1
+            if not cursor.advance(entries):
+                return
+
+    async def iter_window_pages(self, session, jira_api, url, processor, tracker: WatermarkTracker,
+                                max_concurrent: int,
+                                checkpoint: Optional[RunCheckpoint] = None) -> AsyncIterator[Tuple[int, Any]]:
+        """Yield ``(start_at, entries)`` for every page of an incremental search, reading time windows at once.
+
+        The first page of the whole search tells how many entries changed; a
+        search of more than one page is split into up to ``max_concurrent`` time
+        windows (``plan_windows``), each read by key with a ``KeysetCursor`` of its
+        own. Windows are read at the same time, one request per window in flight,
+        so the requests of a window still depend on its previous page. Pages are
+        numbered per window (``window_start_at``) and ``tracker`` learns when a
+        window ends, so the watermark only passes a window once all of it is stored.
+
+        A page that still fails after the client's retries ends its window; with a
+        ``checkpoint`` it is recorded as a dead letter while the other windows go
+        on, and the watermark stays before it.
+        """
+        entries_key = processor.entries_key
+        since = query_start(tracker.state.watermark)
+        cursor = KeysetCursor(processor, self.page_size, since)
+        _, first_page = await self.fetch_page(session, jira_api, url, 0, cursor.params)
+        entries = (first_page.get(entries_key) if isinstance(first_page, dict) else first_page) or []
+        total = first_page.get('total') if isinstance(first_page, dict) else None
+        if not total or total <= self.page_size or max_concurrent <= 1:
+            # Small enough for one window, which continues from the page just read.
+            if entries:
+                yield window_start_at(0, 0, self.page_size), entries
+            pages = 1 if entries else 0
+            if cursor.advance(entries):
+                async for start_at, entries in self.iter_keyset_pages(session, jira_api, url, cursor, entries_key):
+                    yield start_at + window_start_at(0, pages, self.page_size), entries
+            return
+
+        shards = min(max_concurrent, math.ceil(total / self.page_size))
+        windows = plan_windows(since, since, None, shards)
+        self._logger.info(f"Reading {total} changed entries of {url} in {len(windows)} time windows")
+        cursors = [KeysetCursor(processor, self.page_size, lower, upper) for lower, upper in windows]
+        pages_read = [0] * len(cursors)
+        fetch_window = FetchWindow(len(cursors), self._logger)
+        waiting = list(range(len(cursors)))
+        in_flight = {}
+        try:
+            while waiting or in_flight:
+                while waiting and len(in_flight) < fetch_window.current:
+                    window = waiting.pop(0)
+                    task = asyncio.create_task(self.fetch_page(
+                        session, jira_api, url, cursors[window].start_at, cursors[window].params, fetch_window))
+                    in_flight[task] = window
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=in_flight.get):
+                    window = in_flight.pop(task)
+                    start_at = window_start_at(window, pages_read[window], self.page_size)
+                    if task.exception() is not None:
+                        if not checkpoint:
+                            raise task.exception()
+                        await checkpoint.page_failed(start_at, task.exception())
+                        continue
+                    _, result = task.result()
+                    entries = (result.get(entries_key) if isinstance(result, dict) else result) or []
+                    if entries:
+                        pages_read[window] += 1
+                    more = cursors[window].advance(entries)
+                    if not more:
+                        tracker.window_finished(window, pages_read[window])
+                    if entries:
+                        yield start_at, entries
+                    if more:
+                        waiting.append(window)
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def fetch_and_process_paginated_data(self, session, jira_api, processor,
+                                             endpoint, url, params, options: ImportOptions,
+                                             tracker: Optional[WatermarkTracker] = None,
+                                             checkpoint: Optional[RunCheckpoint] = None):
+        """Fetch and process paginated data with dynamic concurrency adjustment.
+
+        Fetching, extraction and database writes run as separate pipeline stages so
+        the next pages are already downloading while the current one is written.
+        With ``options.initial_load`` the rows are bulk loaded through COPY instead.
+        Endpoints whose processor sets ``cache_responses`` are skipped when the
+        client's response cache shows they did not change since the last import.
+        With a ``tracker`` the watermark advances as pages are committed. An
+        endpoint without a watermark yet is loaded in full by offset like any other
+        (entries updated meanwhile are read again by the next run, as the tracker's
+        ceiling keeps the watermark before them); once it has one, it is searched
+        from there in time windows read by key (``iter_window_pages``; pages are
+        then never streamed).
+        ``checkpoint`` records committed pages durably so an interrupted run can be resumed.
+        Failed pages end up in the dead-letter table and make the run raise
+        ``IncompleteImportError`` once every other page is stored.
+        """
+        model = self.registry.models[endpoint]
+        loader = None
+        if options.initial_load:
+            if CopyLoader.is_supported(model):
+                loader = CopyLoader(model, self._logger, hash_field=processor.hash_field)
+            else:
+                self._logger.warning("--initial-load requires PostgreSQL; falling back to batched upserts")
+
+        pipeline = ImportPipeline(
+            processor=processor,
+            model=model,
+            batch_size=self.page_size,
+            logger=self._logger,
+            queue_size=options.queue_size,
+            loader=loader,
+            on_commit=self.commit_callback(tracker, checkpoint),
+            on_failure=checkpoint.page_failed if checkpoint else None,
+            executor=self.transform_pool,
+            transform_workers=options.workers,
+            writer=self.db_writer,
+            on_commit_sync=self.commit_hook(tracker, checkpoint),
+            metrics=self.metrics,
+            endpoint=endpoint
+        )
+        if tracker and tracker.state.watermark is not None:
+            pages = self.iter_window_pages(session, jira_api, url, processor, tracker, options.max_concurrent,
+                                           checkpoint=checkpoint)
+        else:
+            pages = self.iter_pages(session, jira_api, url, params, options.max_concurrent,
+                                    entries_key=processor.entries_key, checkpoint=checkpoint,
+                                    raw=self.transform_pool is not None,
+                                    build_page=self.page_builder(processor) if options.stream else None,
+                                    conditional=processor.cache_responses)
+        try:
+            await pipeline.run(pages)
+        except BaseException:
+            await jira_api.commit_cached(url, succeeded=False)
+            if checkpoint:
+                await checkpoint.finish(succeeded=False)
+            raise
+        # Only responses whose rows are all stored may be revalidated next time.
+        await jira_api.commit_cached(url, succeeded=not (checkpoint and checkpoint.failed_pages))
+
+        self._logger.info(
+            f"{endpoint}: {pipeline.result.inserted} inserted, {pipeline.result.updated} updated, "
+            f"{pipeline.result.unchanged} unchanged, {pipeline.result.failed} failed."
+        )
+        if checkpoint:
+            await checkpoint.finish(succeeded=True)
+            if checkpoint.failed_pages:
+                raise IncompleteImportError(
+                    f"{checkpoint.failed_pages} pages of {endpoint} failed and were recorded as dead letters"
                 )
+        if tracker:
+            await tracker.finish()
+
+        return pipeline.result.successful
+
+    @staticmethod
+    def commit_callback(tracker: Optional[WatermarkTracker], checkpoint: Optional[RunCheckpoint]):
+        """Combine the per-page commit hooks of the watermark tracker and the checkpoint."""
+        if not tracker and not checkpoint:
+            return None
+
+        async def on_commit(start_at: int, prepared):
+            if checkpoint:
+                await checkpoint.page_committed(start_at, prepared)
+            if tracker:
+                await tracker.page_committed(start_at, prepared.watermark)
+        return on_commit
+
+    @staticmethod
+    def commit_hook(tracker: Optional[WatermarkTracker], checkpoint: Optional[RunCheckpoint]):
+        """Synchronous ``commit_callback`` for the DB writer, run in the page's transaction."""
+        if not tracker and not checkpoint:
+            return None
 
-                if len(result['issues']) < BATCH_SIZE:
-                    return total_records_processed
-                
-                start_at += BATCH_SIZE
-            except Exception as e:
-                self._logger.error(f"Error processing data: {str(e)}")
-                break
+        def on_commit(start_at: int, prepared):
+            if checkpoint:
+                checkpoint.record_page(start_at, prepared)
+            if tracker:
+                tracker.record_page(start_at, prepared.watermark)
+        return on_commit
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from asgiref.sync import sync_to_async
+from dateutil.parser import parse as parse_date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from data_import.flow_metrics import START_CATEGORY, status_categories
+from data_import.management.commands.import_jira_data import Command as ImportCommand, ImportOptions
+from data_import.models import Issue, IssueTransition
+from data_import.rollups import FlowRollups
+
+ISSUE_CHUNK = 500  # issues whose changelogs are fetched and stored together
+
+
+def transitions_from_changelog(issue_id: str, histories: Iterable[Dict[str, Any]]) -> List[IssueTransition]:
+    """The status changes among the changelog ``histories`` of an issue."""
+    transitions = []
+    for history in histories:
+        for item in history.get('items') or []:
+            if item.get('fieldId', item.get('field')) != 'status' or not item.get('to'):
+                continue
+            transitions.append(IssueTransition(
+                issue_id=issue_id,
+                history_id=str(history.get('id')),
+                from_status_id=item.get('from') or '',
+                from_status=item.get('fromString') or '',
+                to_status_id=item['to'],
+                to_status=item.get('toString') or '',
+                transitioned_at=parse_date(history['created']),
+            ))
+    return transitions
+
+
+def store_transitions(issue_ids: List[str], transitions: List[IssueTransition], start_statuses: Set[str]):
+    """Store ``transitions`` and set when work on ``issue_ids`` started, with the cycle times of their weeks."""
+    with transaction.atomic():
+        # Changelogs only grow, so transitions stored before are left as they are.
+        IssueTransition.objects.bulk_create(transitions, ignore_conflicts=True)
+        FlowRollups().refresh_started(issue_ids, start_statuses)
+
+
+class Command(BaseCommand):
+    help = 'Imports the status transitions of the imported issues from their changelogs.'
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        super().__init__()
+        self._logger = logger or logging.getLogger(__name__)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--updated-since',
+            type=parse_date,
+            help='Only issues updated at or after this date (default: all imported issues).'
+        )
+
+    def handle(self, *args: Any, **options: Dict[str, Any]):
+        issues = Issue.objects.order_by('pk')
+        if options.get('updated_since'):
+            issues = issues.filter(updated__gte=options['updated_since'])
+        jira_api = ImportCommand(self._logger).build_jira_api(ImportOptions())
+        if jira_api is None:
+            raise CommandError("Missing required Jira API credentials")
+        stored = asyncio.run(self.import_transitions(jira_api, list(issues.values_list('pk', flat=True))))
+        self.stdout.write(f"Stored {stored} transitions")
+
+    async def import_transitions(self, jira_api, issue_ids: List[str]) -> int:
+        """Fetch the changelogs of ``issue_ids`` in chunks and store their status changes."""
+        stored = 0
+        categories = await sync_to_async(status_categories)()
+        start_statuses = categories.get(START_CATEGORY, set())
+        async with jira_api:
+            for offset in range(0, len(issue_ids), ISSUE_CHUNK):
+                chunk = issue_ids[offset:offset + ISSUE_CHUNK]
+                transitions = []
+                async for issue_id, histories in jira_api.iter_related_data(None, chunk, 'changelog'):
+                    transitions.extend(transitions_from_changelog(issue_id, histories))
+                await sync_to_async(store_transitions)(chunk, transitions, start_statuses)
+                stored += len(transitions)
+                self._logger.info(f"Stored transitions of {min(offset + ISSUE_CHUNK, len(issue_ids))} "
+                                  f"of {len(issue_ids)} issues")
+        return stored
@@ -0,0 +1,34 @@
+import logging
+from typing import Any, Dict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from data_import.registry import ProcessorRegistry
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the rollup tables of every registered endpoint from its imported rows, e.g. after a backfill.'
+
+    def __init__(self, logger: logging.Logger = None):
+        super().__init__()
+        self._logger = logger or logging.getLogger(__name__)
+        self.registry = ProcessorRegistry.get_instance()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoint',
+            type=str,
+            choices=list(self.registry.endpoints.keys()),
+            help='Only rebuild the rollups of this endpoint.'
+        )
+
+    def handle(self, *args: Any, **options: Dict[str, Any]):
+        endpoints = [options['endpoint']] if options.get('endpoint') else list(self.registry.endpoints)
+        for endpoint in endpoints:
+            rollups = self.registry.processors[endpoint].rollups
+            if rollups is None:
+                continue
+            with transaction.atomic():
+                rollups.rebuild()
+            self.stdout.write(f"Rebuilt the rollups of {endpoint}")
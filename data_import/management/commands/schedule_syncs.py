@@ -0,0 +1,61 @@
+import json
+import logging
+from typing import Any, Dict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django_celery_beat.models import IntervalSchedule, PeriodicTask
+
+from data_import.registry import ProcessorRegistry
+
+SYNC_TASK = 'data_import.tasks.sync_endpoint'
+TASK_NAME_PREFIX = 'data_import.sync.'
+
+
+class Command(BaseCommand):
+    help = 'Creates or updates the periodic incremental-sync task of every registered endpoint.'
+
+    def __init__(self, logger: logging.Logger = None):
+        super().__init__()
+        self._logger = logger or logging.getLogger(__name__)
+        self.registry = ProcessorRegistry.get_instance()
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--disable',
+            action='store_true',
+            help='Disable the periodic syncs instead of (re)enabling them.'
+        )
+
+    def handle(self, *args: Any, **options: Dict[str, Any]):
+        enabled = not options.get('disable', False)
+        with transaction.atomic():
+            for endpoint in self.registry.endpoints:
+                self.schedule(endpoint, enabled)
+            # Endpoints that were unregistered or lost their interval stop syncing.
+            stale = PeriodicTask.objects.filter(name__startswith=TASK_NAME_PREFIX).exclude(
+                name__in=[f"{TASK_NAME_PREFIX}{endpoint}" for endpoint in self.registry.endpoints
+                          if self.registry.get_sync_interval(endpoint)]
+            )
+            for task in stale:
+                self._logger.info(f"Disabling periodic task {task.name}")
+            stale.update(enabled=False)
+
+    def schedule(self, endpoint: str, enabled: bool):
+        interval = self.registry.get_sync_interval(endpoint)
+        if not interval:
+            return
+        schedule, _ = IntervalSchedule.objects.get_or_create(every=interval, period=IntervalSchedule.SECONDS)
+        task, created = PeriodicTask.objects.update_or_create(
+            name=f"{TASK_NAME_PREFIX}{endpoint}",
+            defaults={
+                'task': SYNC_TASK,
+                'interval': schedule,
+                'args': json.dumps([endpoint]),
+                'enabled': enabled,
+                # A sync that could not start before the next one is due is dropped.
+                'expire_seconds': interval,
+            },
+        )
+        state = 'enabled' if enabled else 'disabled'
+        self.stdout.write(f"{'Created' if created else 'Updated'} {task.name}: every {interval}s ({state})")
@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds, in seconds, of the histogram buckets; the +Inf bucket is implicit.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds after which the published file of a process that stopped importing is removed.
+PUBLISHED_MAX_AGE = 7 * 24 * 60 * 60
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+# name -> (type, help) of every metric the importer records.
+METRICS = {
+    'jira_import_http_request_seconds': (HISTOGRAM, 'Duration of Jira HTTP requests, per attempt.'),
+    'jira_import_http_response_bytes_total': (COUNTER, 'Response body bytes received from Jira.'),
+    'jira_import_http_retries_total': (COUNTER, 'Jira requests retried, by status ("error" for network errors).'),
+    'jira_import_extract_seconds': (HISTOGRAM, 'Time spent decoding and extracting one page.'),
+    'jira_import_write_seconds': (HISTOGRAM, "Time until one page is stored, including the DB writer's wait to coalesce pages."),
+    'jira_import_rows_total': (COUNTER, 'Rows handled by the write stage, by outcome.'),
+    'jira_import_queue_depth_max': (GAUGE, 'Highest number of pages waiting in a pipeline queue.'),
+    'jira_import_endpoint_seconds': (HISTOGRAM, 'Duration of whole endpoint imports.'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+logger = logging.getLogger(__name__)
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class ImportMetrics:
+    """Counters, high-water-mark gauges and histograms of one or more import runs.
+
+    Safe to update from the event loop and from the DB writer thread alike. Every
+    metric is identified by its name (see ``METRICS``) and a set of labels, usually
+    the endpoint. ``snapshot`` returns a JSON-serialisable copy, which ``publish``
+    merges into a per-process file that the ``/metrics`` view renders together with
+    the files of every other process that imports data.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        # (name, labels) -> [count per bucket (+Inf last), sum]
+        self._histograms: Dict[Tuple[str, Labels], List[Any]] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_max(self, name: str, value: float, **labels):
+        """Raise a gauge to ``value`` unless it is already higher."""
+        key = (name, _labels(labels))
+        with self._lock:
+            if value > self._gauges.get(key, float('-inf')):
+                self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            histogram[0][bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'counters': [[name, dict(labels), value] for (name, labels), value in self._counters.items()],
+                'gauges': [[name, dict(labels), value] for (name, labels), value in self._gauges.items()],
+                'histograms': [[name, dict(labels), list(counts), total]
+                               for (name, labels), (counts, total) in self._histograms.items()],
+            }
+
+    def merge(self, snapshot: Dict[str, Any]):
+        """Add the values of another snapshot (taken with the same buckets) to these metrics."""
+        if tuple(snapshot.get('buckets', self.buckets)) != self.buckets:
+            logger.warning("Ignoring metrics recorded with different histogram buckets")
+            return
+        for name, labels, value in snapshot.get('counters', []):
+            self.inc(name, value, **labels)
+        for name, labels, value in snapshot.get('gauges', []):
+            self.set_max(name, value, **labels)
+        with self._lock:
+            for name, labels, counts, total in snapshot.get('histograms', []):
+                key = (name, _labels(labels))
+                histogram = self._histograms.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += total
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Totals per endpoint, e.g. for the JSON report at the end of a run.
+
+        HTTP metrics are labelled with the request path rather than an endpoint and
+        are reported under ``http`` keyed by that path.
+        """
+        summary: Dict[str, Dict[str, Any]] = {}
+
+        def entry(name: str, labels: Labels) -> Tuple[Dict[str, Any], str, Optional[str]]:
+            """Section of the summary for ``labels``, the short metric name and its remaining label value."""
+            labels = dict(labels)
+            if 'endpoint' in labels:
+                target = summary.setdefault(labels.pop('endpoint'), {})
+            else:
+                target = summary.setdefault('http', {}).setdefault(labels.pop('path', ''), {})
+            return target, name[len('jira_import_'):], '_'.join(labels.values()) or None
+
+        with self._lock:
+            for (name, labels), value in list(self._counters.items()) + list(self._gauges.items()):
+                target, short, variant = entry(name, labels)
+                if variant is None:
+                    target[short] = value
+                else:
+                    target.setdefault(short, {})[variant] = value
+            for (name, labels), (counts, total) in self._histograms.items():
+                target, short, _ = entry(name, labels)
+                count = sum(counts)
+                target[short] = {
+                    'count': count,
+                    'total': round(total, 6),
+                    'mean': round(total / count, 6) if count else 0.0,
+                    'p50': self._quantile(counts, 0.5),
+                    'p99': self._quantile(counts, 0.99),
+                }
+        return summary
+
+    def _quantile(self, counts: List[int], fraction: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``fraction`` quantile (``None`` if beyond the last bound)."""
+        count = sum(counts)
+        if not count:
+            return 0.0
+        seen = 0
+        for bound, bucket in zip(self.buckets, counts):
+            seen += bucket
+            if seen >= fraction * count:
+                return bound
+        return None
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            series = {}
+            for (name, labels), value in self._counters.items():
+                series.setdefault(name, []).append((labels, value))
+            for (name, labels), value in self._gauges.items():
+                series.setdefault(name, []).append((labels, value))
+            for (name, labels), (counts, total) in self._histograms.items():
+                series.setdefault(name, []).append((labels, (list(counts), total)))
+
+        for name in sorted(series):
+            kind, help_text = METRICS.get(name, (COUNTER, ''))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(series[name], key=lambda item: item[0]):
+                if kind != HISTOGRAM:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, bucket in zip(list(self.buckets) + ['+Inf'], counts):
+                    cumulative += bucket
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+    def publish(self, directory, max_age: float = PUBLISHED_MAX_AGE):
+        """Add these metrics to this process's file in ``directory``; publish every run's metrics once.
+
+        Every process writes a file of its own, so files of processes that last
+        published more than ``max_age`` seconds ago are removed along the way.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{socket.gethostname()}-{os.getpid()}.json"
+        published = ImportMetrics(self.buckets)
+        with _publish_lock:
+            published.merge(load_snapshot(path))
+            published.merge(self.snapshot())
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(published.snapshot(), f)
+            os.replace(tmp_path, path)
+        expire_published(directory, max_age)
+
+
+_publish_lock = threading.Lock()
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    labels = list(labels)
+    if not labels:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def load_snapshot(path) -> Dict[str, Any]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable metrics file {path}: {e}")
+        return {}
+
+
+def expire_published(directory, max_age: float):
+    """Remove the metrics files, and leftover temporary files, not written to for ``max_age`` seconds."""
+    cutoff = time.time() - max_age
+    for path in list(Path(directory).glob('*.json')) + list(Path(directory).glob('*.tmp')):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass  # removed by another process meanwhile
+
+
+def load_published(directory) -> ImportMetrics:
+    """Metrics published by every importing process into ``directory``, added together."""
+    metrics = ImportMetrics()
+    directory = Path(directory)
+    if directory.is_dir():
+        for path in sorted(directory.glob('*.json')):
+            metrics.merge(load_snapshot(path))
+    return metrics
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-16 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issuetype',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-16 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0002_issuetype_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Issue',
+            fields=[
+                ('id', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('key', models.CharField(db_index=True, max_length=50)),
+                ('project_key', models.CharField(db_index=True, max_length=50)),
+                ('issue_type_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('summary', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, max_length=100, null=True)),
+                ('status_category', models.CharField(blank=True, max_length=50, null=True)),
+                ('created', models.DateTimeField(blank=True, null=True)),
+                ('updated', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('resolved', models.DateTimeField(blank=True, null=True)),
+                ('content_hash', models.CharField(blank=True, editable=False, max_length=32, null=True)),
+            ],
+            options={
+                'verbose_name': 'Issue',
+                'verbose_name_plural': 'Issues',
+            },
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=100, unique=True)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+                ('start_at', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Sync State',
+                'verbose_name_plural': 'Sync States',
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.1.3 on 2026-10-16 21:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0003_issue_syncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(db_index=True, max_length=100)),
+                ('params', models.JSONField(default=dict)),
+                ('total', models.IntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Import Run',
+                'verbose_name_plural': 'Import Runs',
+            },
+        ),
+        migrations.CreateModel(
+            name='DeadLetterPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(db_index=True, max_length=100)),
+                ('start_at', models.IntegerField()),
+                ('params', models.JSONField(default=dict)),
+                ('error', models.TextField()),
+                ('attempts', models.IntegerField(default=1)),
+                ('resolved', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dead_letters', to='data_import.importrun')),
+            ],
+            options={
+                'verbose_name': 'Dead Letter Page',
+                'verbose_name_plural': 'Dead Letter Pages',
+                'constraints': [models.UniqueConstraint(fields=('run', 'start_at'), name='unique_dead_letter_page')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PageCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_at', models.IntegerField()),
+                ('records', models.IntegerField(default=0)),
+                ('watermark', models.DateTimeField(blank=True, null=True)),
+                ('committed_at', models.DateTimeField(auto_now_add=True)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='data_import.importrun')),
+            ],
+            options={
+                'verbose_name': 'Page Checkpoint',
+                'verbose_name_plural': 'Page Checkpoints',
+                'constraints': [models.UniqueConstraint(fields=('run', 'start_at'), name='unique_page_checkpoint')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.3 on 2026-10-16 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0004_import_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStatusWip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_key', models.CharField(max_length=50)),
+                ('issue_type_id', models.CharField(blank=True, default='', max_length=50)),
+                ('status', models.CharField(max_length=100)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Status WIP',
+                'verbose_name_plural': 'Daily Status WIP',
+                'indexes': [models.Index(fields=['project_key', 'day'], name='daily_wip_project_day')],
+                'constraints': [models.UniqueConstraint(fields=('project_key', 'issue_type_id', 'status', 'day'), name='unique_daily_status_wip')],
+            },
+        ),
+        migrations.CreateModel(
+            name='WeeklyFlowRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project_key', models.CharField(max_length=50)),
+                ('issue_type_id', models.CharField(blank=True, default='', max_length=50)),
+                ('week', models.DateField()),
+                ('throughput', models.IntegerField(default=0)),
+                ('lead_time_total', models.FloatField(default=0)),
+                ('lead_time_p50', models.FloatField(blank=True, null=True)),
+                ('lead_time_p85', models.FloatField(blank=True, null=True)),
+                ('lead_time_p95', models.FloatField(blank=True, null=True)),
+                ('lead_time_histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Weekly Flow Rollup',
+                'verbose_name_plural': 'Weekly Flow Rollups',
+                'indexes': [models.Index(fields=['project_key', 'week'], name='weekly_flow_project_week')],
+                'constraints': [models.UniqueConstraint(fields=('project_key', 'issue_type_id', 'week'), name='unique_weekly_flow_rollup')],
+            },
+        ),
+    ]
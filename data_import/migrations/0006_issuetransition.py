@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-16 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0005_flow_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IssueTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('issue_id', models.CharField(max_length=50)),
+                ('history_id', models.CharField(max_length=50)),
+                ('from_status_id', models.CharField(blank=True, default='', max_length=50)),
+                ('from_status', models.CharField(blank=True, default='', max_length=100)),
+                ('to_status_id', models.CharField(max_length=50)),
+                ('to_status', models.CharField(blank=True, default='', max_length=100)),
+                ('transitioned_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Issue Transition',
+                'verbose_name_plural': 'Issue Transitions',
+                'indexes': [models.Index(fields=['issue_id', 'transitioned_at'], name='transition_issue_time')],
+                'constraints': [models.UniqueConstraint(fields=('issue_id', 'history_id'), name='unique_issue_transition')],
+            },
+        ),
+    ]
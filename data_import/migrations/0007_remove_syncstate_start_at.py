@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-17 09:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0006_issuetransition'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='syncstate',
+            name='start_at',
+        ),
+    ]
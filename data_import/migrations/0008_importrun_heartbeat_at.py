@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-17 10:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0007_remove_syncstate_start_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importrun',
+            name='heartbeat_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
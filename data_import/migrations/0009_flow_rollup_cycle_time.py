@@ -0,0 +1,56 @@
+# Generated by Django 5.1.3 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_import', '0008_importrun_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='started',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklyflowrollup',
+            name='cycle_time_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='weeklyflowrollup',
+            name='cycle_time_histogram',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='weeklyflowrollup',
+            name='cycle_time_p50',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklyflowrollup',
+            name='cycle_time_p85',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklyflowrollup',
+            name='cycle_time_p95',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='weeklyflowrollup',
+            name='cycle_time_total',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project_key', 'issue_type_id', 'status_category'], name='issue_group_category'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project_key', 'issue_type_id', 'resolved'], name='issue_group_resolved'),
+        ),
+    ]
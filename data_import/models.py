@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class IssueType(models.Model):
     id = models.CharField(max_length=50, primary_key=True)
@@ -9,6 +10,7 @@ class IssueType(models.Model):
     avatar_id = models.IntegerField(blank=True, null=True)
     subtask = models.BooleanField(default=False)
     project_scope = models.JSONField(blank=True, null=True)
+    content_hash = models.CharField(max_length=32, blank=True, null=True, editable=False)
 
     class Meta:
         verbose_name = "Issue Type"
@@ -17,3 +19,204 @@ class IssueType(models.Model):
     def __str__(self):
         return self.name
 
+
+class Issue(models.Model):
+    id = models.CharField(max_length=50, primary_key=True)
+    key = models.CharField(max_length=50, db_index=True)
+    project_key = models.CharField(max_length=50, db_index=True)
+    issue_type_id = models.CharField(max_length=50, blank=True, null=True)
+    summary = models.TextField(blank=True, null=True)
+    status = models.CharField(max_length=100, blank=True, null=True)
+    status_category = models.CharField(max_length=50, blank=True, null=True)
+    created = models.DateTimeField(blank=True, null=True)
+    updated = models.DateTimeField(blank=True, null=True, db_index=True)
+    resolved = models.DateTimeField(blank=True, null=True)
+    # First entry into an in-progress status, from the changelog (see import_transitions).
+    started = models.DateTimeField(blank=True, null=True)
+    content_hash = models.CharField(max_length=32, blank=True, null=True, editable=False)
+
+    class Meta:
+        verbose_name = "Issue"
+        verbose_name_plural = "Issues"
+        indexes = [
+            # Lookups of data_import.rollups per project and issue type.
+            models.Index(fields=['project_key', 'issue_type_id', 'status_category'], name='issue_group_category'),
+            models.Index(fields=['project_key', 'issue_type_id', 'resolved'], name='issue_group_resolved'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class SyncState(models.Model):
+    """Where the incremental sync of an endpoint stands."""
+    endpoint = models.CharField(max_length=100, unique=True)
+    # Highest "updated" timestamp whose pages have all been committed.
+    watermark = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Sync State"
+        verbose_name_plural = "Sync States"
+
+    def __str__(self):
+        return f"{self.endpoint} @ {self.watermark}"
+
+
+class ImportRun(models.Model):
+    """One import of an endpoint, resumable from its page checkpoints."""
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    endpoint = models.CharField(max_length=100, db_index=True)
+    # Query parameters of the search; a resumed run reuses them so page offsets line up.
+    params = models.JSONField(default=dict)
+    total = models.IntegerField(blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    # Refreshed while the run is being imported; a running run whose heartbeat is
+    # stale was abandoned and may be resumed.
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Import Run"
+        verbose_name_plural = "Import Runs"
+
+    def __str__(self):
+        return f"{self.endpoint} ({self.status}) {self.started_at}"
+
+
+class PageCheckpoint(models.Model):
+    """A page of an import run whose records are committed."""
+    run = models.ForeignKey(ImportRun, on_delete=models.CASCADE, related_name='pages')
+    start_at = models.IntegerField()
+    records = models.IntegerField(default=0)
+    watermark = models.DateTimeField(blank=True, null=True)
+    committed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Page Checkpoint"
+        verbose_name_plural = "Page Checkpoints"
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'start_at'], name='unique_page_checkpoint'),
+        ]
+
+    def __str__(self):
+        return f"{self.run_id} startAt={self.start_at}"
+
+
+class DeadLetterPage(models.Model):
+    """A page that could not be fetched or stored, kept for a targeted retry."""
+    run = models.ForeignKey(ImportRun, on_delete=models.CASCADE, related_name='dead_letters')
+    endpoint = models.CharField(max_length=100, db_index=True)
+    start_at = models.IntegerField()
+    params = models.JSONField(default=dict)
+    error = models.TextField()
+    attempts = models.IntegerField(default=1)
+    resolved = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Dead Letter Page"
+        verbose_name_plural = "Dead Letter Pages"
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'start_at'], name='unique_dead_letter_page'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} startAt={self.start_at}"
+
+
+class WeeklyFlowRollup(models.Model):
+    """Issues resolved per project, issue type and week, with their lead and cycle times (see data_import.rollups)."""
+    project_key = models.CharField(max_length=50)
+    # Empty for issues without an issue type.
+    issue_type_id = models.CharField(max_length=50, blank=True, default='')
+    # Monday (UTC) of the week the issues were resolved in.
+    week = models.DateField()
+    throughput = models.IntegerField(default=0)
+    # Lead time (created to resolved) in hours.
+    lead_time_total = models.FloatField(default=0)
+    lead_time_p50 = models.FloatField(blank=True, null=True)
+    lead_time_p85 = models.FloatField(blank=True, null=True)
+    lead_time_p95 = models.FloatField(blank=True, null=True)
+    # Issues per rollups.LEAD_TIME_BUCKETS bucket, so percentiles can be combined across weeks.
+    lead_time_histogram = models.JSONField(default=list)
+    # Cycle time (started to resolved) in hours, of the issues with a known start.
+    cycle_time_count = models.IntegerField(default=0)
+    cycle_time_total = models.FloatField(default=0)
+    cycle_time_p50 = models.FloatField(blank=True, null=True)
+    cycle_time_p85 = models.FloatField(blank=True, null=True)
+    cycle_time_p95 = models.FloatField(blank=True, null=True)
+    # Issues per rollups.LEAD_TIME_BUCKETS bucket.
+    cycle_time_histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Weekly Flow Rollup"
+        verbose_name_plural = "Weekly Flow Rollups"
+        constraints = [
+            models.UniqueConstraint(fields=['project_key', 'issue_type_id', 'week'], name='unique_weekly_flow_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['project_key', 'week'], name='weekly_flow_project_week'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_key}/{self.issue_type_id or '-'} week of {self.week}: {self.throughput}"
+
+
+class DailyStatusWip(models.Model):
+    """Issues in progress per project, issue type and status at the end of a day's imports."""
+    project_key = models.CharField(max_length=50)
+    issue_type_id = models.CharField(max_length=50, blank=True, default='')
+    status = models.CharField(max_length=100)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Daily Status WIP"
+        verbose_name_plural = "Daily Status WIP"
+        constraints = [
+            models.UniqueConstraint(fields=['project_key', 'issue_type_id', 'status', 'day'],
+                                    name='unique_daily_status_wip'),
+        ]
+        indexes = [
+            models.Index(fields=['project_key', 'day'], name='daily_wip_project_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.project_key}/{self.issue_type_id or '-'} {self.status} on {self.day}: {self.count}"
+
+
+class IssueTransition(models.Model):
+    """A status change of an issue, taken from its changelog."""
+    issue_id = models.CharField(max_length=50)
+    # Id of the changelog history entry the change belongs to.
+    history_id = models.CharField(max_length=50)
+    from_status_id = models.CharField(max_length=50, blank=True, default='')
+    from_status = models.CharField(max_length=100, blank=True, default='')
+    to_status_id = models.CharField(max_length=50)
+    to_status = models.CharField(max_length=100, blank=True, default='')
+    transitioned_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Issue Transition"
+        verbose_name_plural = "Issue Transitions"
+        constraints = [
+            models.UniqueConstraint(fields=['issue_id', 'history_id'], name='unique_issue_transition'),
+        ]
+        indexes = [
+            models.Index(fields=['issue_id', 'transitioned_at'], name='transition_issue_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.issue_id}: {self.from_status} -> {self.to_status} at {self.transitioned_at}"
@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import time
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+
+from data_import.base_processor import BaseProcessor, PreparedBatch, ProcessingResult
+from data_import.bulk_loader import CopyLoader
+from data_import.db_writer import DBWriter, MAX_PENDING_PAGES
+from data_import.metrics import ImportMetrics
+from data_import.transform import TransformSpec, transform_page
+
+PIPELINE_QUEUE_SIZE = 4  # pages buffered between two stages
+
+_STAGE_DONE = object()
+
+
+class ImportPipeline:
+    """Runs an endpoint import as three stages joined by bounded queues.
+
+    The fetch stage drains an async iterator of ``(start_at, page)`` tuples, the
+    extract stage turns each page into a ``PreparedBatch`` and the write stage
+    stores those batches, either directly or, for initial loads, through a
+    ``CopyLoader`` that merges everything once at the end. Because both queues
+    are bounded, a slow database makes the fetch stage wait instead of buffering
+    every page in memory, while HTTP requests keep going out during database writes.
+
+    With an ``executor`` (a process pool) the extract stage hands whole pages to
+    ``transform_page`` in worker processes, keeping up to one page per worker in
+    flight, so parsing no longer competes with the HTTP requests for the event loop.
+
+    With a ``writer`` the write stage queues batches for that ``DBWriter`` thread
+    instead of hopping through ``sync_to_async`` for each of them; ``on_commit_sync``
+    then takes the place of ``on_commit`` and runs in the page's own transaction.
+
+    ``on_commit(start_at, prepared)`` is awaited once a page's rows are committed.
+    With ``on_failure(start_at, error)`` a page that fails to extract or store is
+    reported and skipped instead of aborting the whole run.
+
+    With ``metrics`` the extract and write time of every page, the rows written by
+    outcome and the highest depth of both queues are recorded under ``endpoint``.
+    """
+
+    def __init__(self, processor: BaseProcessor, model, batch_size: int,
+                 logger: logging.Logger, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 loader: Optional[CopyLoader] = None,
+                 on_commit: Optional[Callable[[int, PreparedBatch], Awaitable]] = None,
+                 on_failure: Optional[Callable[[int, BaseException], Awaitable]] = None,
+                 executor: Optional[ProcessPoolExecutor] = None, transform_workers: int = 0,
+                 writer: Optional[DBWriter] = None,
+                 on_commit_sync: Optional[Callable[[int, PreparedBatch], None]] = None,
+                 metrics: Optional[ImportMetrics] = None, endpoint: Optional[str] = None):
+        self.processor = processor
+        self.metrics = metrics
+        self.endpoint = endpoint or model._meta.model_name
+        self.writer = writer
+        self.on_commit_sync = on_commit_sync
+        self.executor = executor
+        # Pages handed to the executor at once; one per worker keeps every core busy.
+        self.transform_workers = max(1, transform_workers)
+        self.loader = loader
+        self.on_commit = on_commit
+        self.on_failure = on_failure
+        self._staged: List[Tuple[int, PreparedBatch]] = []
+        # Hash of every record written in this run. Offset pagination over data that
+        # changes while we read, and the overlap of incremental searches, can return
+        # the same entry twice; identical repeats are dropped before the write stage.
+        # Records of a page are only added once the page is stored, so the repeat of
+        # an entry whose page failed is still written.
+        self._seen_hashes: Dict[Any, str] = {}
+        self.model = model
+        self.batch_size = batch_size
+        self._logger = logger
+        self.page_queue = asyncio.Queue(maxsize=queue_size)
+        self.write_queue = asyncio.Queue(maxsize=queue_size)
+        self.result = ProcessingResult()
+
+    async def run(self, pages: AsyncIterator[Tuple[int, Any]]) -> ProcessingResult:
+        """Run all stages until ``pages`` is exhausted or one of the stages fails.
+
+        A loader's staging table is dropped when the run fails or is cancelled
+        before its rows are merged.
+        """
+        if self.loader:
+            await self.loader.start()
+        try:
+            await self.run_stages(pages)
+            if self.loader:
+                await self.loader.merge()
+        except BaseException:
+            if self.loader:
+                await self.loader.drop()
+            raise
+        if self.loader:
+            if self.processor.rollups:
+                # COPY bypasses the per-batch rollup refresh.
+                await sync_to_async(self.processor.rollups.rebuild)()
+            # Staged rows only count as committed once they are merged.
+            if self.on_commit:
+                for start_at, prepared in self._staged:
+                    await self.on_commit(start_at, prepared)
+        return self.result
+
+    async def run_stages(self, pages: AsyncIterator[Tuple[int, Any]]):
+        stages = [
+            asyncio.create_task(self.fetch_stage(pages)),
+            asyncio.create_task(self.extract_stage()),
+            asyncio.create_task(self.write_stage()),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for stage in stages:
+                stage.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+
+    def drop_repeated(self, prepared: PreparedBatch):
+        """Remove records already written in this run with the same content, and repeats within the page."""
+        if not prepared.pk_field:
+            return
+        records = []
+        in_page = set()
+        for pk_value, data in prepared.records:
+            content_hash = prepared.hashes.get(pk_value)
+            if pk_value in in_page or self._seen_hashes.get(pk_value) == content_hash:
+                prepared.duplicates += 1
+                continue
+            in_page.add(pk_value)
+            records.append((pk_value, data))
+        prepared.records = records
+
+    def remember_written(self, prepared: PreparedBatch):
+        """Record the hashes of a stored page, so later repeats of its records are dropped."""
+        if prepared.pk_field:
+            for pk_value, _ in prepared.records:
+                self._seen_hashes[pk_value] = prepared.hashes.get(pk_value)
+
+    async def page_failed(self, start_at: int, error: Exception):
+        """Report a failed page, or fail the run when nobody collects failures."""
+        if not self.on_failure:
+            raise error
+        self.result.errors.append(f"startAt={start_at}: {error}")
+        await self.on_failure(start_at, error)
+
+    async def _put(self, queue: asyncio.Queue, item, name: str):
+        await queue.put(item)
+        if self.metrics:
+            self.metrics.set_max('jira_import_queue_depth_max', queue.qsize(), endpoint=self.endpoint, queue=name)
+
+    def _observe(self, name: str, started: float):
+        if self.metrics:
+            self.metrics.observe(name, time.perf_counter() - started, endpoint=self.endpoint)
+
+    async def fetch_stage(self, pages: AsyncIterator[Tuple[int, Any]]):
+        try:
+            async for start_at, page in pages:
+                await self._put(self.page_queue, (start_at, page), 'page')
+        finally:
+            await pages.aclose()
+        await self.page_queue.put(_STAGE_DONE)
+
+    async def extract_stage(self):
+        if self.executor:
+            await self.pooled_extract_stage()
+            return
+        field_mappings = self.processor.field_mappings
+        while True:
+            item = await self.page_queue.get()
+            if item is _STAGE_DONE:
+                break
+            start_at, page = item
+            started = time.perf_counter()
+            try:
+                if isinstance(page, PreparedBatch):
+                    prepared = page  # streamed pages are prepared while they download
+                else:
+                    entries = self.processor.parse_objects(page)
+                    prepared = self.processor.prepare_entries(entries, field_mappings)
+                    self._observe('jira_import_extract_seconds', started)
+            except Exception as e:
+                await self.page_failed(start_at, e)
+                continue
+            self.drop_repeated(prepared)
+            await self._put(self.write_queue, (start_at, prepared), 'write')
+        await self.write_queue.put(_STAGE_DONE)
+
+    async def pooled_extract_stage(self):
+        loop = asyncio.get_running_loop()
+        spec = TransformSpec.for_processor(self.processor)
+        in_flight = {}
+        getter = None
+        done_reading = False
+        try:
+            while in_flight or not done_reading:
+                if not done_reading and getter is None and len(in_flight) < self.transform_workers:
+                    getter = asyncio.ensure_future(self.page_queue.get())
+                waiting = set(in_flight) | ({getter} if getter else set())
+                done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+                if getter in done:
+                    item = getter.result()
+                    getter = None
+                    if item is _STAGE_DONE:
+                        done_reading = True
+                    else:
+                        start_at, page = item
+                        future = loop.run_in_executor(self.executor, transform_page, page, spec)
+                        in_flight[future] = (start_at, time.perf_counter())
+
+                for future in done:
+                    if future not in in_flight:
+                        continue
+                    start_at, started = in_flight.pop(future)
+                    if future.exception() is not None:
+                        await self.page_failed(start_at, future.exception())
+                        continue
+                    prepared = future.result().to_prepared(spec)
+                    self._observe('jira_import_extract_seconds', started)
+                    self.drop_repeated(prepared)
+                    await self._put(self.write_queue, (start_at, prepared), 'write')
+        finally:
+            if getter:
+                getter.cancel()
+            for future in in_flight:
+                future.cancel()
+        await self.write_queue.put(_STAGE_DONE)
+
+    async def write_stage(self):
+        if self.writer and not self.loader:
+            await self.writer_stage()
+            return
+        while True:
+            item = await self.write_queue.get()
+            if item is _STAGE_DONE:
+                break
+            start_at, prepared = item
+            started = time.perf_counter()
+            try:
+                if self.loader:
+                    batch_result = await self.loader.copy_batch(prepared)
+                else:
+                    batch_result = await self.processor.write_prepared(prepared, self.model, self.batch_size)
+            except Exception as e:
+                await self.page_failed(start_at, e)
+                continue
+            self._observe('jira_import_write_seconds', started)
+            await self.page_stored(start_at, prepared, batch_result)
+
+    async def writer_stage(self):
+        """Hand batches to the ``DBWriter`` without waiting for each commit, so it can coalesce them."""
+        pending = set()
+        try:
+            while True:
+                item = await self.write_queue.get()
+                if item is _STAGE_DONE:
+                    break
+                start_at, prepared = item
+                pending.add(asyncio.create_task(self.write_through_writer(start_at, prepared)))
+                if len(pending) >= MAX_PENDING_PAGES:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+            await asyncio.gather(*pending)
+            pending = set()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def write_through_writer(self, start_at: int, prepared: PreparedBatch):
+        after_write = partial(self.on_commit_sync, start_at, prepared) if self.on_commit_sync else None
+        started = time.perf_counter()
+        try:
+            batch_result = await self.writer.submit(self.processor, self.model, prepared, self.batch_size,
+                                                    after_write=after_write)
+        except Exception as e:
+            await self.page_failed(start_at, e)
+            return
+        self._observe('jira_import_write_seconds', started)
+        await self.page_stored(start_at, prepared, batch_result, committed=after_write is not None)
+
+    async def page_stored(self, start_at: int, prepared: PreparedBatch, batch_result: ProcessingResult,
+                          committed: bool = False):
+        self.remember_written(prepared)
+        if self.loader:
+            self._staged.append((start_at, prepared))
+        elif self.on_commit and not committed:
+            await self.on_commit(start_at, prepared)
+        self.result.add(batch_result)
+        if self.metrics:
+            for outcome in ('inserted', 'updated', 'unchanged', 'failed'):
+                self.metrics.inc('jira_import_rows_total', getattr(batch_result, outcome),
+                                 endpoint=self.endpoint, outcome=outcome)
+        self._logger.info(
+            f"Stored {batch_result.successful} records (startAt={start_at}): "
+            f"{batch_result.inserted} inserted, {batch_result.updated} updated, "
+            f"{batch_result.unchanged} unchanged. Total processed: {self.result.successful}."
+        )
@@ -0,0 +1,43 @@
+from data_import.models import Issue
+from data_import.base_processor import BaseProcessor, FieldMapping
+from data_import.registry import ProcessorRegistry
+from data_import.rollups import FlowRollups
+import os
+from typing import Any
+
+
+def register_processor(registry: ProcessorRegistry):
+    registry.register(
+        endpoint='issues',
+        api_url=os.getenv('JIRA_SERVER')+'rest/api/3/search',
+        model=Issue,
+        processor_class=IssueProcessor,
+        depends_on=['issuetypes'],
+        sync_interval=5 * 60
+    )
+
+
+class IssueProcessor(BaseProcessor):
+    field_mappings = {
+        'id': FieldMapping('id', 'id', 'string', required=True, is_primary_key=True),
+        'key': FieldMapping('key', 'key', 'string'),
+        'project_key': FieldMapping('fields.project.key', 'project_key', 'string'),
+        'issue_type_id': FieldMapping('fields.issuetype.id', 'issue_type_id', 'string'),
+        'summary': FieldMapping('fields.summary', 'summary', 'string'),
+        'status': FieldMapping('fields.status.name', 'status', 'string'),
+        'status_category': FieldMapping('fields.status.statusCategory.key', 'status_category', 'string'),
+        'created': FieldMapping('fields.created', 'created', 'datetime'),
+        'updated': FieldMapping('fields.updated', 'updated', 'datetime'),
+        'resolved': FieldMapping('fields.resolutiondate', 'resolved', 'datetime'),
+    }
+    watermark_field = 'fields.updated'
+    base_jql = os.getenv('JIRA_JQL', '')
+    request_params = {
+        'fields': 'summary,status,issuetype,project,created,updated,resolutiondate',
+    }
+    rollups = FlowRollups()
+
+    async def process_objects(self, json_data: Any, batch_size: int) -> int:
+        """Process issue objects using the shared logic in BaseProcessor."""
+        entries = self.parse_objects(json_data)
+        return await self.process_entries(entries, Issue, self.field_mappings, batch_size)
@@ -2,6 +2,7 @@ from data_import.models import IssueType
 from data_import.base_processor import BaseProcessor, FieldMapping
 from data_import.registry import ProcessorRegistry
 import os
+from typing import Any
 
 
 def register_processor(registry: ProcessorRegistry):
@@ -9,7 +10,8 @@ def register_processor(registry: ProcessorRegistry):
         endpoint='issuetypes',
         api_url=os.getenv('JIRA_SERVER')+'rest/api/3/issuetype/issuetype',
         model=IssueType,
-        processor_class=IssueTypeProcessor
+        processor_class=IssueTypeProcessor,
+        sync_interval=24 * 60 * 60
     )
 
 
@@ -24,8 +26,9 @@ class IssueTypeProcessor(BaseProcessor):
         'subtask': FieldMapping('subtask', 'subtask', 'boolean'),
         'project_scope': FieldMapping('scope', 'project_scope', 'json')
     }
+    cache_responses = True
 
-    async def process_objects(self, json_data: str, batch_size: int) -> int:
+    async def process_objects(self, json_data: Any, batch_size: int) -> int:
         """Process issue type objects using the shared logic in BaseProcessor."""
-        entries = self.data_processor.parse_json(json_data)
+        entries = self.parse_objects(json_data)
         return await self.process_entries(entries, IssueType, self.field_mappings, batch_size)
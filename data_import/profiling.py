@@ -0,0 +1,175 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime as DateTime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+CPROFILE = 'cprofile'
+SAMPLING = 'sampling'
+PROFILE_MODES = (CPROFILE, SAMPLING)
+SAMPLE_INTERVAL = 0.005  # seconds between two stack samples
+TOP_FUNCTIONS = 50  # functions listed in the text report of a cProfile run
+TOP_QUERIES = 20  # slowest statements listed in the query report
+SQL_PREFIX = 200  # characters of a statement used to group it
+
+
+class QueryStats:
+    """Execute wrapper counting the SQL statements of every connection it is installed on, with their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+        # statement prefix -> [count, total seconds]
+        self._statements: Dict[str, list] = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            statement = ' '.join(str(sql).split())[:SQL_PREFIX]
+            with self._lock:
+                self.count += 1
+                self.total += elapsed
+                stats = self._statements.setdefault(statement, [0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            slowest = sorted(self._statements.items(), key=lambda item: item[1][1], reverse=True)[:TOP_QUERIES]
+            return {
+                'queries': self.count,
+                'total_seconds': round(self.total, 6),
+                'slowest': [{'sql': sql, 'count': count, 'total_seconds': round(total, 6)}
+                            for sql, (count, total) in slowest],
+            }
+
+
+class StackSampler:
+    """Samples the stacks of every thread at a fixed interval, so the DB writer and pool threads are covered too.
+
+    Stacks are counted in the "collapsed" format (``thread;outer;...;inner count``)
+    read by flame graph tools such as flamegraph.pl or speedscope.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='data-import-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = ';'.join(
+                    f"{entry.name} ({Path(entry.filename).name}:{entry.lineno})"
+                    for entry in traceback.extract_stack(frame)
+                )
+                self.samples[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ImportProfiler:
+    """Profiles an import run and writes its reports to a new directory under ``directory``.
+
+    In ``cprofile`` mode the thread that runs the event loop is profiled
+    deterministically; ``sampling`` mode samples every thread instead, at a lower
+    overhead. Either way every SQL statement sent by connections opened during the
+    run (and by the connections already open in this thread) is counted and timed.
+    ``write_reports`` also stores the wall time of the run and the per-stage
+    timings of the run's ``ImportMetrics`` summary.
+    """
+
+    def __init__(self, directory, mode: str = CPROFILE, logger: Optional[logging.Logger] = None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.directory = Path(directory) / DateTime.now().strftime('import-%Y%m%d-%H%M%S')
+        self.mode = mode
+        self.queries = QueryStats()
+        self.wall_time = 0.0
+        self._logger = logger or logging.getLogger(__name__)
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._wrapped = []
+        self._started = None
+
+    def _install(self, connection, **kwargs):
+        if self.queries not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self.queries)
+            self._wrapped.append(connection)
+
+    def __enter__(self):
+        connection_created.connect(self._install, dispatch_uid='data_import.profiling')
+        for connection in connections.all(initialized_only=True):
+            self._install(connection)
+        if self.mode == CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler()
+            self._sampler.start()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_time = time.perf_counter() - self._started
+        if self._profile:
+            self._profile.disable()
+        if self._sampler:
+            self._sampler.stop()
+        connection_created.disconnect(dispatch_uid='data_import.profiling')
+        for connection in self._wrapped:
+            if self.queries in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self.queries)
+        self._wrapped = []
+        return False
+
+    def write_reports(self, stages: Optional[Dict[str, Any]] = None) -> Path:
+        """Write the profile, the query report and the stage timings; returns the report directory."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self._profile:
+            self._profile.dump_stats(str(self.directory / 'profile.pstats'))
+            text = io.StringIO()
+            pstats.Stats(self._profile, stream=text).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            (self.directory / 'profile.txt').write_text(text.getvalue(), encoding='utf-8')
+        if self._sampler:
+            (self.directory / 'profile.collapsed').write_text(self._sampler.collapsed(), encoding='utf-8')
+        (self.directory / 'queries.json').write_text(json.dumps(self.queries.report(), indent=2), encoding='utf-8')
+        (self.directory / 'stages.json').write_text(
+            json.dumps({'wall_seconds': round(self.wall_time, 6), 'stages': stages or {}}, indent=2, sort_keys=True),
+            encoding='utf-8'
+        )
+        self._logger.info(
+            f"Profile written to {self.directory}: {self.wall_time:.2f}s wall time, "
+            f"{self.queries.count} SQL queries taking {self.queries.total:.2f}s"
+        )
+        return self.directory
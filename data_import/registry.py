@@ -1,8 +1,11 @@
-from typing import Dict, Type
+from typing import Dict, List, Optional, Type
 from django.db import models
 import logging
 import importlib
 from pathlib import Path
+from django.conf import settings
+
+DEFAULT_SYNC_INTERVAL = 15 * 60  # seconds between periodic syncs of an endpoint
 
 
 class ProcessorRegistry:
@@ -14,14 +17,24 @@ class ProcessorRegistry:
             cls._instance.processors = {}
             cls._instance.endpoints = {}
             cls._instance.models = {}
+            cls._instance.dependencies = {}
+            cls._instance.sync_intervals = {}
             cls._instance.auto_discover()  # Auto-discover on instantiation
         return cls._instance
 
-    def register(self, endpoint: str, api_url: str, model: Type[models.Model], processor_class: Type):
-        """Register a new processor with its associated endpoint, URL, and model."""
+    def register(self, endpoint: str, api_url: str, model: Type[models.Model], processor_class: Type,
+                 depends_on: Optional[List[str]] = None, sync_interval: Optional[int] = DEFAULT_SYNC_INTERVAL):
+        """Register a new processor with its associated endpoint, URL, and model.
+
+        ``depends_on`` lists endpoints that must finish importing before this one starts.
+        ``sync_interval`` is the number of seconds between periodic syncs of the
+        endpoint, or ``None`` to leave it out of the periodic schedule.
+        """
         self.processors[endpoint] = processor_class
         self.endpoints[endpoint] = api_url
         self.models[endpoint] = model
+        self.dependencies[endpoint] = list(depends_on or [])
+        self.sync_intervals[endpoint] = sync_interval
 
     @classmethod
     def get_instance(cls):
@@ -61,3 +74,14 @@ class ProcessorRegistry:
     def get_model(self, endpoint: str):
         """Retrieve the model associated with a specific endpoint."""
         return self.models.get(endpoint)
+
+    def get_dependencies(self, endpoint: str) -> List[str]:
+        """Retrieve the endpoints that must be imported before a specific endpoint."""
+        return self.dependencies.get(endpoint, [])
+
+    def get_sync_interval(self, endpoint: str) -> Optional[int]:
+        """Seconds between periodic syncs of an endpoint; ``DATA_IMPORT_SYNC_INTERVALS`` overrides the registration."""
+        overrides = getattr(settings, 'DATA_IMPORT_SYNC_INTERVALS', {})
+        if endpoint in overrides:
+            return overrides[endpoint]
+        return self.sync_intervals.get(endpoint)
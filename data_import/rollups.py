@@ -0,0 +1,316 @@
+import logging
+import math
+from bisect import bisect_left
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from functools import partial
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import router, transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from data_import.api_cache import bump_data_version
+from data_import.models import DailyStatusWip, Issue, IssueTransition, WeeklyFlowRollup
+
+# Upper bounds, in hours, of the lead time histogram buckets; the last bucket is open.
+LEAD_TIME_BUCKETS = (1, 4, 8, 24, 48, 72, 120, 168, 336, 504, 720, 1440, 2160, 4320, 8760)
+PERCENTILES = (0.5, 0.85, 0.95)
+WIP_CATEGORY = 'indeterminate'  # Jira's status category of work in progress
+
+Group = Tuple[str, str]  # (project_key, issue_type_id)
+Cell = Tuple[str, str, date]  # (project_key, issue_type_id, week)
+
+logger = logging.getLogger(__name__)
+
+
+def week_of(moment: datetime) -> date:
+    """Monday (UTC) of the week ``moment`` falls in."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(dt_timezone.utc)
+    day = moment.date()
+    return day - timedelta(days=day.weekday())
+
+
+def percentile(ordered: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def lead_time_histogram(lead_times: Iterable[float]) -> List[int]:
+    counts = [0] * (len(LEAD_TIME_BUCKETS) + 1)
+    for hours in lead_times:
+        counts[bisect_left(LEAD_TIME_BUCKETS, hours)] += 1
+    return counts
+
+
+def _group_filter(group: Group) -> Q:
+    """Issues of a group; an empty key also matches issues without a value."""
+    conditions = Q()
+    for field_name, value in zip(('project_key', 'issue_type_id'), group):
+        if value:
+            conditions &= Q(**{field_name: value})
+        else:
+            conditions &= Q(**{f'{field_name}__isnull': True}) | Q(**{field_name: ''})
+    return conditions
+
+
+def _hours(start: Optional[datetime], end: datetime) -> Optional[float]:
+    return max(0.0, (end - start).total_seconds() / 3600) if start else None
+
+
+def _summary(prefix: str, hours: List[float]) -> Dict[str, Any]:
+    """Total, percentiles and histogram of ``hours`` as ``WeeklyFlowRollup`` fields starting with ``prefix``."""
+    hours.sort()
+    return {
+        f'{prefix}_total': sum(hours),
+        f'{prefix}_p50': percentile(hours, PERCENTILES[0]),
+        f'{prefix}_p85': percentile(hours, PERCENTILES[1]),
+        f'{prefix}_p95': percentile(hours, PERCENTILES[2]),
+        f'{prefix}_histogram': lead_time_histogram(hours),
+    }
+
+
+@dataclass
+class TouchedRollups:
+    """What a batch of changed issues changes in the rollups.
+
+    ``weeks`` are the week cells to recompute, ``wip`` the change in the number
+    of issues in progress per project, issue type and status, and ``groups`` are
+    recounted in full (e.g. by ``FlowRollups.rebuild``).
+    """
+    weeks: Set[Cell] = field(default_factory=set)
+    groups: Set[Group] = field(default_factory=set)
+    wip: Dict[Tuple[str, str, str], int] = field(default_factory=dict)
+
+    def add(self, project_key: Optional[str], issue_type_id: Optional[str], resolved: Optional[datetime],
+            status: Optional[str] = None, status_category: Optional[str] = None, change: int = 1):
+        """Count an issue version in (``change`` 1) or out of (``change`` -1) the rollups."""
+        group = (project_key or '', issue_type_id or '')
+        if resolved:
+            self.weeks.add((*group, week_of(resolved)))
+        if status_category == WIP_CATEGORY:
+            key = (*group, status or '')
+            self.wip[key] = self.wip.get(key, 0) + change
+
+    def update(self, other: 'TouchedRollups'):
+        self.weeks |= other.weeks
+        self.groups |= other.groups
+        for key, change in other.wip.items():
+            self.wip[key] = self.wip.get(key, 0) + change
+
+    def __bool__(self):
+        return bool(self.weeks or self.groups or any(self.wip.values()))
+
+
+class FlowRollups:
+    """Keeps ``WeeklyFlowRollup`` and ``DailyStatusWip`` up to date with the ``Issue`` table.
+
+    A processor that sets ``rollups`` hands every batch to it: ``touched_before``
+    locks the changed issues and takes their stored versions out of the rollups,
+    ``touched_by`` adds their new versions, and ``refresh`` applies that inside the
+    batch's transaction. A week cell holds the issues resolved in that week, with
+    their lead time (created to resolved) and, where the changelog told when work
+    started, cycle time (started to resolved); touched cells are recomputed from
+    the issues resolved in that week only. The WIP of a project and issue type
+    is recorded per day: the rows of the current day are carried over from the
+    last recorded day and the batch's changes are added to them, so the last row
+    on or before a day is that day's WIP.
+
+    Batches of different import shards run concurrently. The issue rows, the week
+    cells and a per-day row of each WIP group are locked before they are read, so
+    that concurrent batches update a cell one after another, each seeing what the
+    other committed. ``rebuild`` recomputes everything, e.g. after an initial load
+    through COPY, which bypasses the batch hook.
+    """
+
+    def touched_before(self, model, pks: List[Any]) -> TouchedRollups:
+        touched = TouchedRollups()
+        if pks:
+            for project_key, issue_type_id, resolved, status, status_category in (
+                    model.objects.select_for_update().filter(pk__in=pks).order_by('pk').values_list(
+                        'project_key', 'issue_type_id', 'resolved', 'status', 'status_category')):
+                touched.add(project_key, issue_type_id, resolved, status, status_category, change=-1)
+        return touched
+
+    def touched_by(self, records: Iterable[Dict[str, Any]]) -> TouchedRollups:
+        touched = TouchedRollups()
+        for data in records:
+            touched.add(data.get('project_key'), data.get('issue_type_id'), data.get('resolved'),
+                        data.get('status'), data.get('status_category'))
+        return touched
+
+    def refresh(self, touched: TouchedRollups, day: Optional[date] = None):
+        weeks_by_group: Dict[Group, Set[date]] = defaultdict(set)
+        for project_key, issue_type_id, week in touched.weeks:
+            weeks_by_group[(project_key, issue_type_id)].add(week)
+        wip_by_group: Dict[Group, Dict[str, int]] = defaultdict(dict)
+        for (project_key, issue_type_id, status), change in touched.wip.items():
+            if change:
+                wip_by_group[(project_key, issue_type_id)][status] = change
+        day = day or timezone.now().date()
+        with transaction.atomic():
+            # Always in the same order, so that concurrent batches cannot deadlock on the locks.
+            for group in sorted(weeks_by_group):
+                self.refresh_weeks(group, weeks_by_group[group])
+            for group in sorted(set(wip_by_group) | touched.groups):
+                if group in touched.groups:
+                    self.refresh_wip(group, day)
+                else:
+                    self.apply_wip(group, wip_by_group[group], day)
+        for model in (WeeklyFlowRollup, DailyStatusWip):
+            transaction.on_commit(partial(bump_data_version, model), using=router.db_for_write(model))
+
+    def refresh_weeks(self, group: Group, weeks: Set[date]):
+        """Recompute the week cells of ``group`` from the issues resolved in those weeks."""
+        project_key, issue_type_id = group
+        cells = WeeklyFlowRollup.objects.filter(project_key=project_key, issue_type_id=issue_type_id,
+                                                week__in=weeks)
+        # Create missing cells and lock them all; a concurrent batch of the group waits
+        # here until this one commits, and then sees its issues.
+        WeeklyFlowRollup.objects.bulk_create(
+            [WeeklyFlowRollup(project_key=project_key, issue_type_id=issue_type_id, week=week)
+             for week in sorted(weeks)],
+            ignore_conflicts=True,
+        )
+        list(cells.select_for_update().order_by('week').values_list('pk', flat=True))
+
+        start = datetime.combine(min(weeks), datetime.min.time(), dt_timezone.utc)
+        end = datetime.combine(max(weeks) + timedelta(days=7), datetime.min.time(), dt_timezone.utc)
+        lead_times: Dict[date, List[float]] = {week: [] for week in weeks}
+        cycle_times: Dict[date, List[float]] = {week: [] for week in weeks}
+        issues = Issue.objects.filter(_group_filter(group), resolved__gte=start, resolved__lt=end)
+        for created, started, resolved in issues.values_list('created', 'started', 'resolved').iterator():
+            week = week_of(resolved)
+            if week in lead_times:
+                lead_times[week].append(_hours(created, resolved) or 0.0)
+                if started and started <= resolved:
+                    cycle_times[week].append(_hours(started, resolved))
+
+        rows = []
+        empty = []
+        for week, values in lead_times.items():
+            if not values:
+                empty.append(week)
+                continue
+            rows.append(WeeklyFlowRollup(
+                project_key=project_key,
+                issue_type_id=issue_type_id,
+                week=week,
+                throughput=len(values),
+                cycle_time_count=len(cycle_times[week]),
+                updated_at=timezone.now(),
+                **_summary('lead_time', values),
+                **_summary('cycle_time', cycle_times[week]),
+            ))
+        if empty:
+            cells.filter(week__in=empty).delete()
+        if rows:
+            WeeklyFlowRollup.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['project_key', 'issue_type_id', 'week'],
+                update_fields=['throughput', 'lead_time_total', 'lead_time_p50', 'lead_time_p85',
+                               'lead_time_p95', 'lead_time_histogram', 'cycle_time_count', 'cycle_time_total',
+                               'cycle_time_p50', 'cycle_time_p85', 'cycle_time_p95', 'cycle_time_histogram',
+                               'updated_at'],
+            )
+
+    def _lock_wip_day(self, group: Group, day: date) -> Dict[str, int]:
+        """Lock the WIP of ``group`` on ``day`` and return its counts per status.
+
+        The row with the empty status marks the day as recorded and serves as the
+        lock; a day that was not recorded yet starts from the last recorded one.
+        """
+        project_key, issue_type_id = group
+        rows = DailyStatusWip.objects.filter(project_key=project_key, issue_type_id=issue_type_id)
+        DailyStatusWip.objects.bulk_create(
+            [DailyStatusWip(project_key=project_key, issue_type_id=issue_type_id, status='', day=day, count=0)],
+            ignore_conflicts=True,
+        )
+        list(rows.select_for_update().filter(day=day, status='').values_list('pk', flat=True))
+        counts = dict(rows.filter(day=day).values_list('status', 'count'))
+        if len(counts) == 1:
+            previous = rows.filter(day__lt=day).aggregate(Max('day'))['day__max']
+            if previous is not None:
+                counts.update(rows.filter(day=previous).exclude(status='').values_list('status', 'count'))
+        return counts
+
+    def _save_wip_day(self, group: Group, day: date, counts: Dict[str, int]):
+        project_key, issue_type_id = group
+        DailyStatusWip.objects.bulk_create(
+            [DailyStatusWip(project_key=project_key, issue_type_id=issue_type_id, status=status, day=day,
+                            count=max(0, count))
+             for status, count in counts.items() if status],
+            update_conflicts=True,
+            unique_fields=['project_key', 'issue_type_id', 'status', 'day'],
+            update_fields=['count'],
+        )
+
+    def apply_wip(self, group: Group, changes: Dict[str, int], day: date):
+        """Add ``changes`` (per status) to the WIP of ``group`` on ``day``."""
+        project_key, issue_type_id = group
+        recorded = DailyStatusWip.objects.filter(project_key=project_key, issue_type_id=issue_type_id).exists()
+        if not recorded:
+            # Counting also takes in this batch's changes.
+            self.refresh_wip(group, day)
+            return
+        counts = self._lock_wip_day(group, day)
+        for status, change in changes.items():
+            counts[status] = counts.get(status, 0) + change
+        self._save_wip_day(group, day, counts)
+
+    def refresh_wip(self, group: Group, day: date):
+        """Count the issues of ``group`` in progress, per status, as the WIP of ``day``."""
+        counts = self._lock_wip_day(group, day)
+        current = dict(
+            Issue.objects.filter(_group_filter(group), status_category=WIP_CATEGORY)
+            .values('status').annotate(count=Count('pk')).values_list('status', 'count')
+        )
+        self._save_wip_day(group, day, {
+            **{status: 0 for status in counts},
+            **{status or '': count for status, count in current.items()},
+        })
+
+    def refresh_started(self, issue_ids: List[str], start_statuses: Set[str]):
+        """Set ``Issue.started`` from the stored transitions of ``issue_ids`` and recompute the weeks that changes."""
+        if not issue_ids:
+            return
+        first_starts = dict(
+            IssueTransition.objects.filter(issue_id__in=issue_ids, to_status__in=start_statuses)
+            .values('issue_id').annotate(first=Min('transitioned_at')).values_list('issue_id', 'first')
+        )
+        with transaction.atomic():
+            changed = []
+            touched = TouchedRollups()
+            for issue in Issue.objects.select_for_update().filter(pk__in=issue_ids).order_by('pk').only(
+                    'pk', 'project_key', 'issue_type_id', 'resolved', 'started'):
+                started = first_starts.get(issue.pk)
+                if issue.started != started:
+                    issue.started = started
+                    changed.append(issue)
+                    touched.add(issue.project_key, issue.issue_type_id, issue.resolved)
+            Issue.objects.bulk_update(changed, ['started'])
+            if touched:
+                self.refresh(touched)
+
+    def rebuild(self):
+        """Recompute every rollup from the whole ``Issue`` table, one project and issue type at a time."""
+        groups = {(project_key or '', issue_type_id or '')
+                  for project_key, issue_type_id in Issue.objects.values_list('project_key', 'issue_type_id').distinct()}
+        rolled_up = set(WeeklyFlowRollup.objects.values_list('project_key', 'issue_type_id').distinct())
+        for project_key, issue_type_id in rolled_up - groups:
+            WeeklyFlowRollup.objects.filter(project_key=project_key, issue_type_id=issue_type_id).delete()
+        for group in sorted(groups):
+            resolved = Issue.objects.filter(_group_filter(group), resolved__isnull=False).values_list('resolved', flat=True)
+            weeks = {week_of(moment) for moment in resolved.iterator()}
+            with transaction.atomic():
+                stale = WeeklyFlowRollup.objects.filter(project_key=group[0], issue_type_id=group[1])
+                stale.exclude(week__in=weeks).delete()
+                if weeks:
+                    self.refresh_weeks(group, weeks)
+        self.refresh(TouchedRollups(groups=groups))
+        logger.info(f"Rebuilt flow rollups of {len(groups)} project / issue type groups")
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from data_import.registry import ProcessorRegistry
+
+MIN_CONCURRENT_FETCHES = 1
+CONCURRENCY_INCREASE_AFTER = 5  # successful fetches before the window grows again
+DEFAULT_PARALLEL_ENDPOINTS = 3
+
+
+class FetchWindow:
+    """Adaptive number of page requests an endpoint may keep in flight.
+
+    The window halves (down to ``MIN_CONCURRENT_FETCHES``) whenever Jira throttles
+    a request and grows by one after a run of successful requests, up to ``maximum``.
+    """
+
+    def __init__(self, maximum: int, logger: logging.Logger):
+        self.maximum = max(maximum, MIN_CONCURRENT_FETCHES)
+        self.current = self.maximum
+        self._successes = 0
+        self._logger = logger
+
+    def throttled(self, status: int):
+        """Shrink the window after Jira signals it is overloaded."""
+        self._successes = 0
+        reduced = max(MIN_CONCURRENT_FETCHES, self.current // 2)
+        if reduced < self.current:
+            self._logger.warning(f"Received {status}; reducing concurrent fetches from {self.current} to {reduced}")
+        self.current = reduced
+
+    def succeeded(self):
+        """Widen the window again after a run of successful requests."""
+        self._successes += 1
+        if self._successes >= CONCURRENCY_INCREASE_AFTER and self.current < self.maximum:
+            self.current += 1
+            self._successes = 0
+            self._logger.debug(f"Increased concurrent fetches to {self.current}")
+
+
+class EndpointScheduler:
+    """Runs several registered endpoints at once while honouring their dependencies.
+
+    An endpoint starts only after every endpoint it depends on (see
+    ``ProcessorRegistry.register``) has finished, and at most ``max_parallel``
+    endpoints run at the same time. An endpoint whose dependency failed is not
+    run and counts as failed itself. Dependencies on endpoints that are not part
+    of the run are ignored.
+    """
+
+    def __init__(self, registry: ProcessorRegistry, max_parallel: int, logger: logging.Logger):
+        self.registry = registry
+        self.max_parallel = max(1, max_parallel)
+        self._logger = logger
+
+    def resolve_order(self, endpoints: List[str]) -> List[str]:
+        """Order ``endpoints`` so that dependencies come first; raises ``ValueError`` on cycles."""
+        selected = set(endpoints)
+        ordered: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(endpoint: str, path: List[str]):
+            if state.get(endpoint) == 'done':
+                return
+            if state.get(endpoint) == 'visiting':
+                raise ValueError(f"Dependency cycle between endpoints: {' -> '.join(path + [endpoint])}")
+            state[endpoint] = 'visiting'
+            for dependency in self.registry.get_dependencies(endpoint):
+                if dependency in selected:
+                    visit(dependency, path + [endpoint])
+            state[endpoint] = 'done'
+            ordered.append(endpoint)
+
+        for endpoint in endpoints:
+            visit(endpoint, [])
+        return ordered
+
+    async def run(self, endpoints: List[str], run_endpoint: Callable[[str], Awaitable[Optional[bool]]]) -> Set[str]:
+        """Run ``endpoints``; ``run_endpoint`` returns ``False`` (or raises) when an endpoint failed.
+
+        Returns the endpoints that failed, including the ones skipped because a
+        dependency failed.
+        """
+        ordered = self.resolve_order(endpoints)
+        finished = {endpoint: asyncio.Event() for endpoint in ordered}
+        failed: Set[str] = set()
+        slots = asyncio.Semaphore(self.max_parallel)
+
+        async def run_one(endpoint: str):
+            try:
+                dependencies = [dependency for dependency in self.registry.get_dependencies(endpoint)
+                                if dependency in finished]
+                for dependency in dependencies:
+                    await finished[dependency].wait()
+                failed_dependencies = [dependency for dependency in dependencies if dependency in failed]
+                if failed_dependencies:
+                    self._logger.error(f"Skipping endpoint {endpoint}: "
+                                       f"{', '.join(failed_dependencies)} failed")
+                    failed.add(endpoint)
+                    return
+                async with slots:
+                    self._logger.info(f"Starting processing for endpoint: {endpoint}")
+                    if await run_endpoint(endpoint) is False:
+                        failed.add(endpoint)
+                    else:
+                        self._logger.info(f"Completed processing for endpoint: {endpoint}")
+            except BaseException:
+                failed.add(endpoint)
+                raise
+            finally:
+                finished[endpoint].set()
+
+        await asyncio.gather(*(run_one(endpoint) for endpoint in ordered))
+        return failed
@@ -0,0 +1,216 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from data_import.base_processor import BaseProcessor, _convert_datetime, get_json_value
+from data_import.models import SyncState
+
+# Re-read this much before the watermark: JQL compares at minute precision and
+# the clocks of Jira and this host may differ slightly.
+SYNC_OVERLAP = timedelta(minutes=2)
+# Timezone Jira uses to interpret JQL dates, i.e. the importing user's profile timezone.
+JQL_TIMEZONE = os.getenv('JIRA_TIMEZONE', 'UTC')
+# Pages numbered per time window of a windowed search (see window_start_at).
+WINDOW_PAGES = 1 << 16
+
+
+def query_start(watermark: Optional[datetime], overlap: timedelta = SYNC_OVERLAP) -> Optional[datetime]:
+    """Minute, in ``JQL_TIMEZONE``, an incremental search from ``watermark`` (minus ``overlap``) starts at."""
+    if watermark is None:
+        return None
+    if watermark.tzinfo is None:
+        watermark = watermark.replace(tzinfo=timezone.utc)
+    return (watermark - overlap).astimezone(ZoneInfo(JQL_TIMEZONE)).replace(second=0, microsecond=0)
+
+
+def build_incremental_jql(base_jql: str, since: Optional[datetime], until: Optional[datetime] = None) -> str:
+    """JQL selecting entries updated from minute ``since`` up to, excluding, minute ``until``, oldest first."""
+    conditions = []
+    if base_jql:
+        conditions.append(f"({base_jql})")
+    if since is not None:
+        conditions.append(f'updated >= "{since.astimezone(ZoneInfo(JQL_TIMEZONE)):%Y-%m-%d %H:%M}"')
+    if until is not None:
+        conditions.append(f'updated < "{until.astimezone(ZoneInfo(JQL_TIMEZONE)):%Y-%m-%d %H:%M}"')
+    # Oldest first, so that pages can be read by key on "updated" (see KeysetCursor).
+    return f"{' AND '.join(conditions)} ORDER BY updated ASC, key ASC".strip()
+
+
+def plan_windows(since: Optional[datetime], start: datetime, until: Optional[datetime],
+                 shards: int) -> List[Tuple[Optional[datetime], Optional[datetime]]]:
+    """Split an incremental search from ``start`` up to ``until`` into ``shards`` windows on minute boundaries.
+
+    The windows are of about equal length; the first one keeps ``since`` (``None``:
+    from the beginning) as its lower bound and the last one ``until`` (``None``:
+    open-ended) as its upper bound.
+    """
+    end = until or query_start(datetime.now(timezone.utc), timedelta(0))
+    span = (end - start) / max(1, shards)
+    bounds: List[datetime] = []
+    for index in range(1, max(1, shards)):
+        bound = (start + span * index).replace(second=0, microsecond=0)
+        if start < bound < end and (not bounds or bound > bounds[-1]):
+            bounds.append(bound)
+    return list(zip([since] + bounds, bounds + [until]))
+
+
+def window_start_at(window: int, page: int, page_size: int) -> int:
+    """``start_at`` of the ``page``-th page read from ``window``; windows follow each other in search order."""
+    return (window * WINDOW_PAGES + page) * page_size
+
+
+def build_page_params(processor: BaseProcessor, state: Optional[SyncState]) -> Dict[str, Any]:
+    """Query parameters shared by every page request of an endpoint."""
+    params = dict(processor.request_params)
+    if processor.watermark_field:
+        params['jql'] = build_incremental_jql(processor.base_jql, query_start(state.watermark if state else None))
+    return params
+
+
+def latest_update(processor: BaseProcessor, entries: List[Dict[str, Any]]) -> Optional[datetime]:
+    """Latest value of the processor's ``watermark_field`` among ``entries``."""
+    latest = None
+    for entry in entries:
+        updated = _convert_datetime(get_json_value(entry, processor.watermark_field))
+        if updated and (latest is None or updated > latest):
+            latest = updated
+    return latest
+
+
+class KeysetCursor:
+    """Position in an incremental search, paged by key on "updated" instead of by offset.
+
+    Every page is requested with a fresh query starting at the minute of the last
+    entry read so far, so entries updated while the search runs (and therefore
+    moved to its end) cannot shift unread entries onto pages already read. The
+    entries of that minute are read again; the pipeline drops those repeats. Only
+    when a whole page falls into the minute the query starts at, as JQL cannot
+    compare more precisely, does the cursor step through that minute by offset.
+    """
+
+    def __init__(self, processor: BaseProcessor, page_size: int, since: Optional[datetime] = None,
+                 until: Optional[datetime] = None):
+        self.processor = processor
+        self.page_size = page_size
+        self.since = since
+        self.until = until
+        # Offset within the results of the current query.
+        self.start_at = 0
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        params = dict(self.processor.request_params)
+        params['jql'] = build_incremental_jql(self.processor.base_jql, self.since, self.until)
+        return params
+
+    def advance(self, entries: List[Dict[str, Any]]) -> bool:
+        """Move past the page ``entries``; ``False`` once the search is exhausted."""
+        if len(entries) < self.page_size:
+            return False
+        minute = query_start(latest_update(self.processor, entries), timedelta(0))
+        if minute is None or (self.since is not None and minute <= self.since):
+            self.start_at += self.page_size
+        else:
+            self.since = minute
+            self.start_at = 0
+        return True
+
+
+@sync_to_async
+def load_sync_state(endpoint: str) -> SyncState:
+    state, _ = SyncState.objects.get_or_create(endpoint=endpoint)
+    return state
+
+
+class WatermarkTracker:
+    """Advances an endpoint's ``SyncState`` as pages are committed.
+
+    Pages are numbered in the order they were read (``start_at`` is just that
+    number times the page size), and can commit out of order, so the watermark
+    only moves across the contiguous run of committed pages starting at 0. Since
+    incremental searches are read oldest first, everything older than that
+    watermark is stored, even if the import dies right after; the next run
+    searches from there.
+
+    A search split into time windows that are read at the same time numbers the
+    pages of each window separately (``window_start_at``); the watermark moves on
+    to the next window once ``window_finished`` reported how many pages the window
+    had and all of them are committed. The watermark never passes ``ceiling``,
+    the time the import started: entries updated while it runs may move past
+    pages already read, so the next run reads everything updated since.
+    """
+
+    def __init__(self, state: SyncState, page_size: int, logger: logging.Logger,
+                 ceiling: Optional[datetime] = None):
+        self.state = state
+        self.page_size = page_size
+        self.ceiling = ceiling
+        self._logger = logger
+        self._committed: Dict[int, Optional[datetime]] = {}
+        self._window_pages: Dict[int, int] = {}
+        self._next_offset = 0
+        self._watermark = state.watermark
+
+    async def restore(self, committed: Dict[int, Optional[datetime]]):
+        """Account for pages committed elsewhere, e.g. by the shards of a distributed run."""
+        self._committed.update(committed)
+        if self._advance():
+            await self._save()
+
+    async def page_committed(self, start_at: int, watermark: Optional[datetime]):
+        await sync_to_async(self.record_page)(start_at, watermark)
+
+    def record_page(self, start_at: int, watermark: Optional[datetime]):
+        """Synchronous ``page_committed``, e.g. inside the transaction that wrote the page.
+
+        The page is only accounted for once that transaction commits, so a rolled
+        back page leaves the tracker as it was and can be recorded again when it is
+        retried. The watermark is then saved right after the commit; should that
+        save be lost, the next run merely re-reads a little more.
+        """
+        transaction.on_commit(partial(self._record, start_at, watermark))
+
+    def _record(self, start_at: int, watermark: Optional[datetime]):
+        self._committed[start_at] = watermark
+        if self._advance():
+            self._save_sync()
+
+    def window_finished(self, window: int, pages: int):
+        """Report that ``window`` of a windowed search ended after ``pages`` pages."""
+        self._window_pages[window] = pages
+
+    def _advance(self) -> bool:
+        advanced = False
+        while True:
+            if self._next_offset in self._committed:
+                page_watermark = self._committed.pop(self._next_offset)
+                if page_watermark and self.ceiling:
+                    page_watermark = min(page_watermark, self.ceiling)
+                if page_watermark and (self._watermark is None or page_watermark > self._watermark):
+                    self._watermark = page_watermark
+                self._next_offset += self.page_size
+                advanced = True
+                continue
+            window, page = divmod(self._next_offset // self.page_size, WINDOW_PAGES)
+            if self._window_pages.get(window) != page:
+                return advanced
+            self._next_offset = window_start_at(window + 1, 0, self.page_size)
+
+    async def finish(self):
+        # Trailing windows without pages are only passed here.
+        if self._advance():
+            await self._save()
+        self._logger.info(f"Sync watermark for {self.state.endpoint} is now {self._watermark}")
+
+    async def _save(self):
+        await sync_to_async(self._save_sync)()
+
+    def _save_sync(self):
+        self.state.watermark = self._watermark
+        self.state.save(update_fields=['watermark', 'updated_at'])
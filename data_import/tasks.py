@@ -0,0 +1,340 @@
+import asyncio
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from celery import chord, shared_task
+from django.utils import timezone
+
+from data_import.checkpoint import RunCheckpoint
+from data_import.locks import acquire_endpoint_lock, hold_endpoint_lock, release_endpoint_lock
+from data_import.metrics import ImportMetrics
+from data_import.management.commands.import_jira_data import BATCH_SIZE, Command, ImportOptions
+from data_import.pipeline import ImportPipeline
+from data_import.sync import (
+    KeysetCursor, WatermarkTracker, build_page_params, latest_update, load_sync_state, plan_windows, query_start
+)
+
+logger = logging.getLogger(__name__)
+
+SHARD_PAGES = 20  # pages imported by one shard task
+
+
+def plan_shards(total: int, committed, shard_pages: int = SHARD_PAGES) -> List[List[int]]:
+    """Split the page offsets of a search with ``total`` results into shards, skipping committed pages."""
+    offsets = [start_at for start_at in range(0, total, BATCH_SIZE) if start_at not in committed]
+    shard_pages = max(1, shard_pages)
+    return [offsets[i:i + shard_pages] for i in range(0, len(offsets), shard_pages)]
+
+
+async def _plan_windows(command: Command, processor, endpoint: str, shard_pages: int) -> Optional[Dict[str, Any]]:
+    """Plan an incremental import as time windows of the search from the sync watermark.
+
+    Offsets into a search ordered by "updated" shift whenever an entry is updated
+    during the run, so incremental searches are split by time instead and every
+    window is read by key (see ``KeysetCursor``). Entries updated after the run
+    was planned leave their window for one past ``until``, where the next sync
+    picks them up.
+    """
+    state = await load_sync_state(endpoint)
+    since = query_start(state.watermark)
+    until = query_start(timezone.now(), timedelta(0))
+    checkpoint = await RunCheckpoint.open(endpoint, build_page_params(processor, state), logger)
+    jira_api = command.build_jira_api(ImportOptions())
+    if jira_api is None:
+        await checkpoint.finish(succeeded=False)
+        return None
+    async with jira_api:
+        cursor = KeysetCursor(processor, command.page_size, since, until)
+        _, first_page = await command.fetch_page(None, jira_api, command.registry.endpoints[endpoint],
+                                                 0, cursor.params)
+    entries = (first_page.get(processor.entries_key) if isinstance(first_page, dict) else first_page) or []
+    plan = {'run_id': checkpoint.run.pk, 'windows': []}
+    if not entries:
+        await checkpoint.finish(succeeded=True)
+        return plan
+
+    total = first_page.get('total') if isinstance(first_page, dict) else None
+    await checkpoint.set_total(total)
+    shards = math.ceil(total / (max(1, shard_pages) * command.page_size)) if total else 1
+    start = since or query_start(latest_update(processor, entries[:1]), timedelta(0)) or until
+    windows = plan_windows(since, start, until, shards)
+    plan['windows'] = [(lower.isoformat() if lower else None, upper.isoformat()) for lower, upper in windows]
+    return plan
+
+
+async def _plan_run(endpoint: str, resume: bool, shard_pages: int = SHARD_PAGES) -> Optional[Dict[str, Any]]:
+    command = Command(logger)
+    processor = command.build_processor(endpoint)
+    if processor.watermark_field:
+        return await _plan_windows(command, processor, endpoint, shard_pages)
+    checkpoint = await RunCheckpoint.open(endpoint, build_page_params(processor, None), logger, resume=resume)
+    plan = {'run_id': checkpoint.run.pk, 'total': checkpoint.run.total, 'committed': set(checkpoint.completed)}
+    if plan['total'] is not None:
+        return plan
+
+    # import_endpoint_sharded holds the endpoint's lock.
+    options = ImportOptions(lock=False)
+    jira_api = command.build_jira_api(options)
+    if jira_api is None:
+        await checkpoint.finish(succeeded=False)
+        return None
+    async with jira_api:
+        _, first_page = await command.fetch_page(None, jira_api, command.registry.endpoints[endpoint],
+                                                 0, checkpoint.params)
+        plan['total'] = first_page.get('total') if isinstance(first_page, dict) else None
+        if plan['total'] is None:
+            # Nothing to shard; import it here, continuing the run that was just opened.
+            logger.info(f"{endpoint} does not report a total; importing it in a single task")
+            await command.process_endpoint(endpoint, options, jira_api, checkpoint=checkpoint)
+            return plan
+    await checkpoint.set_total(plan['total'])
+    return plan
+
+
+async def _import_shard(run_id: int, endpoint: str, offsets: List[int], max_concurrent: int) -> Dict[str, Any]:
+    command = Command(logger)
+    processor = command.build_processor(endpoint)
+    checkpoint = await RunCheckpoint.load(run_id, logger)
+    checkpoint.failed_pages = 0
+    command.metrics = ImportMetrics()
+    jira_api = command.build_jira_api(ImportOptions())
+    if jira_api is None:
+        raise RuntimeError("Missing required Jira API credentials")
+
+    pipeline = ImportPipeline(
+        processor=processor,
+        model=command.registry.models[endpoint],
+        batch_size=BATCH_SIZE,
+        logger=logger,
+        on_commit=checkpoint.page_committed,
+        on_failure=checkpoint.page_failed,
+        metrics=command.metrics,
+        endpoint=endpoint
+    )
+    try:
+        async with jira_api:
+            pages = command.iter_pages(None, jira_api, command.registry.endpoints[endpoint], checkpoint.params,
+                                       max_concurrent, entries_key=processor.entries_key,
+                                       checkpoint=checkpoint, offsets=offsets)
+            result = await pipeline.run(pages)
+    finally:
+        command.publish_metrics()
+    return {
+        'offsets': len(offsets),
+        'successful': result.successful,
+        'inserted': result.inserted,
+        'updated': result.updated,
+        'unchanged': result.unchanged,
+        'failed': result.failed,
+        'failed_pages': checkpoint.failed_pages,
+    }
+
+
+async def _import_window(run_id: int, endpoint: str, index: int, since: Optional[datetime],
+                         until: datetime) -> Dict[str, Any]:
+    command = Command(logger)
+    processor = command.build_processor(endpoint)
+    checkpoint = await RunCheckpoint.load(run_id, logger)
+    summary = {'offsets': 0, 'successful': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0,
+               'failed_pages': 0}
+    if index in checkpoint.completed:
+        return summary  # redelivered after it had finished
+    command.metrics = ImportMetrics()
+    jira_api = command.build_jira_api(ImportOptions())
+    if jira_api is None:
+        raise RuntimeError("Missing required Jira API credentials")
+
+    errors = []
+
+    async def on_failure(start_at: int, error: BaseException):
+        errors.append(error)
+
+    pipeline = ImportPipeline(
+        processor=processor,
+        model=command.registry.models[endpoint],
+        batch_size=BATCH_SIZE,
+        logger=logger,
+        on_failure=on_failure,
+        metrics=command.metrics,
+        endpoint=endpoint
+    )
+    cursor = KeysetCursor(processor, command.page_size, since, until)
+    try:
+        async with jira_api:
+            pages = command.iter_keyset_pages(None, jira_api, command.registry.endpoints[endpoint], cursor,
+                                              entries_key=processor.entries_key)
+            result = await pipeline.run(pages)
+    except Exception as e:
+        errors.append(e)
+        result = pipeline.result
+    finally:
+        command.publish_metrics()
+    # The window is one unit: it only bounds the watermark once all of its pages are stored.
+    if errors:
+        await checkpoint.page_failed(index, errors[0])
+    else:
+        await sync_to_async(checkpoint.record)(index, result.successful, until)
+    summary.update(
+        successful=result.successful,
+        inserted=result.inserted,
+        updated=result.updated,
+        unchanged=result.unchanged,
+        failed=result.failed,
+        failed_pages=1 if errors else 0,
+    )
+    return summary
+
+
+async def _finalize_run(run_id: int, endpoint: str) -> bool:
+    checkpoint = await RunCheckpoint.load(run_id, logger)
+    await checkpoint.finish(succeeded=True)
+    if checkpoint.failed_pages:
+        logger.error(f"Run {run_id} of {endpoint} has {checkpoint.failed_pages} dead-lettered pages; "
+                     f"the sync watermark is only advanced over the pages before the first gap")
+
+    processor = Command(logger).build_processor(endpoint)
+    if processor.watermark_field:
+        # Incremental runs are checkpointed per time window, numbered from 0.
+        tracker = WatermarkTracker(await load_sync_state(endpoint), 1, logger)
+        await tracker.restore(checkpoint.completed)
+        if not checkpoint.failed_pages:
+            await tracker.finish()
+    return not checkpoint.failed_pages
+
+
+async def _holding_lock(endpoint: str, lock_token: Optional[str], work):
+    """Await ``work``, renewing the endpoint's import lock meanwhile if the run holds one."""
+    if lock_token:
+        return await hold_endpoint_lock(endpoint, lock_token, work)
+    return await work
+
+
+@shared_task(acks_late=True)
+def import_shard(run_id: int, endpoint: str, offsets: List[int],
+                 max_concurrent: int = ImportOptions.max_concurrent,
+                 lock_token: Optional[str] = None) -> Dict[str, Any]:
+    """Fetch and store the pages at ``offsets`` of an import run.
+
+    Pages go through the same pipeline and ``BaseProcessor`` write path as the
+    management command; committed and failed pages are checkpointed on the run, so
+    a redelivered shard only repeats the pages it had not committed yet. While it
+    runs, the shard renews the run's import lock taken with ``lock_token``.
+    """
+    return asyncio.run(_holding_lock(endpoint, lock_token,
+                                     _import_shard(run_id, endpoint, offsets, max_concurrent)))
+
+
+@shared_task(acks_late=True)
+def import_window(run_id: int, endpoint: str, index: int, since: Optional[str], until: str,
+                  lock_token: Optional[str] = None) -> Dict[str, Any]:
+    """Fetch and store the entries of an incremental search updated between ``since`` and ``until``.
+
+    The window is read by key and checkpointed as a whole under ``index``; a
+    window that fails is recorded as a dead letter instead of failing the chord.
+    Like ``import_shard`` it renews the run's import lock while it runs.
+    """
+    return asyncio.run(_holding_lock(endpoint, lock_token, _import_window(
+        run_id, endpoint, index, datetime.fromisoformat(since) if since else None, datetime.fromisoformat(until)
+    )))
+
+
+@shared_task
+def finalize_import(shard_results: List[Dict[str, Any]], run_id: int, endpoint: str,
+                    lock_token: Optional[str] = None) -> Dict[str, Any]:
+    """Close an import run once all of its shards are done, advance the sync watermark and release the lock."""
+    try:
+        complete = asyncio.run(_finalize_run(run_id, endpoint))
+    finally:
+        if lock_token:
+            release_endpoint_lock(endpoint, lock_token, logger)
+    summary = {key: sum(result[key] for result in shard_results)
+               for key in ('successful', 'inserted', 'updated', 'unchanged', 'failed', 'failed_pages')}
+    summary.update(run_id=run_id, endpoint=endpoint, shards=len(shard_results), complete=complete)
+    logger.info(f"Distributed import of {endpoint} finished: {summary}")
+    return summary
+
+
+@shared_task
+def release_import_lock(endpoint: str, lock_token: str):
+    """Errback of a sharded import's chord: release the endpoint's lock when ``finalize_import`` does not run."""
+    release_endpoint_lock(endpoint, lock_token, logger)
+
+
+def _launch_chord(header, run_id: int, endpoint: str, lock_token: str):
+    callback = finalize_import.s(run_id, endpoint, lock_token)
+    callback.on_error(release_import_lock.si(endpoint, lock_token))
+    chord(header)(callback)
+
+
+@shared_task
+def import_endpoint_sharded(endpoint: str, shard_pages: int = SHARD_PAGES, resume: bool = False,
+                            max_concurrent: int = ImportOptions.max_concurrent) -> Optional[int]:
+    """Plan an import of ``endpoint`` and fan its page range out to workers.
+
+    The search ``total`` decides the page offsets, which are split into shards of
+    ``shard_pages`` pages and imported by ``import_shard`` tasks in a chord whose
+    callback, ``finalize_import``, closes the run. Incremental endpoints are split
+    into time windows of about ``shard_pages`` pages instead and imported by
+    ``import_window`` tasks, as offsets into their searches are not stable (see
+    ``_plan_windows``). Endpoints without a ``total`` (bare JSON arrays) cannot be
+    sharded and are imported by this task directly.
+    Returns the id of the ``ImportRun``.
+
+    The endpoint's import lock is taken here and released by ``finalize_import``
+    (or by ``release_import_lock`` when the chord fails), so neither a sync nor the
+    management command imports the endpoint while its shards run; every shard
+    renews it while it runs. Returns
+    ``None`` without importing when another import holds the lock.
+    """
+    lock_token = acquire_endpoint_lock(endpoint)
+    if lock_token is None:
+        logger.info(f"Skipping sharded import of {endpoint}: another import of it is still running")
+        return None
+    launched = False
+    try:
+        plan = asyncio.run(_plan_run(endpoint, resume, shard_pages))
+        if plan is None:
+            return None
+        if 'windows' in plan:
+            if plan['windows']:
+                logger.info(f"Importing {endpoint} changes of run {plan['run_id']} in {len(plan['windows'])} windows")
+                _launch_chord([import_window.s(plan['run_id'], endpoint, index, since, until, lock_token)
+                               for index, (since, until) in enumerate(plan['windows'])],
+                              plan['run_id'], endpoint, lock_token)
+                launched = True
+            return plan['run_id']
+        if plan['total'] is None:
+            return plan['run_id']
+
+        shards = plan_shards(plan['total'], plan['committed'], shard_pages)
+        logger.info(f"Importing {plan['total']} {endpoint} records of run {plan['run_id']} in {len(shards)} shards")
+        _launch_chord([import_shard.s(plan['run_id'], endpoint, offsets, max_concurrent, lock_token)
+                       for offsets in shards],
+                      plan['run_id'], endpoint, lock_token)
+        launched = True
+        return plan['run_id']
+    finally:
+        if not launched:
+            release_endpoint_lock(endpoint, lock_token, logger)
+
+
+@shared_task
+def sync_endpoint(endpoint: str) -> Dict[str, Any]:
+    """Periodic incremental sync of one endpoint (see ``schedule_syncs``).
+
+    Runs the same import as ``import_jira_data --endpoint <endpoint> --resume``:
+    entries changed since the sync watermark are fetched, and for endpoints
+    without a watermark a failed or abandoned earlier run, including its
+    dead-lettered pages, is continued. The command takes the endpoint's
+    distributed lock, so a sync that finds the previous one, a sharded import or
+    a manual import still running skips this turn instead of importing the same
+    data twice.
+    """
+    command = Command(logger)
+    asyncio.run(command.async_handle(endpoint, ImportOptions(resume=True)))
+    if command.failed_endpoints:
+        raise RuntimeError(f"Sync of {endpoint} failed; the next run resumes it")
+    return {'endpoint': endpoint, 'skipped': endpoint in command.skipped_endpoints}
@@ -1,3 +1,985 @@
-from django.test import TestCase
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime
+from functools import partial
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional
+from unittest import mock, skipIf
 
-# Create your tests here.
+import numpy as np
+from aiohttp import ClientResponseError, web
+from asgiref.sync import async_to_sync
+from django.db import DatabaseError, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone as django_timezone
+
+from data_import import flow_metrics
+from data_import.base_processor import ProcessingResult
+from data_import.checkpoint import STALE_AFTER, RunCheckpoint
+from data_import.db_writer import DBWriter
+from data_import.fixture_server import FixtureConfig, JiraFixtureServer
+from data_import.flow_metrics import TransitionColumns
+from data_import.http_cache import NOT_MODIFIED, ResponseCache
+from data_import.jira_api import JiraAPI, RetryPolicy, TokenBucket, ijson
+from data_import.locks import LockLostError, hold_endpoint_lock
+from data_import.management.commands.benchmark_flow_metrics import (
+    WORKFLOW, build_transitions, loop_cumulative_flow, loop_cycle_times,
+)
+from data_import.management.commands.benchmark_import import BenchmarkImport, RunStats
+from data_import.management.commands.import_jira_data import Command as ImportCommand, ImportOptions
+from data_import.metrics import ImportMetrics, load_published
+from data_import.models import (
+    DailyStatusWip, ImportRun, Issue, IssueTransition, PageCheckpoint, SyncState, WeeklyFlowRollup
+)
+from data_import.pipeline import ImportPipeline
+from data_import.profiling import CPROFILE, SAMPLING, ImportProfiler
+from data_import.rollups import FlowRollups, TouchedRollups, week_of
+from data_import.scheduler import EndpointScheduler
+from data_import.sync import KeysetCursor, WatermarkTracker, build_incremental_jql, plan_windows, query_start
+from data_import.transform import TransformSpec, create_pool, transform_page
+from data_import.views import decode_cursor, encode_cursor
+
+# Processors build their URLs from JIRA_SERVER when the registry first loads them.
+os.environ.setdefault('JIRA_SERVER', 'http://jira.invalid/')
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 25
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class ConcurrencyTrackingImport(BenchmarkImport):
+    """Records the most page requests that were in flight at the same time."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def fetch_page(self, *args, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return await super().fetch_page(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+class FixtureImportTests(TransactionTestCase):
+    """``import_jira_data`` end to end against the fixture server; the DB writer thread needs real commits."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = JiraFixtureServer(FixtureConfig(total=180, max_page_size=PAGE_SIZE, latency=0.01), logger)
+        cls.url = cls.server.start_in_thread()
+        cls.environ = {name: os.environ.get(name) for name in ('JIRA_BASE_URL', 'JIRA_USER', 'JIRA_API_TOKEN')}
+        os.environ.update(JIRA_BASE_URL=cls.url, JIRA_USER='test', JIRA_API_TOKEN='test')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop_thread()
+        for name, value in cls.environ.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.generation = 0
+
+    def run_import(self, max_concurrent: int = 2, **options) -> RunStats:
+        stats = RunStats(concurrency=max_concurrent, page_size=PAGE_SIZE)
+        self.importer = ConcurrencyTrackingImport(self.url, PAGE_SIZE, stats, logger)
+        asyncio.run(self.importer.async_handle(
+            'issues', ImportOptions(max_concurrent=max_concurrent, response_cache=False, lock=False, **options)))
+        self.assertEqual(self.importer.failed_endpoints, set())
+        return stats
+
+    def reimport(self, **options) -> List[Dict[str, Any]]:
+        """Import everything again from scratch and return the stored issues."""
+        Issue.objects.all().delete()
+        SyncState.objects.all().delete()
+        self.run_import(**options)
+        return list(Issue.objects.order_by('pk').values())
+
+    @skipIf(ijson is None, "streaming pages requires the optional ijson package")
+    def test_streamed_pages_store_the_same_rows(self):
+        expected = self.reimport()
+        self.assertEqual(self.reimport(stream=True), expected)
+
+    def test_transform_workers_store_the_same_rows(self):
+        expected = self.reimport()
+        self.assertEqual(len(expected), 180)
+        self.assertEqual(self.reimport(workers=2), expected)
+
+    def test_full_load_fetches_pages_in_parallel(self):
+        self.run_import(max_concurrent=4)
+        self.assertEqual(Issue.objects.count(), 180)
+        self.assertGreater(self.importer.max_in_flight, 1)
+
+    def test_incremental_import_reads_time_windows_in_parallel(self):
+        by_update = self.server.by_update()
+        SyncState.objects.create(endpoint='issues', watermark=by_update[40][0])
+        self.run_import(max_concurrent=4)
+        self.assertGreater(self.importer.max_in_flight, 1)
+        since = query_start(by_update[40][0])
+        changed = {str(10000 + index) for updated, index in by_update if updated >= since}
+        self.assertEqual(set(Issue.objects.values_list('pk', flat=True)), changed)
+        self.assertEqual(SyncState.objects.get(endpoint='issues').watermark, by_update[-1][0])
+
+    def test_full_import_stores_every_issue_and_advances_the_watermark(self):
+        stats = self.run_import()
+        self.assertEqual(stats.rows, 180)
+        self.assertEqual(Issue.objects.count(), 180)
+        latest = max(updated for updated, _ in self.server.by_update())
+        self.assertEqual(SyncState.objects.get(endpoint='issues').watermark, latest)
+        run = ImportRun.objects.get(endpoint='issues')
+        self.assertEqual(run.status, ImportRun.COMPLETED)
+        self.assertFalse(PageCheckpoint.objects.exists())
+
+    def test_incremental_import_reads_only_recent_changes(self):
+        self.run_import()
+        self.server.generation += 1  # moves every issue's update one minute later
+        stats = self.run_import()
+        self.assertLess(len(stats.page_latencies), 180 // PAGE_SIZE)
+        self.assertEqual(Issue.objects.count(), 180)
+        latest = max(updated for updated, _ in self.server.by_update())
+        self.assertEqual(SyncState.objects.get(endpoint='issues').watermark, latest)
+
+    def test_import_keeps_rollups_in_step_with_a_rebuild(self):
+        self.run_import()
+        self.server.generation += 1
+        SyncState.objects.all().delete()
+        self.run_import()
+        weeks = list(WeeklyFlowRollup.objects.order_by('project_key', 'issue_type_id', 'week')
+                     .values_list('project_key', 'issue_type_id', 'week', 'throughput', 'lead_time_total'))
+        wip = sorted(DailyStatusWip.objects.exclude(status='').values_list('issue_type_id', 'status', 'count'))
+        self.assertTrue(weeks)
+        FlowRollups().rebuild()
+        self.assertEqual(weeks, list(WeeklyFlowRollup.objects.order_by('project_key', 'issue_type_id', 'week')
+                                     .values_list('project_key', 'issue_type_id', 'week', 'throughput',
+                                                  'lead_time_total')))
+        self.assertEqual(wip, sorted(DailyStatusWip.objects.exclude(status='')
+                                     .values_list('issue_type_id', 'status', 'count')))
+
+
+class WritePreparedTests(TestCase):
+    def setUp(self):
+        self.server = JiraFixtureServer(FixtureConfig(total=20))
+        self.processor = ImportCommand(logger).build_processor('issues')
+
+    def write(self):
+        entries = [self.server.build_issue(index) for index in range(20)]
+        prepared = self.processor.prepare_entries(entries, self.processor.field_mappings)
+        return self.processor.write_prepared_sync(prepared, Issue, 100)
+
+    def test_unchanged_records_are_skipped_by_content_hash(self):
+        first = self.write()
+        self.assertEqual((first.inserted, first.updated, first.unchanged), (20, 0, 0))
+        second = self.write()
+        self.assertEqual((second.inserted, second.updated, second.unchanged), (0, 0, 20))
+
+    def test_changed_records_are_updated(self):
+        self.write()
+        self.server.generation += 1
+        result = self.write()
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (0, 20, 0))
+        self.assertIn('generation 1', Issue.objects.get(pk='10000').summary)
+
+    def test_updates_without_upsert_leave_unmapped_fields_alone(self):
+        self.processor.use_upsert = False
+        self.write()
+        Issue.objects.filter(pk='10000').update(started=utc(2024, 3, 3))
+        self.server.generation += 1
+        result = self.write()
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (0, 20, 0))
+        self.assertEqual(Issue.objects.get(pk='10000').started, utc(2024, 3, 3))
+        self.assertIn('generation 1', Issue.objects.get(pk='10000').summary)
+
+
+class FailingProcessor:
+    """Writes through ``processor`` but fails on the ``broken`` batch."""
+
+    def __init__(self, processor, broken):
+        self.processor = processor
+        self.broken = broken
+
+    def write_prepared_sync(self, prepared, model, batch_size):
+        if prepared is self.broken:
+            raise DatabaseError('broken page')
+        return self.processor.write_prepared_sync(prepared, model, batch_size)
+
+
+class DBWriterTests(TransactionTestCase):
+    def setUp(self):
+        self.server = JiraFixtureServer(FixtureConfig(total=30))
+        self.processor = ImportCommand(logger).build_processor('issues')
+        self.pages = [
+            self.processor.prepare_entries([self.server.build_issue(index) for index in range(start, start + 10)],
+                                           self.processor.field_mappings)
+            for start in (0, 10, 20)
+        ]
+
+    def write_pages(self, processor, tracker=None, checkpoint=None):
+        hook = ImportCommand.commit_hook(tracker, checkpoint)
+
+        async def write():
+            writer = DBWriter(logger, commit_interval=1)
+            results = await asyncio.gather(*(
+                writer.submit(processor, Issue, prepared, 100,
+                              after_write=partial(hook, index * 10, prepared) if hook else None)
+                for index, prepared in enumerate(self.pages)
+            ), return_exceptions=True)
+            await writer.stop()
+            return writer, results
+        return asyncio.run(write())
+
+    def test_pages_are_coalesced_into_one_transaction(self):
+        writer, results = self.write_pages(self.processor)
+        self.assertEqual([result.inserted for result in results], [10, 10, 10])
+        self.assertEqual((writer.stats.commits, writer.stats.pages, writer.stats.rows), (1, 3, 30))
+        self.assertEqual(Issue.objects.count(), 30)
+
+    def test_failed_page_of_a_coalesced_commit_leaves_the_others_and_their_bookkeeping(self):
+        tracker = WatermarkTracker(SyncState.objects.create(endpoint='issues'), 10, logger)
+        checkpoint = async_to_sync(RunCheckpoint.open)('issues', {}, logger, resume=False)
+        writer, results = self.write_pages(FailingProcessor(self.processor, self.pages[1]), tracker, checkpoint)
+        self.assertIsInstance(results[1], DatabaseError)
+        self.assertEqual((writer.stats.commits, writer.stats.pages), (2, 2))
+        self.assertEqual(Issue.objects.count(), 20)
+        self.assertEqual(set(checkpoint.completed), {0, 20})
+        self.assertEqual(set(PageCheckpoint.objects.values_list('start_at', flat=True)), {0, 20})
+        # Only the page before the broken one moves the watermark, in memory and stored.
+        self.assertEqual(SyncState.objects.get(endpoint='issues').watermark, self.pages[0].watermark)
+        self.assertEqual(tracker.state.watermark, self.pages[0].watermark)
+
+
+class RecordingLoader:
+    """Stands in for ``CopyLoader``, which needs PostgreSQL, and records what the pipeline asked of it."""
+
+    def __init__(self, failures: int = 0):
+        self.calls = []
+        self.copied = []
+        self.failures = failures
+
+    async def start(self):
+        self.calls.append('start')
+
+    async def copy_batch(self, prepared):
+        self.calls.append('copy_batch')
+        if self.failures:
+            self.failures -= 1
+            raise DatabaseError('copy failed')
+        self.copied.extend(pk_value for pk_value, _ in prepared.records)
+        return ProcessingResult(total_processed=len(prepared.records), successful=len(prepared.records))
+
+    async def merge(self):
+        self.calls.append('merge')
+
+    async def drop(self):
+        self.calls.append('drop')
+
+
+class ImportPipelineTests(TestCase):
+    def setUp(self):
+        self.server = JiraFixtureServer(FixtureConfig(total=15))
+        self.processor = ImportCommand(logger).build_processor('issues')
+
+    def pipeline(self, **kwargs) -> ImportPipeline:
+        return ImportPipeline(self.processor, Issue, PAGE_SIZE, logger, **kwargs)
+
+    async def pages(self, fail: bool = False, repeat_after: Optional[RecordingLoader] = None):
+        yield 0, [self.server.build_issue(index) for index in range(10)]
+        if repeat_after:
+            # Half of the entries again, once the first page went to the loader.
+            while 'copy_batch' not in repeat_after.calls:
+                await asyncio.sleep(0)
+            yield PAGE_SIZE, [self.server.build_issue(index) for index in range(5, 15)]
+        if fail:
+            raise ConnectionError('Jira went away')
+
+    def test_failed_initial_load_drops_its_staging_table(self):
+        loader = RecordingLoader()
+        with self.assertRaises(ConnectionError):
+            asyncio.run(self.pipeline(loader=loader).run(self.pages(fail=True)))
+        self.assertEqual(loader.calls[0], 'start')
+        self.assertEqual(loader.calls[-1], 'drop')
+        self.assertNotIn('merge', loader.calls)
+
+    def test_repeats_of_written_records_are_dropped(self):
+        loader = RecordingLoader()
+        asyncio.run(self.pipeline(loader=loader).run(self.pages(repeat_after=loader)))
+        self.assertEqual(sorted(loader.copied), [str(10000 + index) for index in range(15)])
+
+    def test_repeats_of_records_whose_page_failed_are_written(self):
+        loader = RecordingLoader(failures=1)
+        failed = []
+
+        async def on_failure(start_at, error):
+            failed.append(start_at)
+        asyncio.run(self.pipeline(loader=loader, on_failure=on_failure).run(self.pages(repeat_after=loader)))
+        self.assertEqual(failed, [0])
+        self.assertEqual(sorted(loader.copied), [str(10000 + index) for index in range(5, 15)])
+
+    def test_initial_load_merges_its_staging_table(self):
+        loader = RecordingLoader()
+        asyncio.run(self.pipeline(loader=loader).run(self.pages()))
+        self.assertEqual(loader.calls, ['start', 'copy_batch', 'merge'])
+
+
+class HoldEndpointLockTests(TestCase):
+    def hold(self, work, renewed: bool):
+        with mock.patch('data_import.locks.extend_endpoint_lock', return_value=renewed) as extend:
+            result = asyncio.run(hold_endpoint_lock('issues', 'token', work, interval=0.01))
+        return result, extend
+
+    def test_lock_is_renewed_until_the_import_finishes(self):
+        async def work():
+            await asyncio.sleep(0.05)
+            return 'imported'
+        result, extend = self.hold(work(), renewed=True)
+        self.assertEqual(result, 'imported')
+        self.assertGreater(extend.call_count, 1)
+        extend.assert_called_with('issues', 'token')
+
+    def test_lost_lock_cancels_the_import(self):
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        with self.assertRaises(LockLostError):
+            self.hold(work(), renewed=False)
+        self.assertTrue(cancelled.is_set())
+
+
+@asynccontextmanager
+async def serving(app: web.Application) -> AsyncIterator[str]:
+    """Serve ``app`` on a free local port and yield its base URL."""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    try:
+        yield f"http://127.0.0.1:{runner.addresses[0][1]}"
+    finally:
+        await runner.cleanup()
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.cache = ResponseCache(self.directory, logger=logger)
+        self.body = b'{"values": [1, 2]}'
+        self.etag = '"v1"'
+        self.requests = []
+
+    async def respond(self, request: web.Request) -> web.Response:
+        self.requests.append(request.headers.get('If-None-Match'))
+        if self.etag and request.headers.get('If-None-Match') == self.etag:
+            return web.Response(status=304)
+        return web.Response(body=self.body, content_type='application/json',
+                            headers={'ETag': self.etag} if self.etag else None)
+
+    def fetch_twice(self, commit: bool = True):
+        """Fetch the same URL twice, committing or discarding the first response in between."""
+        app = web.Application()
+        app.router.add_get('/rest/api/3/status', self.respond)
+
+        async def fetch():
+            async with serving(app) as url:
+                async with JiraAPI(url, 'user', 'token', logger=logger, response_cache=self.cache) as jira_api:
+                    first = await jira_api.request(None, f"{url}/rest/api/3/status", conditional=True)
+                    await jira_api.commit_cached(f"{url}/rest/api/3/status", succeeded=commit)
+                    second = await jira_api.request(None, f"{url}/rest/api/3/status", conditional=True)
+                    return first, second
+        return asyncio.run(fetch())
+
+    def test_committed_response_is_revalidated_with_its_etag(self):
+        first, second = self.fetch_twice()
+        self.assertEqual(first, {'values': [1, 2]})
+        self.assertIs(second, NOT_MODIFIED)
+        self.assertEqual(self.requests, [None, self.etag])
+
+    def test_same_body_without_a_304_is_not_modified_either(self):
+        self.etag = None
+        first, second = self.fetch_twice()
+        self.assertIs(second, NOT_MODIFIED)
+
+    def test_discarded_response_is_fetched_again(self):
+        first, second = self.fetch_twice(commit=False)
+        self.assertEqual(second, first)
+        self.assertEqual(self.requests, [None, None])
+
+    def test_expired_entries_are_dropped(self):
+        self.cache.stage('https://jira/a', {}, self.body, {'ETag': self.etag})
+        self.cache.commit('https://jira/a')
+        self.cache.ttl = -1
+        self.assertIsNone(self.cache.lookup('https://jira/a', {}))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.cache.max_bytes = 2 * len(self.body)
+        for url in ('https://jira/a', 'https://jira/b', 'https://jira/c'):
+            self.cache.stage(url, {}, self.body, {})
+            self.cache.commit(url)
+        self.assertIsNone(self.cache.lookup('https://jira/a', {}))
+        self.assertIsNotNone(self.cache.lookup('https://jira/c', {}))
+
+    def test_processes_sharing_a_directory_keep_each_others_entries(self):
+        other = ResponseCache(self.directory, logger=logger)
+        self.cache.stage('https://jira/a', {}, self.body, {'ETag': self.etag})
+        other.stage('https://jira/b', {}, self.body, {})
+        self.cache.commit('https://jira/a')
+        other.commit('https://jira/b')
+        reopened = ResponseCache(self.directory, logger=logger)
+        self.assertEqual(reopened.lookup('https://jira/a', {}).etag, self.etag)
+        self.assertIsNotNone(reopened.lookup('https://jira/b', {}))
+        self.assertEqual(os.listdir(self.directory).count('index.json'), 1)
+        self.assertFalse([name for name in os.listdir(self.directory) if name.endswith('.tmp')])
+
+
+class RecordingListener:
+    def __init__(self):
+        self.throttles = []
+        self.successes = 0
+
+    def throttled(self, status):
+        self.throttles.append(status)
+
+    def succeeded(self):
+        self.successes += 1
+
+
+class RetryPolicyTests(TestCase):
+    def setUp(self):
+        self.responses = []
+        self.attempts = 0
+
+    async def respond(self, request: web.Request) -> web.Response:
+        self.attempts += 1
+        status, headers = self.responses.pop(0) if self.responses else (200, {})
+        if status != 200:
+            return web.Response(status=status, headers=headers)
+        return web.json_response({'values': []})
+
+    def request(self, policy: RetryPolicy, listener=None):
+        app = web.Application()
+        app.router.add_get('/rest/api/3/status', self.respond)
+
+        async def fetch():
+            async with serving(app) as url:
+                async with JiraAPI(url, 'user', 'token', logger=logger, retry_policy=policy) as jira_api:
+                    started = time.monotonic()
+                    result = await jira_api.request(None, f"{url}/rest/api/3/status", listener=listener)
+                    return result, time.monotonic() - started
+        return asyncio.run(fetch())
+
+    def test_retry_after_accepts_seconds_and_http_dates(self):
+        self.assertEqual(RetryPolicy.retry_after({'Retry-After': '7'}), 7.0)
+        later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        self.assertAlmostEqual(RetryPolicy.retry_after({'Retry-After': later}), 30, delta=2)
+        self.assertIsNone(RetryPolicy.retry_after({'Retry-After': 'soon'}))
+
+    def test_only_retryable_statuses_are_retried_within_the_limits(self):
+        policy = RetryPolicy(max_retry_after=60)
+        self.assertTrue(policy.should_retry(429, 1, {'Retry-After': '30'}))
+        self.assertFalse(policy.should_retry(429, 1, {'Retry-After': '600'}))
+        self.assertFalse(policy.should_retry(404, 1))
+        self.assertFalse(policy.should_retry(503, policy.max_retries))
+
+    def test_backoff_waits_for_retry_after_and_is_capped_otherwise(self):
+        policy = RetryPolicy(base_delay=10, max_delay=15)
+        self.assertEqual(policy.backoff(1, {'Retry-After': '3'}), 3)
+        self.assertTrue(all(policy.backoff(attempt) <= 15 for attempt in range(1, 6)))
+
+    def test_token_bucket_paces_requests_after_a_burst(self):
+        bucket = TokenBucket(rate=50, capacity=2)
+
+        async def take():
+            started = time.monotonic()
+            for _ in range(2):
+                await bucket.acquire()
+            burst = time.monotonic() - started
+            for _ in range(3):
+                await bucket.acquire()
+            return burst, time.monotonic() - started
+        burst, total = asyncio.run(take())
+        self.assertLess(burst, 0.02)
+        self.assertGreaterEqual(total, 3 / 50 - 0.01)
+
+    def test_throttled_request_waits_for_retry_after_and_pauses_the_bucket(self):
+        self.responses = [(429, {'Retry-After': '0.1'})]
+        bucket = TokenBucket(rate=100)
+        listener = RecordingListener()
+        result, elapsed = self.request(RetryPolicy(rate_limiter=bucket), listener)
+        self.assertEqual(result, {'values': []})
+        self.assertEqual(self.attempts, 2)
+        self.assertGreaterEqual(elapsed, 0.1)
+        self.assertEqual((listener.throttles, listener.successes), ([429], 1))
+
+    def test_request_fails_when_retry_after_is_too_long(self):
+        self.responses = [(503, {'Retry-After': '600'})]
+        with self.assertRaises(ClientResponseError):
+            self.request(RetryPolicy(max_retry_after=60))
+        self.assertEqual(self.attempts, 1)
+
+
+class RelatedDataTests(TestCase):
+    def setUp(self):
+        self.bulk_requests = []
+        self.issue_requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @staticmethod
+    def history(issue_id) -> Dict[str, Any]:
+        return {'id': f'h{issue_id}', 'items': [{'field': 'status', 'toString': 'Done'}]}
+
+    async def bulk_changelogs(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.bulk_requests.append(body)
+        # One issue per page, to follow nextPageToken.
+        issue_ids = body['issueIdsOrKeys']
+        position = int(body.get('nextPageToken') or 0)
+        page = {'issueChangeLogs': [{'issueId': issue_ids[position],
+                                     'changeHistories': [self.history(issue_ids[position])]}]}
+        if position + 1 < len(issue_ids):
+            page['nextPageToken'] = str(position + 1)
+        return web.json_response(page)
+
+    async def issue_changelog(self, request: web.Request) -> web.Response:
+        issue_id = request.match_info['issue_id']
+        self.issue_requests.append(issue_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.02)
+        finally:
+            self.in_flight -= 1
+        return web.json_response({'values': [self.history(issue_id)], 'total': 1, 'isLast': True})
+
+    def related(self, issues, bulk: bool = True, concurrency: int = 8) -> Dict[str, List]:
+        app = web.Application()
+        if bulk:
+            app.router.add_post('/rest/api/3/changelog/bulkfetch', self.bulk_changelogs)
+        app.router.add_get('/rest/api/3/issue/{issue_id}/changelog', self.issue_changelog)
+
+        async def fetch():
+            async with serving(app) as url:
+                async with JiraAPI(url, 'user', 'token', logger=logger) as jira_api:
+                    return {issue_id: items async for issue_id, items
+                            in jira_api.iter_related_data(None, issues, 'changelog', concurrency=concurrency)}
+        return asyncio.run(fetch())
+
+    def test_embedded_changelogs_cost_no_request_and_the_rest_are_bulk_fetched(self):
+        embedded = {'id': '1', 'changelog': {'histories': [self.history('1')], 'total': 1}}
+        truncated = {'id': '2', 'changelog': {'histories': [], 'total': 3}}
+        related = self.related([embedded, truncated, '3', '4'])
+        self.assertEqual(related, {issue_id: [self.history(issue_id)] for issue_id in ('1', '2', '3', '4')})
+        self.assertEqual([body['issueIdsOrKeys'] for body in self.bulk_requests], [['2', '3', '4']] * 3)
+        self.assertEqual(self.issue_requests, [])
+
+    def test_changelogs_are_fetched_per_issue_without_the_bulk_endpoint(self):
+        related = self.related([str(issue_id) for issue_id in range(6)], bulk=False, concurrency=2)
+        self.assertEqual(related, {str(issue_id): [self.history(str(issue_id))] for issue_id in range(6)})
+        self.assertEqual(sorted(self.issue_requests), [str(issue_id) for issue_id in range(6)])
+        self.assertEqual(self.max_in_flight, 2)
+
+
+class PageBuilderTests(TestCase):
+    def test_streamed_entries_build_the_batch_prepare_entries_builds(self):
+        server = JiraFixtureServer(FixtureConfig(total=20))
+        processor = ImportCommand(logger).build_processor('issues')
+        entries = [server.build_issue(index) for index in range(20)]
+
+        async def stream():
+            for entry in entries:
+                yield entry
+        built = asyncio.run(ImportCommand.page_builder(processor)(stream()))
+        prepared = processor.prepare_entries(entries, processor.field_mappings)
+        self.assertEqual((built.total, built.failed), (prepared.total, prepared.failed))
+        self.assertEqual(built.records, prepared.records)
+        self.assertEqual(built.hashes, prepared.hashes)
+        self.assertEqual(built.watermark, prepared.watermark)
+
+
+class TransformTests(TestCase):
+    def setUp(self):
+        self.server = JiraFixtureServer(FixtureConfig(total=20))
+        self.processor = ImportCommand(logger).build_processor('issues')
+        self.page = {'issues': [self.server.build_issue(index) for index in range(20)] + [{'fields': {}}]}
+
+    def test_transformed_page_matches_prepare_entries(self):
+        spec = TransformSpec.for_processor(self.processor)
+        transformed = transform_page(json.dumps(self.page).encode('utf-8'), spec).to_prepared(spec)
+        prepared = self.processor.prepare_entries(self.page['issues'], self.processor.field_mappings)
+        self.assertEqual((transformed.total, transformed.failed), (21, 1))
+        self.assertEqual(transformed.records, prepared.records)
+        self.assertEqual(transformed.hashes, prepared.hashes)
+        self.assertEqual(transformed.watermark, prepared.watermark)
+
+    def test_pool_spawns_its_workers(self):
+        self.assertIsNone(create_pool(0))
+        pool = create_pool(1)
+        try:
+            spec = TransformSpec.for_processor(self.processor)
+            page = pool.submit(transform_page, self.page, spec).result(timeout=60)
+            self.assertEqual(len(page.rows), 20)
+            self.assertEqual({process.__class__.__name__ for process in pool._processes.values()},
+                             {'SpawnProcess'})
+        finally:
+            pool.shutdown()
+
+
+class ImportMetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    @staticmethod
+    def record(metrics: ImportMetrics, rows: int):
+        metrics.inc('jira_import_rows_total', rows, endpoint='issues', outcome='inserted')
+        metrics.set_max('jira_import_queue_depth_max', rows // 10, endpoint='issues', queue='write')
+        metrics.observe('jira_import_write_seconds', 0.02, endpoint='issues')
+        metrics.observe('jira_import_write_seconds', 3.0, endpoint='issues')
+
+    def test_histograms_render_cumulative_buckets(self):
+        metrics = ImportMetrics(buckets=(0.1, 1.0))
+        self.record(metrics, 10)
+        text = metrics.render()
+        self.assertIn('# TYPE jira_import_write_seconds histogram', text)
+        self.assertIn('jira_import_write_seconds_bucket{endpoint="issues",le="0.1"} 1', text)
+        self.assertIn('jira_import_write_seconds_bucket{endpoint="issues",le="1"} 1', text)
+        self.assertIn('jira_import_write_seconds_bucket{endpoint="issues",le="+Inf"} 2', text)
+        self.assertIn('jira_import_write_seconds_count{endpoint="issues"} 2', text)
+        self.assertIn('jira_import_rows_total{endpoint="issues",outcome="inserted"} 10', text)
+
+    def test_summary_groups_metrics_by_endpoint(self):
+        metrics = ImportMetrics()
+        self.record(metrics, 10)
+        summary = metrics.summary()['issues']
+        self.assertEqual(summary['rows_total'], {'inserted': 10})
+        self.assertEqual(summary['queue_depth_max'], {'write': 1})
+        self.assertEqual(summary['write_seconds']['count'], 2)
+
+    def test_published_runs_and_processes_add_up(self):
+        for rows in (10, 20):
+            metrics = ImportMetrics()
+            self.record(metrics, rows)
+            metrics.publish(self.directory)
+        other_process = ImportMetrics()
+        self.record(other_process, 40)
+        with open(os.path.join(self.directory, 'other-host-1.json'), 'w', encoding='utf-8') as f:
+            json.dump(other_process.snapshot(), f)
+
+        summary = load_published(self.directory).summary()['issues']
+        self.assertEqual(summary['rows_total'], {'inserted': 70})
+        self.assertEqual(summary['queue_depth_max'], {'write': 4})
+        self.assertEqual(summary['write_seconds']['count'], 6)
+        with self.settings(DATA_IMPORT_METRICS_DIR=self.directory):
+            response = self.client.get(reverse('metrics'))
+        self.assertIn('jira_import_rows_total{endpoint="issues",outcome="inserted"} 70', response.content.decode())
+
+    def test_files_of_processes_that_stopped_publishing_expire(self):
+        stale = os.path.join(self.directory, 'gone-host-1.json')
+        with open(stale, 'w', encoding='utf-8') as f:
+            json.dump(ImportMetrics().snapshot(), f)
+        os.utime(stale, (time.time() - 3600, time.time() - 3600))
+        ImportMetrics().publish(self.directory, max_age=60)
+        self.assertFalse(os.path.exists(stale))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+
+class ImportProfilerTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def profile(self, mode: str):
+        with ImportProfiler(self.directory, mode=mode, logger=logger) as profiler:
+            for _ in range(3):
+                list(Issue.objects.filter(project_key='PRJ'))
+            time.sleep(0.05)
+        return profiler, profiler.write_reports({'issues': {'write_seconds': {'count': 1}}})
+
+    def test_cprofile_run_reports_profile_queries_and_stages(self):
+        profiler, reports = self.profile(CPROFILE)
+        self.assertEqual({path.name for path in reports.iterdir()},
+                         {'profile.pstats', 'profile.txt', 'queries.json', 'stages.json'})
+        queries = json.loads((reports / 'queries.json').read_text())
+        self.assertGreaterEqual(queries['queries'], 3)
+        self.assertEqual(queries['slowest'][0]['count'], 3)
+        stages = json.loads((reports / 'stages.json').read_text())
+        self.assertEqual(stages['stages'], {'issues': {'write_seconds': {'count': 1}}})
+        self.assertGreaterEqual(stages['wall_seconds'], 0.05)
+
+    def test_sampling_run_writes_collapsed_stacks_and_unhooks_connections(self):
+        profiler, reports = self.profile(SAMPLING)
+        collapsed = (reports / 'profile.collapsed').read_text()
+        self.assertIn('MainThread;', collapsed)
+        self.assertFalse(any(profiler.queries in connection.execute_wrappers
+                             for connection in connections.all(initialized_only=True)))
+
+
+class RunCheckpointTests(TestCase):
+    def open(self, resume=True) -> RunCheckpoint:
+        return async_to_sync(RunCheckpoint.open)('issuetypes', {}, logger, resume=resume)
+
+    def test_resume_continues_a_failed_run_with_its_committed_pages(self):
+        failed = ImportRun.objects.create(endpoint='issuetypes', status=ImportRun.FAILED, params={})
+        PageCheckpoint.objects.create(run=failed, start_at=0, records=50)
+        checkpoint = self.open()
+        self.assertEqual(checkpoint.run.pk, failed.pk)
+        self.assertEqual(set(checkpoint.completed), {0})
+        failed.refresh_from_db()
+        self.assertEqual(failed.status, ImportRun.RUNNING)
+
+    def test_resume_leaves_a_run_with_a_recent_heartbeat_alone(self):
+        running = ImportRun.objects.create(endpoint='issuetypes', status=ImportRun.RUNNING, params={})
+        self.assertNotEqual(self.open().run.pk, running.pk)
+
+    def test_resume_takes_over_a_stale_run_once(self):
+        stale = ImportRun.objects.create(endpoint='issuetypes', status=ImportRun.RUNNING, params={})
+        ImportRun.objects.filter(pk=stale.pk).update(
+            heartbeat_at=django_timezone.now() - STALE_AFTER - timedelta(minutes=1))
+        self.assertEqual(self.open().run.pk, stale.pk)
+        self.assertNotEqual(self.open().run.pk, stale.pk)
+
+    def test_completed_run_drops_its_page_checkpoints(self):
+        checkpoint = self.open(resume=False)
+        checkpoint.record(0, 50, None)
+        async_to_sync(checkpoint.finish)(succeeded=True)
+        self.assertEqual(checkpoint.run.status, ImportRun.COMPLETED)
+        self.assertFalse(PageCheckpoint.objects.filter(run=checkpoint.run).exists())
+
+
+class FlowMetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.rows = build_transitions(500, seed=7)
+        # Small chunks, so that interning has to keep codes stable across chunks.
+        self.columns = TransitionColumns.from_rows(self.rows, chunk_size=97)
+
+    def status_ids(self, category: str) -> set:
+        return {status_id for status_id, _, status_category in WORKFLOW if status_category == category}
+
+    def test_cycle_times_match_the_row_by_row_loop(self):
+        names = {name for _, name, category in WORKFLOW if category == flow_metrics.START_CATEGORY}
+        done = {name for _, name, category in WORKFLOW if category == flow_metrics.DONE_CATEGORY}
+        issues, durations = flow_metrics.cycle_times(
+            self.columns, self.columns.status_codes(names), self.columns.status_codes(done))
+        expected = loop_cycle_times(self.rows, self.status_ids(flow_metrics.START_CATEGORY),
+                                    self.status_ids(flow_metrics.DONE_CATEGORY))
+        self.assertTrue(expected)
+        self.assertEqual(sorted(durations.tolist()), sorted(expected))
+        self.assertEqual(len(set(issues.tolist())), len(issues))
+
+    def test_cumulative_flow_matches_the_row_by_row_loop(self):
+        first = min(row[4] for row in self.rows)
+        last = max(row[4] for row in self.rows)
+        day_starts, counts = flow_metrics.cumulative_flow(self.columns, first, last)
+        expected = loop_cumulative_flow(self.rows, first, last)
+        self.assertEqual(counts.shape, (len(WORKFLOW), len(day_starts)))
+        for code, status_id in enumerate(self.columns.statuses.values):
+            self.assertEqual(counts[code].tolist(), expected[status_id], status_id)
+
+    def test_distribution_reports_days(self):
+        summary = flow_metrics.distribution(np.array([1, 2, 3, 4], dtype=np.int64) * flow_metrics.DAY)
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['mean_days'], 2.5)
+        self.assertEqual(summary['p50_days'], 2.5)
+        self.assertEqual(summary['histogram'][:5], [0, 1, 1, 2, 0])
+        self.assertIsNone(flow_metrics.distribution(np.zeros(0))['p95_days'])
+
+
+class FlowRollupsTests(TestCase):
+    def setUp(self):
+        self.rollups = FlowRollups()
+        self.day = date(2024, 3, 6)
+
+    def store(self, pk, status, category, created, resolved=None, issue_type_id='1'):
+        """Save an issue the way an import batch does, keeping the rollups up to date."""
+        data = {'id': pk, 'key': f'PRJ-{pk}', 'project_key': 'PRJ', 'issue_type_id': issue_type_id,
+                'status': status, 'status_category': category, 'created': created, 'resolved': resolved}
+        touched = self.rollups.touched_before(Issue, [pk])
+        touched.update(self.rollups.touched_by([data]))
+        Issue.objects.update_or_create(pk=pk, defaults=data)
+        self.rollups.refresh(touched, self.day)
+
+    def wip(self):
+        return dict(DailyStatusWip.objects.filter(day=self.day).exclude(status='').values_list('status', 'count'))
+
+    def test_resolved_issues_roll_up_into_their_week(self):
+        self.store('1', 'Done', 'done', utc(2024, 3, 1), utc(2024, 3, 5))
+        self.store('2', 'Done', 'done', utc(2024, 3, 4), utc(2024, 3, 6))
+        cell = WeeklyFlowRollup.objects.get()
+        self.assertEqual((cell.week, cell.throughput), (week_of(utc(2024, 3, 5)), 2))
+        self.assertEqual(cell.lead_time_total, 4 * 24 + 2 * 24)
+        self.assertEqual(cell.lead_time_p50, 48)
+        self.assertEqual(cell.cycle_time_count, 0)
+
+    def test_reopened_issue_leaves_its_week(self):
+        self.store('1', 'Done', 'done', utc(2024, 3, 1), utc(2024, 3, 5))
+        self.store('1', 'In Progress', 'indeterminate', utc(2024, 3, 1))
+        self.assertFalse(WeeklyFlowRollup.objects.exists())
+        self.assertEqual(self.wip(), {'In Progress': 1})
+
+    def test_wip_follows_status_changes(self):
+        self.store('1', 'In Progress', 'indeterminate', utc(2024, 3, 1))
+        self.store('2', 'In Progress', 'indeterminate', utc(2024, 3, 1))
+        self.store('3', 'In Review', 'indeterminate', utc(2024, 3, 1))
+        self.assertEqual(self.wip(), {'In Progress': 2, 'In Review': 1})
+        self.store('1', 'In Review', 'indeterminate', utc(2024, 3, 1))
+        self.store('3', 'Done', 'done', utc(2024, 3, 1), utc(2024, 3, 6))
+        self.assertEqual(self.wip(), {'In Progress': 1, 'In Review': 1})
+
+    def test_wip_of_a_new_day_starts_from_the_last_recorded_day(self):
+        self.store('1', 'In Progress', 'indeterminate', utc(2024, 3, 1))
+        self.day += timedelta(days=1)
+        self.store('2', 'In Progress', 'indeterminate', utc(2024, 3, 1))
+        self.assertEqual(self.wip(), {'In Progress': 2})
+
+    def test_cycle_time_starts_at_the_first_transition_into_progress(self):
+        self.store('1', 'Done', 'done', utc(2024, 3, 1), utc(2024, 3, 5))
+        for history_id, status, at in (('1', 'In Progress', utc(2024, 3, 3)), ('2', 'To Do', utc(2024, 3, 4)),
+                                       ('3', 'In Progress', utc(2024, 3, 4, 12))):
+            IssueTransition.objects.create(issue_id='1', history_id=history_id, to_status_id=history_id,
+                                           to_status=status, transitioned_at=at)
+        self.rollups.refresh_started(['1'], {'In Progress'})
+        self.assertEqual(Issue.objects.get(pk='1').started, utc(2024, 3, 3))
+        cell = WeeklyFlowRollup.objects.get()
+        self.assertEqual((cell.cycle_time_count, cell.cycle_time_p50), (1, 48))
+
+    def test_rebuild_matches_incremental_refreshes(self):
+        self.store('1', 'Done', 'done', utc(2024, 3, 1), utc(2024, 3, 5))
+        self.store('2', 'In Progress', 'indeterminate', utc(2024, 3, 1), issue_type_id='2')
+        weeks = list(WeeklyFlowRollup.objects.values_list('week', 'throughput', 'lead_time_total'))
+        wip = self.wip()
+        self.rollups.rebuild()
+        self.assertEqual(weeks, list(WeeklyFlowRollup.objects.values_list('week', 'throughput', 'lead_time_total')))
+        self.assertEqual(wip, dict(DailyStatusWip.objects.filter(day=django_timezone.now().date())
+                                   .exclude(status='').values_list('status', 'count')))
+
+    def test_touched_rollups_net_out_unchanged_wip(self):
+        touched = TouchedRollups()
+        touched.add('PRJ', '1', None, 'In Progress', 'indeterminate', change=-1)
+        touched.add('PRJ', '1', None, 'In Progress', 'indeterminate')
+        self.assertFalse(touched)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        for week in range(5):
+            for issue_type_id in ('1', '2'):
+                WeeklyFlowRollup.objects.create(project_key='PRJ', issue_type_id=issue_type_id,
+                                                week=date(2024, 1, 1) + timedelta(weeks=week), throughput=1)
+
+    def test_pages_cover_every_row_once(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+            page = self.client.get(reverse('api-weekly-flow'), params).json()
+            seen.extend((row['week'], row['issue_type_id']) for row in page['results'])
+            cursor = page['next']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(len(set(seen)), 10)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_filters_and_projection(self):
+        response = self.client.get(reverse('api-weekly-flow'), {'issue_type': '2', 'fields': 'week,throughput'})
+        results = response.json()['results']
+        self.assertEqual(len(results), 5)
+        self.assertEqual(set(results[0]), {'week', 'throughput'})
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get(reverse('api-weekly-flow'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(decode_cursor(encode_cursor(['2024-01-01', 3]), 2), ['2024-01-01', 3])
+
+    def test_unchanged_response_revalidates(self):
+        response = self.client.get(reverse('api-weekly-flow'))
+        again = self.client.get(reverse('api-weekly-flow'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+
+class KeysetCursorTests(TestCase):
+    def setUp(self):
+        self.processor = SimpleNamespace(request_params={}, base_jql='', watermark_field='fields.updated')
+
+    @staticmethod
+    def entries(*moments):
+        return [{'fields': {'updated': moment.isoformat()}} for moment in moments]
+
+    def test_next_query_starts_at_the_minute_of_the_last_entry(self):
+        cursor = KeysetCursor(self.processor, 2, since=utc(2024, 1, 1, 10, 0))
+        self.assertTrue(cursor.advance(self.entries(utc(2024, 1, 1, 10, 1, 5), utc(2024, 1, 1, 10, 3, 30))))
+        self.assertEqual((cursor.since, cursor.start_at), (utc(2024, 1, 1, 10, 3), 0))
+        self.assertIn('updated >= "2024-01-01 10:03"', cursor.params['jql'])
+
+    def test_full_page_within_one_minute_steps_by_offset(self):
+        cursor = KeysetCursor(self.processor, 2, since=utc(2024, 1, 1, 10, 3))
+        self.assertTrue(cursor.advance(self.entries(utc(2024, 1, 1, 10, 3, 1), utc(2024, 1, 1, 10, 3, 2))))
+        self.assertEqual((cursor.since, cursor.start_at), (utc(2024, 1, 1, 10, 3), 2))
+
+    def test_short_page_ends_the_search(self):
+        cursor = KeysetCursor(self.processor, 2)
+        self.assertFalse(cursor.advance(self.entries(utc(2024, 1, 1, 10, 3))))
+
+    def test_incremental_jql_is_bounded_and_ordered(self):
+        jql = build_incremental_jql('project = PRJ', utc(2024, 1, 1, 10, 0), utc(2024, 1, 2, 0, 0))
+        self.assertEqual(jql, '(project = PRJ) AND updated >= "2024-01-01 10:00" AND '
+                              'updated < "2024-01-02 00:00" ORDER BY updated ASC, key ASC')
+        self.assertEqual(query_start(utc(2024, 1, 1, 10, 5, 30)), utc(2024, 1, 1, 10, 3))
+
+    def test_windows_split_on_minutes_and_cover_the_range(self):
+        start, until = utc(2024, 1, 1, 0, 0), utc(2024, 1, 1, 1, 0)
+        windows = plan_windows(None, start, until, 4)
+        self.assertEqual(windows[0][0], None)
+        self.assertEqual(windows[-1][1], until)
+        self.assertEqual([upper for _, upper in windows[:-1]], [lower for lower, _ in windows[1:]])
+        self.assertTrue(all(bound.second == 0 for _, bound in windows))
+        self.assertEqual(len(windows), 4)
+        short = start + timedelta(seconds=30)
+        self.assertEqual(plan_windows(start, start, short, 4), [(start, short)])
+
+
+class EndpointSchedulerTests(TestCase):
+    def setUp(self):
+        dependencies = {'issuetypes': [], 'issues': ['issuetypes'], 'transitions': ['issues'], 'projects': []}
+        self.scheduler = EndpointScheduler(SimpleNamespace(get_dependencies=dependencies.__getitem__), 2, logger)
+        self.started = []
+
+    def run_scheduler(self, failing):
+        async def run_endpoint(endpoint):
+            self.started.append(endpoint)
+            return endpoint not in failing
+        return asyncio.run(self.scheduler.run(['transitions', 'issues', 'issuetypes', 'projects'], run_endpoint))
+
+    def test_dependencies_run_first(self):
+        self.assertEqual(self.run_scheduler(failing=set()), set())
+        self.assertLess(self.started.index('issuetypes'), self.started.index('issues'))
+        self.assertLess(self.started.index('issues'), self.started.index('transitions'))
+
+    def test_dependents_of_a_failed_endpoint_are_skipped(self):
+        self.assertEqual(self.run_scheduler(failing={'issuetypes'}), {'issuetypes', 'issues', 'transitions'})
+        self.assertEqual(sorted(self.started), ['issuetypes', 'projects'])
@@ -0,0 +1,108 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from data_import.base_processor import (
+    FIELD_CONVERTERS, BaseProcessor, CompiledMapping, FieldType, PreparedBatch, extract_record, get_json_value
+)
+from data_import.data_processor import loads
+
+logger = logging.getLogger(__name__)
+
+_convert_datetime = FIELD_CONVERTERS[FieldType.DATETIME]
+
+
+@dataclass(frozen=True)
+class TransformSpec:
+    """Everything a worker process needs to transform a page of one endpoint.
+
+    Compiled mappings only hold module-level converter functions, enums and
+    defaults, so the spec pickles cheaply and is sent along with every page.
+    """
+    mappings: Tuple[CompiledMapping, ...]
+    columns: Tuple[str, ...]
+    pk_index: Optional[int]
+    watermark_field: Optional[str]
+    entries_key: str
+
+    @classmethod
+    def for_processor(cls, processor: BaseProcessor) -> 'TransformSpec':
+        field_mappings = processor.field_mappings
+        mappings = processor.get_compiled_mappings(field_mappings)
+        columns = tuple(mapping[3] for mapping in mappings)
+        pk_field = next((m.model_field for m in field_mappings.values() if m.is_primary_key), None)
+        return cls(
+            mappings=mappings,
+            columns=columns,
+            pk_index=columns.index(pk_field) if pk_field else None,
+            watermark_field=processor.watermark_field,
+            entries_key=processor.entries_key,
+        )
+
+
+@dataclass
+class PageRows:
+    """A transformed page: one plain tuple per row, in ``TransformSpec.columns`` order."""
+    total: int = 0
+    failed: int = 0
+    rows: List[tuple] = field(default_factory=list)
+    hashes: List[str] = field(default_factory=list)
+    watermark: Optional[datetime] = None
+
+    def to_prepared(self, spec: TransformSpec) -> PreparedBatch:
+        """The ``PreparedBatch`` the write stage expects."""
+        prepared = PreparedBatch(
+            total=self.total,
+            failed=self.failed,
+            pk_field=spec.columns[spec.pk_index] if spec.pk_index is not None else None,
+            watermark=self.watermark,
+        )
+        columns = spec.columns
+        if spec.pk_index is None:
+            prepared.records = [(None, dict(zip(columns, row))) for row in self.rows]
+            return prepared
+        pk_index = spec.pk_index
+        for row, content_hash in zip(self.rows, self.hashes):
+            prepared.records.append((row[pk_index], dict(zip(columns, row))))
+            prepared.hashes[row[pk_index]] = content_hash
+        return prepared
+
+
+def transform_page(payload: Any, spec: TransformSpec) -> PageRows:
+    """Decode a page and apply the field mappings to it; runs in a worker process.
+
+    ``payload`` is the raw response body or already decoded entries. The result
+    matches what ``BaseProcessor.prepare_entries`` produces for the same entries.
+    """
+    entries = loads(payload) if isinstance(payload, (bytes, bytearray, str)) else payload
+    if isinstance(entries, dict):
+        entries = entries.get(spec.entries_key) or []
+
+    page = PageRows(total=len(entries))
+    for entry in entries:
+        if spec.watermark_field:
+            updated = _convert_datetime(get_json_value(entry, spec.watermark_field))
+            if updated and (page.watermark is None or updated > page.watermark):
+                page.watermark = updated
+        data = extract_record(entry, spec.mappings, logger)
+        if not data or (spec.pk_index is not None and not data[spec.columns[spec.pk_index]]):
+            page.failed += 1
+            continue
+        page.rows.append(tuple(data.values()))
+        if spec.pk_index is not None:
+            page.hashes.append(BaseProcessor.compute_content_hash(data))
+    return page
+
+
+def create_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """Process pool for the transform stage, or ``None`` to transform on the event loop.
+
+    Workers are spawned rather than forked: the importer runs the DB writer and
+    asyncio helper threads, whose locks a forked child could inherit held.
+    """
+    if workers <= 0:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
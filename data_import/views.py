@@ -1,3 +1,207 @@
-from django.shortcuts import render
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
 
-# Create your views here.
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from data_import.api_cache import cached_json_response
+from data_import.metrics import ImportMetrics, load_published
+from data_import.models import DailyStatusWip, IssueType, WeeklyFlowRollup
+from data_import.rollups import LEAD_TIME_BUCKETS, PERCENTILES
+
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+
+def metrics(request):
+    """Import metrics of every importing process, in the Prometheus text exposition format."""
+    directory = getattr(settings, 'DATA_IMPORT_METRICS_DIR', None)
+    published = load_published(directory) if directory else ImportMetrics()
+    return HttpResponse(published.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class BadRequest(Exception):
+    pass
+
+
+@dataclass
+class Resource:
+    """A model exposed by the read API, listed with keyset pagination over ``ordering``."""
+    model: Any
+    fields: Tuple[str, ...]
+    # Columns of a unique ordering; the cursor holds their values in the last row of a page.
+    ordering: Tuple[str, ...] = ('pk',)
+    # Query parameter -> field lookup.
+    filters: Dict[str, str] = field(default_factory=dict)
+
+
+RESOURCES = {
+    'issuetypes': Resource(
+        IssueType,
+        fields=('id', 'name', 'description', 'icon_url', 'hierarchy_level', 'avatar_id', 'subtask', 'project_scope'),
+        ordering=('id',),
+        filters={'subtask': 'subtask', 'hierarchy_level': 'hierarchy_level'},
+    ),
+    'weekly-flow': Resource(
+        WeeklyFlowRollup,
+        fields=('project_key', 'issue_type_id', 'week', 'throughput', 'lead_time_total', 'lead_time_p50',
+                'lead_time_p85', 'lead_time_p95', 'lead_time_histogram', 'cycle_time_count', 'cycle_time_total',
+                'cycle_time_p50', 'cycle_time_p85', 'cycle_time_p95', 'cycle_time_histogram'),
+        ordering=('week', 'id'),
+        filters={'project': 'project_key', 'issue_type': 'issue_type_id', 'from': 'week__gte', 'to': 'week__lte'},
+    ),
+    'wip': Resource(
+        DailyStatusWip,
+        fields=('project_key', 'issue_type_id', 'status', 'day', 'count'),
+        ordering=('day', 'id'),
+        filters={'project': 'project_key', 'issue_type': 'issue_type_id', 'status': 'status',
+                 'from': 'day__gte', 'to': 'day__lte'},
+    ),
+}
+
+
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, binascii.Error):
+        raise BadRequest("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise BadRequest("Invalid cursor")
+    return values
+
+
+def keyset_filter(ordering: Tuple[str, ...], values: List[Any]) -> Q:
+    """Rows after ``values`` in ``ordering``: ``(a > x) OR (a = x AND b > y) ...``."""
+    after = Q()
+    for index, name in enumerate(ordering):
+        condition = Q(**{f'{name}__gt': values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            condition &= Q(**{previous: value})
+        after |= condition
+    return after
+
+
+def _page_size(request) -> int:
+    try:
+        limit = int(request.GET.get('limit', API_PAGE_SIZE))
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+
+def _projection(request, resource: Resource) -> Tuple[str, ...]:
+    if not request.GET.get('fields'):
+        return resource.fields
+    requested = tuple(name.strip() for name in request.GET['fields'].split(',') if name.strip())
+    unknown = [name for name in requested if name not in resource.fields]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def _filtered(request, resource: Resource):
+    queryset = resource.model.objects.all()
+    for param, lookup in resource.filters.items():
+        value = request.GET.get(param)
+        if value is None:
+            continue
+        if resource.model._meta.get_field(lookup.split('__')[0]).get_internal_type() == 'BooleanField':
+            value = value.lower() in ('1', 'true', 'yes')
+        queryset = queryset.filter(**{lookup: value})
+    return queryset
+
+
+def list_page(request, resource: Resource) -> Dict[str, Any]:
+    """One page of ``resource``: only the requested fields, read with ``values()`` after the cursor."""
+    fields = _projection(request, resource)
+    limit = _page_size(request)
+    queryset = _filtered(request, resource)
+    if request.GET.get('cursor'):
+        queryset = queryset.filter(keyset_filter(
+            resource.ordering, decode_cursor(request.GET['cursor'], len(resource.ordering))))
+    columns = list(dict.fromkeys(fields + resource.ordering))
+    rows = list(queryset.order_by(*resource.ordering).values(*columns)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][name] for name in resource.ordering])
+    return {
+        'results': [{name: row[name] for name in fields} for row in rows],
+        'next': next_cursor,
+    }
+
+
+def _bad_request(error: Exception) -> JsonResponse:
+    return JsonResponse({'error': str(error)}, status=400)
+
+
+@require_GET
+def resource_list(request, name: str):
+    """``GET /api/<name>``: ``fields``, ``limit`` and ``cursor`` (the previous page's ``next``) plus the resource's filters."""
+    resource = RESOURCES[name]
+    try:
+        # Validate before the cache lookup so that a bad request is never cached.
+        _projection(request, resource)
+        _page_size(request)
+        if request.GET.get('cursor'):
+            decode_cursor(request.GET['cursor'], len(resource.ordering))
+        return cached_json_response(request, [resource.model], lambda: list_page(request, resource))
+    except (BadRequest, ValidationError, ValueError) as e:
+        return _bad_request(e)
+
+
+def histogram_percentile(histogram: List[int], fraction: float) -> Optional[float]:
+    """Upper bound, in hours, of the bucket holding the ``fraction`` percentile; ``None`` for the open bucket."""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = max(1, fraction * total)
+    seen = 0
+    for index, count in enumerate(histogram):
+        seen += count
+        if seen >= rank:
+            return float(LEAD_TIME_BUCKETS[index]) if index < len(LEAD_TIME_BUCKETS) else None
+    return None
+
+
+def lead_time_summary(request) -> Dict[str, Any]:
+    """Throughput, lead time and cycle time over a range of weeks, combined from the weekly rollups."""
+    rows = _filtered(request, RESOURCES['weekly-flow']).values_list(
+        'throughput', 'lead_time_total', 'lead_time_histogram',
+        'cycle_time_count', 'cycle_time_total', 'cycle_time_histogram')
+    counts = {'lead_time': 0, 'cycle_time': 0}
+    totals = {'lead_time': 0.0, 'cycle_time': 0.0}
+    histograms = {prefix: [0] * (len(LEAD_TIME_BUCKETS) + 1) for prefix in counts}
+    for row in rows.iterator():
+        for prefix, (count, total, buckets) in zip(counts, (row[:3], row[3:])):
+            counts[prefix] += count
+            totals[prefix] += total
+            for index, value in enumerate(buckets or []):
+                histograms[prefix][index] += value
+    summary = {'throughput': counts['lead_time'], 'cycle_time_count': counts['cycle_time'],
+               'lead_time_buckets': list(LEAD_TIME_BUCKETS)}
+    for prefix in counts:
+        summary[f'{prefix}_mean'] = totals[prefix] / counts[prefix] if counts[prefix] else None
+        summary[f'{prefix}_histogram'] = histograms[prefix]
+        for fraction in PERCENTILES:
+            summary[f'{prefix}_p{round(fraction * 100)}'] = histogram_percentile(histograms[prefix], fraction)
+    return summary
+
+
+@require_GET
+def lead_time(request):
+    """``GET /api/metrics/lead-time``: throughput, lead and cycle time (hours) for the weekly-flow filters."""
+    try:
+        return cached_json_response(request, [WeeklyFlowRollup], lambda: lead_time_summary(request))
+    except (ValidationError, ValueError) as e:
+        return _bad_request(e)